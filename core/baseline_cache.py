@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from core.fingerprint import hamming_distance, simhash, stable_hash
+from core.rate_limiter import RateLimiter
+
+
+class BaselineCache:
+    """基准响应缓存 (提取器 / 扫描器共用)，按 URL、方法、除目标参数外的参数、会话标识与获取方式 (transport) 区分
+
+    每个条目在 ttl 秒内有效，内存与磁盘 (directory，为 None 时只在内存中) 各存一份，
+    同一端点在同一会话下跨进程最多完整渲染一次。条目超过 revalidate_after 秒后，
+    命中时先用 httpx 做一次廉价校验：有 ETag / Last-Modified 时发条件请求，304 即有效；
+    否则比较状态码与归一化内容指纹 (SHA-1 或 SimHash 近似)，不一致则重新渲染。
+
+    基准的 time 是 v3 (响应延时) 的比较对象，只能与同一方式测得的耗时互换：transport 为 "httpx" 的条目
+    在校验请求拿到完整响应 (非 304) 并通过时改为本次耗时；"browser" (Playwright 渲染，含 DOMContentLoaded)
+    与 304 校验的耗时口径不同，沿用渲染时的值。不重新验证的条目 (非 GET，或 revalidate_after 为 None) 同样沿用，
+    该值最旧为 ttl 秒前测得，对延时敏感时调小 ttl。
+    """
+
+    def __init__(self, directory: Optional[str] = "data/baselines", ttl: float = 600.0,
+                 revalidate_after: Optional[float] = 60.0, max_distance: int = 3):
+        self.directory = directory
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.max_distance = max_distance
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {"hits": 0, "renders": 0, "revalidated": 0, "stale": 0}
+
+    @staticmethod
+    def key(url: str, method: str = "GET", params: Optional[Dict[str, Any]] = None,
+            target_param: Optional[str] = None, session: str = "", transport: str = "browser") -> str:
+        """缓存键：目标参数的取值不影响基准，因此不计入；渲染与 httpx 获取的基准 (耗时口径不同) 分开缓存"""
+        rest = sorted((str(k), str(v)) for k, v in (params or {}).items() if k != target_param)
+        raw = json.dumps([url, method.upper(), rest, session, transport], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is None and self.directory:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except Exception:
+                return None
+            self._memory[key] = entry
+        if entry is not None and time.time() - entry["stored_at"] > self.ttl:
+            self._discard(key)
+            return None
+        return entry
+
+    def _store(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, self._path(key))
+
+    def _discard(self, key: str):
+        self._memory.pop(key, None)
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    async def _revalidate(self, entry: Dict[str, Any], client: httpx.AsyncClient) -> Tuple[bool, Optional[float]]:
+        """返回 (是否仍然有效, 可替换基准 time 的耗时)；耗时只在 httpx 条目收到完整响应时给出"""
+        data = entry["data"]
+        headers = data.get("headers", {})
+        conditional = {}
+        if headers.get("etag"):
+            conditional["If-None-Match"] = headers["etag"]
+        if headers.get("last-modified"):
+            conditional["If-Modified-Since"] = headers["last-modified"]
+        url = entry["url"]
+        limiter = RateLimiter.shared()
+        await limiter.acquire(url)
+        try:
+            start_time = time.time()
+            r = await client.get(url, params=entry["params"] or None, headers=conditional or None)
+        except Exception as e:
+            limiter.record_error(url, e)
+            return False, None
+        elapsed = time.time() - start_time
+        limiter.record(url, elapsed, r.status_code, r.headers)
+        if r.status_code == 304:
+            return True, None
+        if r.status_code != data.get("status"):
+            return False, None
+        valid = (stable_hash(r.text) == entry["sha1"]
+                 or hamming_distance(simhash(r.text), entry["simhash"]) <= self.max_distance)
+        return valid, elapsed if valid and entry.get("transport") == "httpx" else None
+
+    async def get(self, url: str, method: str, params: Optional[Dict[str, Any]],
+                  fetch: Callable[[], Awaitable[Dict[str, Any]]], session: str = "",
+                  target_param: Optional[str] = None, client: Optional[httpx.AsyncClient] = None,
+                  transport: str = "browser") -> Dict[str, Any]:
+        """返回缓存的基准，未命中或失效时调用 fetch() 渲染并缓存；同一键的并发请求只渲染一次
+
+        transport 标明 fetch() 的获取方式 ("browser" 为 Playwright 渲染，"httpx" 为直接请求)。
+        只有 GET 基准会被重新验证 (不重复提交 POST)；状态码为 0 或正文为空的失败响应不缓存。
+        """
+        if self.ttl <= 0:
+            self.stats["renders"] += 1
+            return await fetch()
+        key = self.key(url, method, params, target_param, session, transport)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._load(key)
+            if entry is not None:
+                age = time.time() - entry["stored_at"]
+                needs_check = (self.revalidate_after is not None and age > self.revalidate_after
+                               and client is not None and method.upper() == "GET")
+                if not needs_check:
+                    self.stats["hits"] += 1
+                    return dict(entry["data"])
+                valid, elapsed = await self._revalidate(entry, client)
+                if valid:
+                    self.stats["revalidated"] += 1
+                    entry["stored_at"] = time.time()
+                    if elapsed is not None:
+                        entry["data"]["time"] = elapsed
+                    self._store(key, entry)
+                    return dict(entry["data"])
+                self.stats["stale"] += 1
+                self._discard(key)
+
+            data = await fetch()
+            self.stats["renders"] += 1
+            if data.get("status") and data.get("text"):
+                self._store(key, {
+                    "url": url,
+                    "method": method.upper(),
+                    "params": dict(params or {}),
+                    "session": session,
+                    "transport": transport,
+                    "stored_at": time.time(),
+                    "sha1": stable_hash(data["text"]),
+                    "simhash": simhash(data["text"]),
+                    "data": data,
+                })
+            return data
+
+    def summary(self) -> str:
+        s = self.stats
+        if self.ttl <= 0:
+            return f"[*] 基准缓存: 已关闭，渲染 {s['renders']} 次"
+        return (f"[*] 基准缓存: 命中 {s['hits'] + s['revalidated']} 次 (其中重新验证 {s['revalidated']} 次)，"
+                f"渲染 {s['renders']} 次，失效 {s['stale']} 次")
@@ -0,0 +1,140 @@
+import heapq
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+# 爬虫每个页面的分阶段耗时：
+#   navigation        发出请求到收到响应头 (浏览器 goto commit / httpx 请求)
+#   dom_ready         DOMContentLoaded
+#   settle            等待页面稳定 (PageSettler：DOM 变动与在途请求安静一段时间，或达到上限)
+#   extract           DOM 提取表单与链接 (HTTP 路径为 HTML 解析)
+#   fingerprint       页面指纹 (SHA-1 + SimHash)
+#   injection_points  构造注入点
+#   links             链接过滤与入队
+PHASES = ("navigation", "dom_ready", "settle", "extract", "fingerprint", "injection_points", "links")
+PHASE_LABELS = {
+    "navigation": "导航",
+    "dom_ready": "DOM 就绪",
+    "settle": "页面稳定",
+    "extract": "DOM 提取",
+    "fingerprint": "指纹",
+    "injection_points": "注入点",
+    "links": "链接",
+}
+
+
+class PageTimer:
+    """单个页面的计时记录；同一阶段多次计时会累加"""
+
+    def __init__(self, url: str, mode: str, security_level: Optional[str] = None):
+        self.url = url
+        self.mode = mode
+        self.security_level = security_level
+        self.phases: Dict[str, float] = {}
+        self.bytes = 0
+        self.status: Optional[int] = None
+        self.error: Optional[str] = None
+        # done: 页面在该模式下处理完毕；fallback: 快速路径 (http / reused) 放弃，页面交由浏览器重新分析
+        self.outcome = "done"
+        self.started = time.time()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.time() - start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "security_level": self.security_level,
+            "mode": self.mode,
+            "status": self.status,
+            "bytes": self.bytes,
+            "total": round(time.time() - self.started, 4),
+            "phases": {k: round(v, 4) for k, v in self.phases.items()},
+            "error": self.error,
+            "outcome": self.outcome,
+        }
+
+
+class CrawlTimings:
+    """汇总爬取计时：逐页写入旁路 JSONL 文件 (path 为 None 时只在内存中统计)，结束时输出阶段分布与最慢页面
+
+    只保留最慢的 top_n 条记录与各阶段累计值，页面再多内存占用也不变。
+    回退 (outcome 为 fallback) 的记录计入耗时，但不计入页面数与最慢页面，该页面由随后的浏览器记录统计。
+    """
+
+    def __init__(self, path: Optional[str] = None, top_n: int = 10, resume: bool = False):
+        self.path = path
+        self.top_n = max(0, top_n)
+        self.pages = 0
+        self.fallbacks = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.phase_totals: Dict[str, float] = {}
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self.f = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.f = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def start(self, url: str, mode: str, security_level: Optional[str] = None) -> PageTimer:
+        return PageTimer(url, mode, security_level)
+
+    def finish(self, timer: PageTimer):
+        record = timer.to_dict()
+        self.total += record["total"]
+        self.bytes += record["bytes"]
+        for name, value in record["phases"].items():
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + value
+        if timer.outcome == "fallback":
+            self.fallbacks += 1
+        else:
+            self.pages += 1
+        if self.top_n and timer.outcome != "fallback":
+            item = (record["total"], next(self._seq), record)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heappushpop(self._slowest, item)
+        if self.f:
+            self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.f.flush()
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+    def summary(self) -> str:
+        if not self.pages:
+            return "[*] 爬取耗时: 未分析页面"
+        order = list(PHASES) + [p for p in self.phase_totals if p not in PHASES]
+        parts = [
+            f"{PHASE_LABELS.get(p, p)} {self.phase_totals[p]:.1f}s ({self.phase_totals[p] / max(self.total, 1e-9):.0%})"
+            for p in order if p in self.phase_totals
+        ]
+        lines = [
+            f"[*] 爬取耗时: {self.pages} 个页面，合计 {self.total:.1f}s，平均 {self.total / self.pages:.2f}s/页，"
+            f"正文 {self.bytes / 1024:.0f} KB" + (f"，快速路径回退 {self.fallbacks} 次 (耗时已计入)" if self.fallbacks else ""),
+            "    阶段分布: " + ", ".join(parts),
+        ]
+        if self._slowest:
+            lines.append(f"[*] 最慢的 {len(self._slowest)} 个页面:")
+            for total, _, record in sorted(self._slowest, reverse=True):
+                phases = record["phases"]
+                slowest_phase = max(phases, key=phases.get) if phases else None
+                detail = f"{PHASE_LABELS.get(slowest_phase, slowest_phase)} {phases[slowest_phase]:.2f}s" if slowest_phase else record["mode"]
+                level = f"[{record['security_level']}] " if record["security_level"] else ""
+                lines.append(f"    {total:6.2f}s  {level}{record['url']} ({record['mode']}，主要耗时: {detail})")
+        if self.path:
+            lines.append(f"[*] 逐页计时已写入 {self.path}")
+        return "\n".join(lines)
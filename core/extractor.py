@@ -1,10 +1,12 @@
 import asyncio
+import hashlib
 import json
 import math
 import time
 import re
 import argparse
-import difflib
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 import numpy as np
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs, urlencode
@@ -15,28 +17,47 @@ from playwright.async_api import async_playwright, Page, BrowserContext
 # Ensure core is in path if running from root
 import sys
 import os
-import difflib
 import re
 import asyncio
 import httpx
 import random
 sys.path.append(os.getcwd())
 from playwright.async_api import async_playwright, Page, BrowserContext
-from core.spider import DVWASpider, BWAPPSpider, PikachuSpider, UniversalSpider
+from core.spider import DVWASpider, BWAPPSpider, PikachuSpider, UniversalSpider, _SHARED_POINT_REFS
+from core.baseline_cache import BaselineCache
 from core.mutator import VAPFMutator
+from core.page_settle import PageSettler
+from core.page_stream import PageStreamReader, is_page_stream
+from core.rate_limiter import RateLimiter
+from core.resource_policy import ResourcePolicy
+from core.signatures import response_signatures
+from core.similarity import ENGINES, get_engine
+
+# 当前页面任务所属安全等级的 httpx 客户端；每个页面在独立任务中处理，设置只影响该任务及其派生的探测
+_session_client: ContextVar[httpx.AsyncClient | None] = ContextVar("_session_client", default=None)
+
+# 延时类 Payload (含变异后的大小写、注释变体)：v3 依赖其响应耗时，必须在主机上没有其他探测时单独下发
+TIME_BASED_PAYLOAD = re.compile(r"sleep\s*\(|benchmark\s*\(|waitfor\s+delay|pg_sleep", re.IGNORECASE)
+
+
+def is_time_based(payload: str) -> bool:
+    return bool(TIME_BASED_PAYLOAD.search(payload))
 
 class FeatureExtractor:
     """
     语义特征提取器 (Semantic Feature Extractor)
     
     功能:
-    1. 读取 targets_*.json 中的注入点
+    1. 读取 targets_*.json (或流式的 targets_*.jsonl) 中的注入点
     2. 对每个注入点发送 Payload (Probe)
     3. 实时重新获取 Baseline (以应对 Session 变化)
     4. 对比 Probe 与 Baseline，生成 13 维特征向量
     """
 
-    def __init__(self, payloads_file: str = "data/payloads.txt", cookies: str = "", default_headers: Dict[str, str] | None = None):
+    def __init__(self, payloads_file: str = "data/payloads.txt", cookies: str = "", default_headers: Dict[str, str] | None = None,
+                 session_dir: str | None = "data/sessions", similarity: str = "chars",
+                 baseline_dir: str | None = "data/baselines", baseline_ttl: float = 600.0, baseline_revalidate: float | None = 60.0,
+                 page_concurrency: int = 5, probe_concurrency: int = 10):
         self.payloads = self._load_payloads(payloads_file)
         self.mutator = VAPFMutator()
         self.cookies = cookies
@@ -57,11 +78,35 @@ class FeatureExtractor:
             "SQL syntax", "mysql_fetch", "syntax error", "Warning", "Fatal error",
             "Unclosed quotation", "not found", "404", "denied", "root:", "admin"
         ]
+        # v5 相似度引擎：基准只预处理一次，各探测线性时间比较 (默认 chars 与训练数据的 difflib quick_ratio 一致)
+        self.similarity = get_engine(similarity)
         
         # [Optimization] HTTP Client for Fast Probing
         self.http_client = httpx.AsyncClient(verify=False, timeout=10.0, follow_redirects=True, headers=self.default_headers)
-        # [Optimization] Concurrency Semaphore
-        self.sem = asyncio.Semaphore(5)
+        # [Optimization] 按主机自适应限速 (与爬虫、扫描器共用)；信号量只限制同时打开的页面数
+        self.rate_limiter = RateLimiter.shared()
+        # [Optimization] Concurrency Semaphore：页面级限制同时处理的页面数，探测级限制每个主机的在途 Payload 探测数
+        self.page_concurrency = page_concurrency
+        self.sem = asyncio.Semaphore(self.page_concurrency)
+        self.probe_concurrency = probe_concurrency
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+        self._host_exclusive_locks: Dict[str, asyncio.Lock] = {}
+        # [Optimization] 拦截重资源；脚本只在执行 XSS 探测的页面上放行
+        self.resource_policy = ResourcePolicy(keep_scripts=False)
+        # [Optimization] 自适应页面稳定判定 (DOM 与网络安静即继续)，扫描器经 fetch_page_features 共用
+        self.settler = PageSettler()
+        # 登录会话缓存目录 (与爬虫、扫描器共用)，None 表示每次重新登录
+        self.session_dir = session_dir
+        # 基准响应缓存 (与扫描器共用，可跨进程)：同一端点在同一会话下只完整渲染一次
+        self.baseline_cache = BaselineCache(baseline_dir, ttl=baseline_ttl, revalidate_after=baseline_revalidate)
+        # 公共表单 / API 去重：(安全等级, 签名) -> 完整定义；每个唯一表单或接口只探测一次
+        self.form_defs: Dict[tuple, Dict] = {}
+        self._probed_forms: set = set()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """当前页面所属会话 (安全等级) 的 httpx 客户端，未绑定时为共享的 http_client"""
+        return _session_client.get() or self.http_client
 
     def set_default_headers(self, headers: Dict[str, str] | None):
         """更新默认请求头，应用于 httpx 与后续 Playwright 创建的上下文。"""
@@ -99,84 +144,86 @@ class FeatureExtractor:
             "words": len(text.split())
         }
 
+    @staticmethod
+    def _count_set_cookie(val) -> int:
+        if isinstance(val, list):
+            return len(val)
+        return 1 if val else 0
+
     def compute_13_vector(self, base_data: Dict, probe_data: Dict, payload: str) -> List[float]:
         """
         计算 13 维特征向量 (优化版)
+        单条探测的便捷入口，与 compute_13_vectors 共用同一实现
         """
-        vector = []
+        return self.compute_13_vectors(base_data, [probe_data], [payload], dtype=np.float64)[0].tolist()
 
-        # 1. 响应长度变化 (归一化到 -1 ~ 1)
-        len_base = base_data.get('length', 0)
-        len_probe = probe_data.get('length', 0)
-        # 避免除以零
-        len_diff = (len_probe - len_base) / max(len_base, 1)
-        # 截断极端值
-        vector.append(max(min(len_diff, 1.0), -1.0)) 
+    def compute_13_vectors(self, base_data: Dict, probes: List[Dict], payloads: List[str], dtype=np.float32) -> np.ndarray:
+        """
+        批量计算同一基准下 N 条探测的 13 维特征向量，返回 (N, 13) 数组
 
-        # 2. 状态码变化 (0 或 1)
-        vector.append(1.0 if base_data.get('status') != probe_data.get('status') else 0.0)
-
-        # 3. 响应时间延迟 (秒, 归一化)
-        time_diff = probe_data.get('time', 0) - base_data.get('time', 0)
-        # 假设超过 5 秒为严重延迟
-        vector.append(max(min(time_diff / 5.0, 1.0), 0.0))
-
-        # 4. 关键词匹配评分 (归一化)
-        error_score = 0
-        p_text_lower = probe_data.get('text', '').lower()
-        for kw in self.error_keywords:
-            if kw in p_text_lower:
-                error_score += 1
-        # 假设匹配 5 个关键词即为满分
-        vector.append(min(error_score / 5.0, 1.0))
-
-        # 5. DOM 结构相似度 (0 ~ 1)
-        sim = difflib.SequenceMatcher(None, base_data.get('text', ''), probe_data.get('text', '')).quick_ratio()
-        vector.append(sim)
-
-        # 6. 反射性 (0 或 1)
-        # 简单判断 Payload 是否在响应中出现
-        # 注意：Payload 可能被编码，这里只做简单字符串匹配
-        is_reflected = payload in probe_data.get('text', '')
-        vector.append(1.0 if is_reflected else 0.0)
-
-        # 7. Header 变化 (Set-Cookie / Server / Location)
-        # 重点关注安全相关的 Header 变动
-        header_diff_score = 0
+        数值列 (长度、状态码、耗时、Header、Content-Type) 以 NumPy 向量运算完成，
+        文本列 (关键词、相似度、反射) 逐条计算，相似度引擎的基准画像只构建一次；
+        v4 关键词与报错签名库在同一次扫描中匹配，各类别的命中写回 probe['signatures'] 供扫描器使用。
+        中间结果均为 float64，dtype=np.float64 时与逐条计算逐位一致，默认 float32 即其截断。
+        """
+        n = len(probes)
+        matrix = np.zeros((n, 13), dtype=np.float64)
+        if not n:
+            return matrix.astype(dtype)
         base_headers = base_data.get('headers', {})
-        probe_headers = probe_data.get('headers', {})
-        
-        def _count_set_cookie(val):
-            if isinstance(val, list):
-                return len(val)
-            return 1 if val else 0
-        if _count_set_cookie(base_headers.get('set-cookie')) != _count_set_cookie(probe_headers.get('set-cookie')):
-            header_diff_score += 0.5
-            
-        # 检查 Location 跳转变化
-        if base_headers.get('location') != probe_headers.get('location'):
-             header_diff_score += 0.5
-             
-        vector.append(min(header_diff_score, 1.0))
+        probe_headers = [p.get('headers', {}) for p in probes]
 
-        # 8-12. 占位符 (保留给未来特征，如 TF-IDF 距离等)
-        # 暂时填充 0.0
-        for _ in range(5):
-            vector.append(0.0)
+        # 1. 响应长度变化 (归一化到 -1 ~ 1)，截断极端值
+        len_base = base_data.get('length', 0)
+        lengths = np.array([p.get('length', 0) for p in probes], dtype=np.float64)
+        matrix[:, 0] = np.clip((lengths - len_base) / max(len_base, 1), -1.0, 1.0)
+
+        # 2. 状态码变化 (0 或 1)
+        statuses = np.array([p.get('status') for p in probes], dtype=object)
+        matrix[:, 1] = statuses != base_data.get('status')
+
+        # 3. 响应时间延迟 (秒, 归一化)，假设超过 5 秒为严重延迟
+        times = np.array([p.get('time', 0) for p in probes], dtype=np.float64)
+        matrix[:, 2] = np.clip((times - base_data.get('time', 0)) / 5.0, 0.0, 1.0)
+
+        # 4-6. 文本特征：关键词匹配 (5 个即满分)、DOM 结构相似度、Payload 反射 (只做简单字符串匹配)
+        # 关键词按原样匹配小写化后的正文 (与历史特征数据一致)
+        signatures = response_signatures(tuple(self.error_keywords))
+        base_profile = self.similarity.profile(base_data.get('text', ''))
+        error_scores = np.empty(n, dtype=np.float64)
+        for i, (probe, payload) in enumerate(zip(probes, payloads)):
+            text = probe.get('text', '')
+            hits = signatures.scan(text.lower())
+            keyword_hits = hits.pop("keywords", ())
+            error_scores[i] = sum(1 for kw in self.error_keywords if kw in keyword_hits)
+            probe['signatures'] = {name: sorted(sigs) for name, sigs in hits.items()}
+            matrix[i, 4] = self.similarity.compare(base_profile, text)
+            matrix[i, 5] = payload in text
+        matrix[:, 3] = np.minimum(error_scores / 5.0, 1.0)
+
+        # 7. Header 变化：Set-Cookie 数量与 Location 跳转各占 0.5
+        base_cookies = self._count_set_cookie(base_headers.get('set-cookie'))
+        cookies = np.array([self._count_set_cookie(h.get('set-cookie')) for h in probe_headers])
+        locations = np.array([h.get('location') for h in probe_headers], dtype=object)
+        matrix[:, 6] = np.minimum(0.5 * (cookies != base_cookies) + 0.5 * (locations != base_headers.get('location')), 1.0)
+
+        # 8-12. 占位符 (保留给未来特征，如 TF-IDF 距离等)，保持 0.0
 
         # 13. Content_Type 变化
-        ct_base = base_headers.get('content-type', '').split(';')[0]
-        ct_probe = probe_headers.get('content-type', '').split(';')[0]
-        vector.append(1.0 if ct_base != ct_probe else 0.0)
+        content_types = np.array([h.get('content-type', '').split(';')[0] for h in probe_headers], dtype=object)
+        matrix[:, 12] = content_types != base_headers.get('content-type', '').split(';')[0]
 
-        return vector
+        return matrix.astype(dtype)
 
-    async def fetch_page_features(self, page: Page, url: str, method: str = "GET", data: Dict = None, use_playwright: bool = True) -> Dict:
+    async def fetch_page_features(self, page: Page, url: str, method: str = "GET", data: Dict = None, use_playwright: bool = True,
+                                  body_format: str | None = None) -> Dict:
         """
         [Core] 发送请求并提取原始特征 (Raw Features)
-        支持 Playwright (全功能) 和 httpx (快速) 混合模式
+        支持 Playwright (全功能) 和 httpx (快速) 混合模式；body_format 为 "json" 时 httpx 以 JSON 请求体发送非 GET 的 data
         """
         try:
+            # 限速等待不计入响应时间 (V3 延时特征)
+            await self.rate_limiter.acquire(url)
             # 记录请求开始时间
             start_time = time.time()
             
@@ -184,14 +231,18 @@ class FeatureExtractor:
             method_upper = method.upper()
             if use_playwright and page:
                 # 对 prompt.ml / xss-game 这类页面：networkidle 可能永远不满足（长连接/轮询）
-                # 采用更宽容的策略：domcontentloaded(20s) -> 尝试等待 networkidle(20s, 可超时忽略) -> 短暂停留给 JS 渲染
+                # 因此 domcontentloaded(20s) 之后按 DOM 变动与在途请求判定稳定 (安静窗口 + 上限)，不再固定等待
+                # 响应时间 (V3) 截止到 DOMContentLoaded：稳定等待的时长随页面脚本浮动，不计入
+                loaded_at = {}
+
                 async def _goto_then_settle(target: str):
+                    self.settler.attach(page)
+                    t0 = time.time()
                     resp = await page.goto(target, wait_until="domcontentloaded", timeout=20000)
-                    try:
-                        await page.wait_for_load_state("networkidle", timeout=20000)
-                    except Exception:
-                        pass
-                    await asyncio.sleep(1)
+                    loaded_at["time"] = time.time()
+                    if resp:
+                        self.rate_limiter.record(target, loaded_at["time"] - t0, resp.status, resp.headers)
+                    await self.settler.settle(page)
                     return resp
 
                 if method_upper == "GET":
@@ -210,11 +261,13 @@ class FeatureExtractor:
             else:
                 # 使用 httpx 进行快速协议层探测（不渲染 DOM）
                 if method_upper == "GET":
-                    r = await self.http_client.get(url, params=data or {}, headers=self.default_headers or None)
+                    r = await self.client.get(url, params=data or {}, headers=self.default_headers or None)
                 else:
-                    r = await self.http_client.post(url, data=data or {}, headers=self.default_headers or None)
+                    body = {"json": data or {}} if body_format == "json" else {"data": data or {}}
+                    r = await self.client.request(method_upper, url, **body, headers=self.default_headers or None)
                 # 仿造 Playwright 返回结构
                 end_time = time.time()
+                self.rate_limiter.record(url, end_time - start_time, r.status_code, r.headers)
                 text = r.text
                 # 保留 set-cookie 的列表计数能力
                 try:
@@ -232,7 +285,7 @@ class FeatureExtractor:
                     "headers": headers
                 }
 
-            end_time = time.time()
+            end_time = loaded_at.get("time", time.time())
             
             if not response:
                 return {"status": 0, "length": 0, "time": 0, "text": "", "headers": {}}
@@ -255,6 +308,7 @@ class FeatureExtractor:
             
         except Exception as e:
             # print(f"[Debug] Fetch Error: {e}")
+            self.rate_limiter.record_error(url, e)
             return {"status": 0, "length": 0, "time": 0, "text": "", "headers": {}}
 
         # Fallback: 如果 Playwright 返回空响应，补打一发 httpx 获取原始文本，避免报告空白
@@ -274,9 +328,9 @@ class FeatureExtractor:
                 method_upper = (method or "GET").upper()
                 start_time_fb = time.time()
                 if method_upper == "GET":
-                    r_fb = await self.http_client.get(url, params=data or {})
+                    r_fb = await self.client.get(url, params=data or {})
                 else:
-                    r_fb = await self.http_client.post(url, data=data or {})
+                    r_fb = await self.client.post(url, data=data or {})
                 end_time_fb = time.time()
                 try:
                     set_cookie_list = r_fb.headers.get_list('set-cookie')
@@ -295,12 +349,35 @@ class FeatureExtractor:
         except Exception:
             pass
 
+    async def _session_identity(self, page: Page | None) -> str:
+        """当前会话的标识 (浏览器与 httpx 的 Cookie、默认请求头)，用作基准缓存键的一部分"""
+        cookies = set()
+        if page is not None:
+            try:
+                cookies.update((c['domain'], c['path'], c['name'], c['value']) for c in await page.context.cookies())
+            except Exception:
+                pass
+        cookies.update((c.domain, c.path, c.name, c.value) for c in self.client.cookies.jar)
+        raw = json.dumps([sorted(cookies), sorted(self.default_headers.items())], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    async def fetch_baseline(self, page: Page | None, url: str, method: str = "GET", data: Dict = None,
+                             target_param: str | None = None, use_playwright: bool = True, body_format: str | None = None) -> Dict:
+        """经基准缓存获取基准响应；target_param 为待注入的参数，其取值不影响缓存键"""
+        session = await self._session_identity(page)
+        return await self.baseline_cache.get(
+            url, method, data,
+            lambda: self.fetch_page_features(page, url, method, data, use_playwright=use_playwright, body_format=body_format),
+            session=session, target_param=target_param, client=self.client,
+            transport="browser" if use_playwright and page else "httpx",
+        )
+
     async def probe_and_get_vector(self, page: Page, url: str, method: str, base_params: Dict, param_name: str, payload: str, base_data: Dict = None, use_playwright: bool = True) -> tuple[List[float], Dict]:
         """
         单次探测并获取 (13 维向量, Probe Data)
         """
         if base_data is None:
-             base_data = await self.fetch_page_features(page, url, method, base_params, use_playwright=use_playwright)
+             base_data = await self.fetch_baseline(page, url, method, base_params, target_param=param_name, use_playwright=use_playwright)
         
         probe_params = base_params.copy()
         probe_params[param_name] = payload
@@ -310,22 +387,82 @@ class FeatureExtractor:
         vector = self.compute_13_vector(base_data, probe_data, payload)
         return vector, probe_data
 
-    async def _process_page_concurrent(self, context: BrowserContext, page_info: Dict):
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """每个主机的探测级并发上限 (页面级由 self.sem 限制，两级共同约束在途请求数)"""
+        host = urlparse(url).netloc
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(self.probe_concurrency)
+        return sem
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str, exclusive: bool = False):
+        """占用主机的一个探测名额；exclusive 时占满全部名额 (等在途探测结束、期间不再下发新探测)
+
+        独占者之间用锁排队，避免各自占到部分名额而互相等待。
+        """
+        sem = self._host_semaphore(url)
+        if not exclusive:
+            async with sem:
+                yield
+            return
+        lock = self._host_exclusive_locks.setdefault(urlparse(url).netloc, asyncio.Lock())
+        async with lock:
+            for _ in range(self.probe_concurrency):
+                await sem.acquire()
+            try:
+                yield
+            finally:
+                for _ in range(self.probe_concurrency):
+                    sem.release()
+
+    async def _dispatch_probes(self, payloads: List[str], probe) -> List[Dict]:
+        """下发一个参数的全部 Payload，按 payloads 顺序返回结果
+
+        普通 Payload 并发下发；延时类 Payload 在其后逐条独占主机下发，响应耗时不含本进程其他探测造成的排队，
+        v3 与串行采集的训练数据口径一致。probe(payload, exclusive) 返回探测结果。
         """
-        并发处理单个页面的所有注入点
+        timed = [i for i, payload in enumerate(payloads) if is_time_based(payload)]
+        fast = [i for i, payload in enumerate(payloads) if not is_time_based(payload)]
+        results: Dict[int, Dict] = dict(zip(fast, await asyncio.gather(*[probe(payloads[i], False) for i in fast])))
+        for i in timed:
+            results[i] = await probe(payloads[i], True)
+        return [results[i] for i in range(len(payloads))]
+
+    async def _fan_out_probe(self, page: Page, page_lock: asyncio.Lock, url: str, param_name: str, payload: str,
+                             exclusive: bool = False) -> Dict:
+        """下发单条 Payload 探测：XSS 类在共享页面上串行执行 (Playwright)，其余走 httpx 并发"""
+        # [Optimization] 混合模式：XSS 用 Playwright，其他用 httpx
+        use_pw = "<script" in payload or "javascript:" in payload
+        if use_pw:
+            # 先排队页面锁再占用主机名额，等待页面的 XSS 探测不挤占 httpx 探测的并发
+            async with page_lock, self._host_slot(url, exclusive):
+                return await self.fetch_page_features(page, url, "GET", {param_name: payload}, use_playwright=True)
+        async with self._host_slot(url, exclusive):
+            return await self.fetch_page_features(None, url, "GET", {param_name: payload}, use_playwright=False)
+
+    async def _process_page_concurrent(self, context: BrowserContext, page_info: Dict, client: httpx.AsyncClient | None = None):
         """
+        并发处理单个页面的所有注入点；context / client 为该页面安全等级对应的会话
+        """
+        if client is not None:
+            _session_client.set(client)
         async with self.sem: # 限制页面级并发
             page = await context.new_page()
+            # 该页面承载基准与 XSS (Playwright) 探测，需要脚本执行；其余探测走 httpx
+            await self.resource_policy.apply(page, keep_scripts=True)
             try:
                 url = page_info['url']
                 print(f"[+] Processing: {url}")
                 
-                # 获取基准数据 (使用 Playwright 确保准确性)
-                base_data = await self.fetch_page_features(page, url, method="GET", use_playwright=True)
+                # 获取基准数据 (使用 Playwright 确保准确性，经基准缓存每个端点每个会话只渲染一次)
+                base_data = await self.fetch_baseline(page, url, method="GET", use_playwright=True)
                 if not base_data['text']:
                     return
 
-                injection_points = page_info.get('injection_points', [])
+                injection_points = self._points_to_probe(page_info)
+                # Playwright 探测共用本页面，同一时刻只能有一个导航
+                page_lock = asyncio.Lock()
                 # [Debug]
                 print(f"    [Debug] Injection Points for {url}: {len(injection_points)}")
                 
@@ -356,23 +493,16 @@ class FeatureExtractor:
                             #    # print(f"    [-] Skipping dead param: {p_name}")
                             #    continue
 
-                            # 否则进行全量探测
-                            for payload in self.payloads:
-                                # [Optimization] 混合模式：XSS 用 Playwright，其他用 httpx
-                                use_pw = "<script" in payload or "javascript:" in payload
-                                
-                                # 同步 Cookie (简单实现：从 context 获取)
-                                # cookies = await context.cookies()
-                                # httpx_cookies = {c['name']: c['value'] for c in cookies}
-                                # self.http_client.cookies.update(httpx_cookies)
-                                
-                                # 注意：probe_and_get_vector 参数顺序需要调整，因为之前签名改了
-                                vector, _ = await self.probe_and_get_vector(
-                                    page if use_pw else None, 
-                                    url, "GET", {p_name: ""}, p_name, payload, base_data, 
-                                    use_playwright=use_pw
-                                )
-                                
+                            # 否则进行全量探测：该参数的 Payload 并发下发 (受每主机探测并发与限速约束)，延时类随后独占主机串行下发；
+                            # 结果按 self.payloads 的顺序返回，写入结果的顺序与串行时一致
+                            probes = await self._dispatch_probes(self.payloads, lambda payload, exclusive: self._fan_out_probe(
+                                page, page_lock, url, p_name, payload, exclusive))
+
+                            # 该参数的全部探测共用同一基准，一次批量计算特征
+                            # (float64 与逐条计算逐位一致，数据集数值不变)
+                            # 在线程中计算，大页面的相似度比较不阻塞事件循环
+                            vectors = await asyncio.to_thread(self.compute_13_vectors, base_data, probes, self.payloads, dtype=np.float64)
+                            for payload, vector in zip(self.payloads, vectors.tolist()):
                                 self.vectors.append({
                                     "url": url,
                                     "param": p_name,
@@ -381,69 +511,221 @@ class FeatureExtractor:
                                     "risk_level": param.get('risk_level', 'normal'),
                                     "vector": vector
                                 })
+                    elif point['type'] == 'api':
+                        await self._probe_api_point(page_info, point)
             except Exception as e:
                 print(f"[!] Error processing {page_info['url']}: {e}")
             finally:
                 await page.close()
 
-    async def process_file(self, json_path: str, headless: bool = True):
+    @staticmethod
+    def _api_request(point: Dict, values: Dict[str, Any]) -> tuple[str, Dict]:
+        """按 api 注入点拼出请求 (URL, data)：GET 时全部输入作为 Query；否则 query 类输入并入 URL，其余作为请求体
+
+        JSON 请求体中的取值保持原始类型；Query 中非字符串的取值按 JSON 编码。
+        """
+        def as_text(v):
+            return v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)
+
+        url = point['action_url']
+        if point.get('method', 'GET').upper() == 'GET':
+            return url, {k: as_text(v) for k, v in values.items()}
+        kinds = {i['name']: i.get('type') for i in point.get('inputs', [])}
+        query = {k: as_text(v) for k, v in values.items() if kinds.get(k) == 'query'}
+        body = {k: v for k, v in values.items() if kinds.get(k) != 'query'}
+        return (f"{url}?{urlencode(query)}" if query else url), body
+
+    async def _probe_api_point(self, page_info: Dict, point: Dict):
+        """探测 api 注入点 (页面加载时捕获的 XHR/fetch)：按记录的方法与请求体格式经 httpx 重放，逐个输入项注入
+
+        其余输入项保持捕获时的取值 (JSON 字段含原始类型，只有被注入的参数替换为字符串 Payload)；基准为以原值重放的响应，经基准缓存 (非 GET 只在有效期内复用、不重新验证)。
+        """
+        method = point.get('method', 'GET').upper()
+        body_format = point.get('content_type')
+        defaults = {i['name']: i.get('default', '') for i in point.get('inputs', [])}
+        base_url, base_params = self._api_request(point, defaults)
+
+        async def probe(p_name: str, payload: str, exclusive: bool) -> Dict:
+            url, data = self._api_request(point, {**defaults, p_name: payload})
+            async with self._host_slot(url, exclusive):
+                return await self.fetch_page_features(None, url, method, data, use_playwright=False, body_format=body_format)
+
+        for param in point.get('inputs', []):
+            p_name = param['name']
+            base_data = await self.fetch_baseline(None, base_url, method, base_params, target_param=p_name,
+                                                  use_playwright=False, body_format=body_format)
+            if not base_data['text']:
+                continue
+            probes = await self._dispatch_probes(self.payloads, lambda payload, exclusive: probe(p_name, payload, exclusive))
+            vectors = await asyncio.to_thread(self.compute_13_vectors, base_data, probes, self.payloads, dtype=np.float64)
+            for payload, vector in zip(self.payloads, vectors.tolist()):
+                self.vectors.append({
+                    "url": point['action_url'],
+                    "method": method,
+                    "param": p_name,
+                    "payload": payload,
+                    "security_level": page_info.get('security_level', ''),
+                    "risk_level": param.get('risk_level', 'normal'),
+                    "vector": vector
+                })
+
+    def _learn_forms(self, forms: List[Dict], level: str = ""):
+        """登记表单 / API 定义 (爬虫输出的 forms 汇总或页面上的完整定义)，供解析 form_ref / api_ref
+
+        汇总在读取页面前登记，先到先得，因此引用的解析不依赖页面顺序 (批量模式按 URL 排序后，
+        引用可能排在完整定义之前)；页面上的定义只补充汇总尚未写出的跟随模式。
+        """
+        for form in forms:
+            if form.get("signature"):
+                key = (form.get("security_level") or level, form["signature"])
+                self.form_defs.setdefault(key, form)
+
+    def _points_to_probe(self, page_info: Dict) -> List[Dict]:
+        """返回页面需要探测的注入点：同一安全等级下签名相同的表单 / API (含 form_ref / api_ref) 只在首次遇到时探测"""
+        level = page_info.get('security_level', '') or ''
+        ref_types = {ref: kind for kind, ref in _SHARED_POINT_REFS.items()}
+        points = []
+        for point in page_info.get('injection_points', []):
+            sig = point.get('signature')
+            if not sig or (point['type'] not in _SHARED_POINT_REFS and point['type'] not in ref_types):
+                points.append(point)
+                continue
+            key = (level, sig)
+            if key in self._probed_forms:
+                continue
+            definition = self.form_defs.get(key) or (point if point['type'] in _SHARED_POINT_REFS else None)
+            if definition is None:
+                print(f"[!] 未找到 {point['type']} 的完整定义，跳过: {point.get('method', '')} {point.get('action', '')}")
+                continue
+            self._probed_forms.add(key)
+            points.append({**definition, 'type': ref_types.get(point['type'], point['type'])})
+        return points
+
+    async def _iter_pages(self, json_path: str, follow: bool):
+        """按文件格式产出 (base_url, 页面异步迭代器)
+
+        .jsonl 页面流惰性读取：follow=True 时边爬边提取，直到爬虫写出结束标记；
+        否则对已写出的页面做蓄水池采样，内存只保留被抽中的页面。
+        """
+        if is_page_stream(json_path):
+            reader = PageStreamReader(json_path, follow=follow)
+            base_url = await reader.open()
+            if follow:
+                print(f"[*] 跟随页面流 {json_path}，爬虫写出结束标记后停止")
+                return base_url, reader.__aiter__()
+            pages, seen = [], 0
+            for page_info in reader.iter_pages():
+                seen += 1
+                if len(pages) < 50:
+                    pages.append(page_info)
+                else:
+                    j = random.randrange(seen)
+                    if j < 50:
+                        pages[j] = page_info
+            if seen > 50:
+                print(f"[*] Pages count {seen} > 50, sampling 50 pages for training...")
+            self._learn_forms((reader.end or {}).get("forms", []))
+        else:
+            with open(json_path, 'r') as f:
+                data = json.load(f)
+            base_url = data['base_url']
+            pages = data['pages']
+            self._learn_forms(data.get('forms', []))
+
+            # [Optimization] 数据采样 (针对训练阶段)
+            # 如果页面过多，随机抽取 50 个进行训练数据采集
+            if len(pages) > 50:
+                print(f"[*] Pages count {len(pages)} > 50, sampling 50 pages for training...")
+                pages = random.sample(pages, 50)
+
+        async def _from_list():
+            for page_info in pages:
+                yield page_info
+        return base_url, _from_list()
+
+    async def process_file(self, json_path: str, headless: bool = True, follow: bool = False):
         """
         处理单个 Target JSON 文件 (并发版)
         """
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-            
-        base_url = data['base_url']
-        pages = data['pages']
-        
-        # [Optimization] 数据采样 (针对训练阶段)
-        # 如果页面过多，随机抽取 50 个进行训练数据采集
-        if len(pages) > 50:
-            print(f"[*] Pages count {len(pages)} > 50, sampling 50 pages for training...")
-            pages = random.sample(pages, 50)
+        base_url, pages = await self._iter_pages(json_path, follow)
 
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=headless)
-            # 创建 Context 并执行自动登录 (复用 Spider 逻辑或手动登录)
-            context = await browser.new_context()
-            
-            # 简单起见，这里针对 DVWA/Pikachu 做简单登录
-            page = await context.new_page()
+            # 创建 Context 并执行自动登录 (复用 Spider 逻辑)；已保存的会话仍有效时直接载入，跳过登录
             if "dvwa" in base_url:
-                await DVWASpider(base_url, "").auto_login(page)
+                spider = DVWASpider(base_url, "", session_dir=self.session_dir)
+                login = spider.auto_login
             elif "pikachu" in base_url:
-                await PikachuSpider(base_url, "").auto_login(page)
-            # --- 新增 bWAPP A.I.M 激活逻辑 ---
+                spider = PikachuSpider(base_url, "", session_dir=self.session_dir)
+                login = spider.auto_login
+            # --- 新增 bWAPP A.I.M 激活逻辑 (A.I.M. 免认证，无需保存会话) ---
             elif "bwapp" in base_url.lower():
                 print("[*] 检测到 bWAPP 目标，正在通过 A.I.M. 模式激活上下文...")
-                spider = BWAPPSpider(base_url, getattr(self, "cookies", ""))
-                await spider.init_browser(context)
-                # 即使不需要登录，也必须访问一次 aim.php 以确保后续页面可以直接访问
-                aim_url = f"{base_url}/aim.php" if not base_url.endswith("aim.php") else base_url
-                try:
-                    await page.goto(aim_url, wait_until="domcontentloaded", timeout=20000)
-                    try:
-                        await page.wait_for_load_state("networkidle", timeout=20000)
-                    except Exception:
-                        pass
-                    await asyncio.sleep(1)
-                except Exception as e:
-                    print(f"[!] bWAPP A.I.M 激活失败: {e}")
+                spider = BWAPPSpider(base_url, getattr(self, "cookies", ""), session_dir=None)
+                login = lambda pg: self._activate_aim(pg, base_url)
             # ------------------------------
-            await page.close()
-            
-            cookies = await context.cookies()
-            httpx_cookies = {c['name']: c['value'] for c in cookies}
-            self.http_client.cookies.update(httpx_cookies)
-            
-            # 并发执行页面探测
-            tasks = [self._process_page_concurrent(context, page_info) for page_info in pages]
-            await asyncio.gather(*tasks)
+            else:
+                spider = UniversalSpider(base_url, "", session_dir=None)
+                login = None
+            # 每个安全等级一套会话 (Context + httpx 客户端)，首次遇到该等级的页面时创建；
+            # DVWA 爬虫按等级保存会话并以 security Cookie 区分等级，其余靶场不区分等级
+            sessions: Dict[str, tuple] = {}
+
+            async def session_for(level: str) -> tuple:
+                if not isinstance(spider, DVWASpider):
+                    level = ""
+                if level not in sessions:
+                    level_spider = spider
+                    if level:
+                        level_spider = spider._fork(level)
+                        level_spider.cookies = f"security={level}"
+                    context, page = await level_spider.open_session(browser, level, level_spider.auto_login if level else login,
+                                                                    resource_policy=self.resource_policy)
+                    await page.close()
+                    # 无等级的会话沿用共享的 http_client (扫描器等外部调用方也使用它)
+                    client = self.http_client if not level else httpx.AsyncClient(
+                        verify=False, timeout=10.0, follow_redirects=True, headers=self.default_headers)
+                    client.cookies.update({c['name']: c['value'] for c in await context.cookies()})
+                    sessions[level] = (context, client)
+                return sessions[level]
+
+            # 并发执行页面探测：边读边派发，在途任务数有上限，页面流再大也不会一次性建出全部任务
+            pending = set()
+            async for page_info in pages:
+                level = page_info.get('security_level', '') or ''
+                # 跟随模式下汇总尚未写出，form_ref 依赖此前页面上的完整表单解析
+                self._learn_forms([p for p in page_info.get('injection_points', []) if p['type'] in _SHARED_POINT_REFS], level)
+                context, client = await session_for(level)
+                if len(pending) >= self.page_concurrency * 2:
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.add(asyncio.create_task(self._process_page_concurrent(context, page_info, client)))
+            if pending:
+                await asyncio.gather(*pending)
+            for _, client in sessions.values():
+                if client is not self.http_client:
+                    await client.aclose()
             
+            print(self.resource_policy.summary())
+            print(self.rate_limiter.summary())
+            print(self.settler.summary())
+            print(self.baseline_cache.summary())
             await browser.close()
         
         await self.http_client.aclose()
 
+    async def _activate_aim(self, page: Page, base_url: str):
+        """bWAPP 即使不需要登录，也必须访问一次 aim.php 以确保后续页面可以直接访问"""
+        aim_url = f"{base_url}/aim.php" if not base_url.endswith("aim.php") else base_url
+        try:
+            await page.goto(aim_url, wait_until="domcontentloaded", timeout=20000)
+            try:
+                await page.wait_for_load_state("networkidle", timeout=20000)
+            except Exception:
+                pass
+            await asyncio.sleep(1)
+        except Exception as e:
+            print(f"[!] bWAPP A.I.M 激活失败: {e}")
+
     def save_vectors(self, output_file: str = "data/features.json"):
         with open(output_file, 'w') as f:
             json.dump(self.vectors, f, indent=2)
@@ -452,19 +734,33 @@ class FeatureExtractor:
 
 async def main():
     parser = argparse.ArgumentParser(description="V-APF 特征提取器")
-    parser.add_argument("--targets", nargs="+", help="目标 JSON 文件列表", required=True)
+    parser.add_argument("--targets", nargs="+", help="目标 JSON / JSONL 文件列表", required=True)
     parser.add_argument("--output", default="data/features.json", help="输出特征文件")
     parser.add_argument("--cookie", default="", help="登录 Cookie 字符串")
     parser.add_argument("--no-headless", dest="headless", action="store_false", default=True, help="运行可见浏览器")
+    parser.add_argument("--rate", type=float, default=5.0, help="每个主机的初始请求速率 (req/s)，按 AIMD 自适应调整，0 为不限速 (默认 5)")
+    parser.add_argument("--max-rate", type=float, default=50.0, help="每个主机的速率上限 (req/s，默认 50)")
+    parser.add_argument("--session-dir", default="data/sessions", help="登录会话 (storage_state) 的保存目录，与爬虫共用 (默认 data/sessions)")
+    parser.add_argument("--follow", action="store_true", help="跟随仍在写入的 .jsonl 页面流 (边爬边提取)，不做页面采样")
+    parser.add_argument("--similarity", default="chars", choices=list(ENGINES), help="v5 相似度引擎 (默认 chars，与 difflib quick_ratio 一致)")
+    parser.add_argument("--page-concurrency", type=int, default=5, help="同时处理的页面数 (默认 5)")
+    parser.add_argument("--probe-concurrency", type=int, default=10, help="每个主机同时在途的 Payload 探测数 (默认 10)，实际速率仍由 --rate 自适应限速")
+    parser.add_argument("--baseline-dir", default="data/baselines", help="基准响应缓存目录，与扫描器共用 (默认 data/baselines)")
+    parser.add_argument("--baseline-ttl", type=float, default=600.0, help="基准缓存有效期 (秒，默认 600，0 为关闭缓存)")
+    parser.add_argument("--baseline-revalidate", type=float, default=60.0, help="缓存基准超过该秒数后命中时先用 httpx 校验 (默认 60，负数为不校验)")
     args = parser.parse_args()
+    RateLimiter.shared().configure(args.rate, args.max_rate)
 
-    extractor = FeatureExtractor(cookies=args.cookie)
+    extractor = FeatureExtractor(cookies=args.cookie, session_dir=args.session_dir, similarity=args.similarity,
+                                 baseline_dir=args.baseline_dir, baseline_ttl=args.baseline_ttl,
+                                 baseline_revalidate=args.baseline_revalidate if args.baseline_revalidate >= 0 else None,
+                                 page_concurrency=args.page_concurrency, probe_concurrency=args.probe_concurrency)
     
     # 也可以自动扫描 data/ 目录下的所有 targets_*.json
     targets = args.targets
     
     for target_file in targets:
-        await extractor.process_file(target_file, headless=args.headless)
+        await extractor.process_file(target_file, headless=args.headless, follow=args.follow)
         
     extractor.save_vectors(args.output)
 
@@ -0,0 +1,74 @@
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# CSRF token、Session ID、时间戳等每次加载都会变化的长串，归一化时统一替换
+_VOLATILE_RE = re.compile(r"(?<![0-9A-Za-z])(?=[0-9A-Za-z_\-]*\d)[0-9A-Za-z_\-]{16,}(?![0-9A-Za-z])")
+_WS_RE = re.compile(r"\s+")
+# SimHash 特征：标签名 + 文本词 (含中文)
+_FEATURE_RE = re.compile(r"<\s*/?\s*([a-zA-Z][\w-]*)|[^\W\d_]{2,}")
+
+
+def normalize_dom(content: str) -> str:
+    """归一化页面内容：替换易变令牌并折叠空白，使同一页面多次加载得到相同结果"""
+    return _WS_RE.sub(" ", _VOLATILE_RE.sub("{token}", content or "")).strip()
+
+
+def stable_hash(content: str) -> str:
+    """跨进程稳定的内容指纹 (归一化后的 SHA-1)，替代受 PYTHONHASHSEED 影响的 hash()"""
+    return hashlib.sha1(normalize_dom(content).encode("utf-8", "replace")).hexdigest()
+
+
+def simhash(content: str, shingle: int = 3) -> int:
+    """64 位 SimHash：以标签/词的 shingle 为特征，内容相近的页面汉明距离小"""
+    tokens = [
+        f"<{m.group(1).lower()}" if m.group(1) else m.group(0).lower()
+        for m in _FEATURE_RE.finditer(normalize_dom(content))
+    ]
+    if not tokens:
+        return 0
+    shingles = [" ".join(tokens[i:i + shingle]) for i in range(max(1, len(tokens) - shingle + 1))]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    # (N, 64) 位矩阵按列投票，显式小端序保证跨平台结果一致
+    bits = np.unpackbits(hashes.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int(sum(1 << int(i) for i in np.nonzero(votes > 0)[0]))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    """SimHash 近似重复索引
+
+    把 64 位指纹切成 max_distance + 1 段建立倒排：汉明距离不超过 max_distance 的两个指纹
+    至少有一段完全相同 (抽屉原理)，因此只需比较同段命中的候选。
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max(0, max_distance)
+        band_count = self.max_distance + 1
+        width = 64 // band_count
+        self._bands = [(i * width, 64 - i * width if i == band_count - 1 else width) for i in range(band_count)]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+
+    def _keys(self, value: int) -> List[int]:
+        return [(value >> shift) & ((1 << width) - 1) for shift, width in self._bands]
+
+    def find(self, value: int) -> Optional[int]:
+        """返回索引中与 value 近似重复的指纹，没有则返回 None"""
+        for table, key in zip(self._tables, self._keys(value)):
+            for other in table.get(key, ()):
+                if hamming_distance(value, other) <= self.max_distance:
+                    return other
+        return None
+
+    def add(self, value: int):
+        for table, key in zip(self._tables, self._keys(value)):
+            table.setdefault(key, []).append(value)
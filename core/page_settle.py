@@ -0,0 +1,103 @@
+import asyncio
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+from playwright.async_api import Page, Response
+
+# 页面内的 DOM 变动观察器：记录最近一次变动的时间 (performance.now()，毫秒)；重复安装无副作用
+_INSTALL_OBSERVER = """() => {
+    if (window.__vapfSettle) return;
+    const state = window.__vapfSettle = { last: performance.now() };
+    new MutationObserver(() => { state.last = performance.now(); })
+        .observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+}"""
+_DOM_QUIET_FOR = "() => window.__vapfSettle ? (performance.now() - window.__vapfSettle.last) / 1000 : null"
+
+
+class _RequestTracker:
+    """通过 page.on 事件跟踪页面的在途请求与最近一次网络活动时间"""
+
+    def __init__(self, page: Page):
+        self.pending: Dict[Any, float] = {}
+        self.last_activity = time.monotonic()
+        page.on("request", self._started)
+        page.on("requestfinished", self._done)
+        page.on("requestfailed", self._done)
+
+    def _started(self, request):
+        self.pending[request] = self.last_activity = time.monotonic()
+
+    def _done(self, request):
+        self.pending.pop(request, None)
+        self.last_activity = time.monotonic()
+
+    def quiet_for(self, long_request: float) -> float:
+        """网络已安静的秒数；在途超过 long_request 秒的请求视为长轮询 / 流式连接，不阻止安静判定"""
+        now = time.monotonic()
+        if any(now - started < long_request for started in self.pending.values()):
+            return 0.0
+        return now - self.last_activity
+
+
+class PageSettler:
+    """自适应的页面稳定判定 (爬虫 / 提取器 / 扫描器共用)
+
+    取代固定的 networkidle 等待：页面内 MutationObserver 记录 DOM 变动，page.on 事件跟踪在途请求，
+    两者都安静满 quiet 秒即视为稳定；长轮询请求超过 long_request 秒后不再计入，总等待不超过 timeout 秒。
+    因此每次导航的等待时间取决于页面实际稳定所需的时间，长轮询页面也不会耗满超时。
+    """
+
+    def __init__(self, quiet: float = 0.5, timeout: float = 8.0, long_request: float = 1.0, poll_interval: float = 0.1):
+        self.quiet = quiet
+        self.timeout = timeout
+        self.long_request = long_request
+        self.poll_interval = poll_interval
+        self._trackers: "weakref.WeakKeyDictionary[Page, _RequestTracker]" = weakref.WeakKeyDictionary()
+        self.stats = {"settled": 0, "capped": 0}
+
+    def attach(self, page: Page) -> _RequestTracker:
+        """开始跟踪 page 的请求 (幂等)；应在导航之前调用，settle 中未 attach 的页面会补登记"""
+        tracker = self._trackers.get(page)
+        if tracker is None:
+            tracker = self._trackers[page] = _RequestTracker(page)
+        return tracker
+
+    async def goto(self, page: Page, url: str, timeout: float = 20000) -> Optional[Response]:
+        """导航到 DOMContentLoaded 后等待页面稳定"""
+        self.attach(page)
+        response = await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+        await self.settle(page)
+        return response
+
+    async def settle(self, page: Page) -> bool:
+        """等待页面稳定，返回 True；达到 timeout 上限仍未稳定时返回 False (不抛异常)"""
+        tracker = self.attach(page)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                dom_quiet = await page.evaluate(_DOM_QUIET_FOR)
+                if dom_quiet is None:
+                    # 首次检查或页面已跳转到新文档：重新安装观察器，从此刻开始计算安静时间
+                    await page.evaluate(_INSTALL_OBSERVER)
+                    dom_quiet = 0.0
+            except Exception:
+                if page.is_closed():
+                    return False
+                # 脚本跳转导致执行上下文销毁等，稍后重试
+                dom_quiet = 0.0
+            if min(dom_quiet, tracker.quiet_for(self.long_request)) >= self.quiet:
+                self.stats["settled"] += 1
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats["capped"] += 1
+                return False
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+    def summary(self) -> str:
+        total = self.stats["settled"] + self.stats["capped"]
+        if not total:
+            return "[*] 页面稳定判定: 未导航"
+        return (f"[*] 页面稳定判定: {total} 次导航，{self.stats['capped']} 次达到 {self.timeout:.0f}s 上限 "
+                f"(安静窗口 {self.quiet:.1f}s)")
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+# JSONL 页面流格式：
+#   第一行  {"_meta": "start", "base_url": ...}
+#   每行一个页面记录 (结构与 targets_*.json 中 pages 的元素相同)
+#   最后一行 {"_meta": "end", "pages": N, "template_siblings": {等级: {模板: 折叠数}}, "forms": [唯一表单]}，
+#   缺失表示爬取仍在进行或异常中断
+
+
+def is_page_stream(path: str) -> bool:
+    """按扩展名判断是否为 JSONL 页面流 (否则视为传统的单个 JSON 文件)"""
+    return path.lower().endswith(".jsonl")
+
+
+class PageStreamWriter:
+    """爬虫结果的 JSONL 追加写入器：每分析完一个页面立即写出一行并 flush"""
+
+    def __init__(self, path: str, base_url: str, resume: bool = False):
+        self.path = path
+        self.pages = 0
+        # 各安全等级 (单次爬取为 "") 的模板折叠数，页面写出后无法回填，统一写入结束标记
+        self.template_siblings: Dict[str, Dict[str, int]] = {}
+        # 去重后的唯一表单 (含出现页面列表)，同样在结束标记中写出
+        self.forms: List[Dict[str, Any]] = []
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 续爬且上次未正常结束时追加写入，否则重新开始
+        if resume and os.path.exists(path) and not PageStreamReader(path).finished():
+            self._truncate_partial_line()
+            self.pages = sum(1 for _ in PageStreamReader(path).iter_pages())
+            self.f = open(path, "a", encoding="utf-8")
+        else:
+            self.f = open(path, "w", encoding="utf-8")
+            self._write({"_meta": "start", "base_url": base_url})
+
+    def _truncate_partial_line(self):
+        """去掉异常中断时写了一半的最后一行"""
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _write(self, record: Dict[str, Any]):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def write(self, page: Dict[str, Any]):
+        self._write(page)
+        self.pages += 1
+
+    def close(self, complete: bool = True):
+        """关闭文件；complete=True 时写入结束标记，否则保持未完成状态以便 --resume 继续追加"""
+        if complete:
+            self._write({"_meta": "end", "pages": self.pages, "template_siblings": self.template_siblings,
+                         "forms": self.forms})
+        self.f.close()
+
+
+class PageStreamReader:
+    """JSONL 页面流的惰性读取器
+
+    follow=True 时会等待文件出现并持续跟随写入 (类似 tail -f)，读到结束标记后停止，
+    因此提取器可以在爬虫运行期间同步消费页面；follow=False 时读到文件末尾即停止。
+    """
+
+    def __init__(self, path: str, follow: bool = False, poll_interval: float = 1.0):
+        self.path = path
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.base_url: Optional[str] = None
+        self.end: Optional[Dict[str, Any]] = None
+        self._f = None
+
+    def _next_record(self) -> Optional[Dict[str, Any]]:
+        """读取下一条完整记录；暂无完整行时返回 None (未写完的行留待下次读取)"""
+        if self._f is None:
+            if not os.path.exists(self.path):
+                return None
+            self._f = open(self.path, "r", encoding="utf-8")
+        while True:
+            pos = self._f.tell()
+            line = self._f.readline()
+            if not line.endswith("\n"):
+                self._f.seek(pos)
+                return None
+            if line.strip():
+                return json.loads(line)
+
+    def _read(self) -> Iterator[Optional[Dict[str, Any]]]:
+        """逐条产出页面记录；遇到暂无数据时产出 None，由调用方决定等待还是结束"""
+        while self.end is None:
+            record = self._next_record()
+            if record is None:
+                yield None
+            elif record.get("_meta") == "start":
+                self.base_url = record.get("base_url")
+            elif record.get("_meta") == "end":
+                self.end = record
+            else:
+                yield record
+        self.close()
+
+    def iter_pages(self) -> Iterator[Dict[str, Any]]:
+        """同步读取当前已写出的全部页面 (不跟随)"""
+        for record in self._read():
+            if record is None:
+                self.close()
+                return
+            yield record
+
+    async def open(self) -> str:
+        """读取文件头并返回 base_url；follow 模式下会等待爬虫写出文件头"""
+        while self.base_url is None:
+            record = self._next_record()
+            if record is not None and record.get("_meta") == "start":
+                self.base_url = record.get("base_url")
+            elif record is not None:
+                raise ValueError(f"{self.path} 缺少 JSONL 文件头")
+            elif not self.follow:
+                raise ValueError(f"{self.path} 为空或不完整")
+            else:
+                await asyncio.sleep(self.poll_interval)
+        return self.base_url
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        for record in self._read():
+            if record is not None:
+                yield record
+            elif self.follow:
+                await asyncio.sleep(self.poll_interval)
+            else:
+                self.close()
+                return
+
+    def finished(self) -> bool:
+        """文件是否已写入结束标记 (即对应的爬取已正常完成)"""
+        for _ in self.iter_pages():
+            pass
+        return self.end is not None
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
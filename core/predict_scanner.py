@@ -15,6 +15,10 @@ sys.path.append(os.getcwd())
 
 from core.extractor import FeatureExtractor
 from core.mutator import VAPFMutator
+from core.resource_policy import ResourcePolicy
+from core.session_store import SessionStore
+from core.signatures import SignatureSet
+from core.similarity import ENGINES
 from core.exploit_engine import run_sqlmap, run_beef_xss, run_commix, run_msfconsole_cmd
 from playwright.async_api import async_playwright
 from sklearn.preprocessing import MinMaxScaler
@@ -22,14 +26,41 @@ from sklearn.preprocessing import MinMaxScaler
 DEFAULT_THRESHOLD = 0.65
 FEATURE_NAMES = [f"v{i+1}" for i in range(13)]
 
+# 载荷形态先验：按 sql -> cmd -> xss 的优先级判定
+PAYLOAD_PRIOR_MARKERS = SignatureSet({
+    "sql": ["union", "select", "sleep(", "benchmark(", " or ", " and ", "'", "\"", "--", "#", "/*"],
+    "cmd": ["&&", "||", "|", "`", "$(", ";", "whoami", "id", "uname", "cat ", "wget ", "curl ", "nc "],
+    "xss": ["<script", "onerror=", "onload=", "javascript:", "<img", "<svg", "<iframe", "alert("],
+})
+# 自动利用分诊的载荷标记；注意：不要把单引号/双引号当作 SQL 强信号（会导致 XSS 靶场也几乎总走 sqlmap）
+EXPLOIT_PAYLOAD_MARKERS = SignatureSet({
+    "sql": [
+        "union select", "union all", "information_schema", "@@version", "sleep(", "benchmark(",
+        "extractvalue(", "updatexml(", " or 1=1", " and 1=1", "--", "/*",
+    ],
+    "xss": ["<script", "</script", "onerror=", "onload=", "javascript:", "<img", "<svg", "<iframe", "alert("],
+    "cmd": ["&&", "||", "`", "$(", "|", "wget ", "curl ", "nc ", "bash", "sh "],
+})
+
 class VAPFPredictScanner:
-    def __init__(self, model_path="models/vapf_rf_model.pkl", scaler_path="models/scaler.pkl", default_headers=None):
+    def __init__(self, model_path="models/vapf_rf_model.pkl", scaler_path="models/scaler.pkl", default_headers=None,
+                 session_dir="data/sessions", similarity="chars", baseline_dir="data/baselines", baseline_ttl=600.0,
+                 baseline_revalidate=60.0, security_level=""):
         print("[*] 正在加载 V-APF AI 引擎...")
         self.model = joblib.load(model_path)
         self.scaler = joblib.load(scaler_path)
-        # 实例化提取器，仅用于复用它的 compute_13_vector 逻辑
-        self.extractor = FeatureExtractor(default_headers=default_headers)
+        # 实例化提取器，仅用于复用它的 compute_13_vector 逻辑；v5 相似度引擎须与训练数据一致
+        # 基准缓存与提取器共用，深度复验等重复扫描同一 URL 时不再重新渲染基准
+        self.extractor = FeatureExtractor(default_headers=default_headers, session_dir=session_dir, similarity=similarity,
+                                          baseline_dir=baseline_dir, baseline_ttl=baseline_ttl,
+                                          baseline_revalidate=baseline_revalidate)
+        # 爬虫 / 提取器保存的登录会话，目标 URL 落在其 base_url 下时直接载入
+        self.session_store = SessionStore(session_dir) if session_dir else None
+        # 载入哪个安全等级的会话 (DVWA 等按等级保存)，空字符串为默认等级
+        self.security_level = security_level
         self.mutator = VAPFMutator() # 实例化变异引擎
+        self.resource_policy = ResourcePolicy(keep_scripts=False) # 拦截重资源，脚本仅对 XSS 探测放行
+        self.rate_limiter = self.extractor.rate_limiter # 按主机自适应限速，所有探测经 extractor 发出
         self.final_results = [] # 新增：用于存储所有探测结果
         # 运行期配置在 scan_url 中设置
         self.sem = None
@@ -41,17 +72,7 @@ class VAPFPredictScanner:
         self.baseline_status = None
 
     def _detect_payload_prior(self, payload: str | None) -> str:
-        p = (payload or "").lower()
-        sql_markers = ["union", "select", "sleep(", "benchmark(", " or ", " and ", "'", "\"", "--", "#", "/*"]
-        cmd_markers = ["&&", "||", "|", "`", "$(", ";", "whoami", "id", "uname", "cat ", "wget ", "curl ", "nc "]
-        xss_markers = ["<script", "onerror=", "onload=", "javascript:", "<img", "<svg", "<iframe", "alert("]
-        if any(m in p for m in sql_markers):
-            return "sql"
-        if any(m in p for m in cmd_markers):
-            return "cmd"
-        if any(m in p for m in xss_markers):
-            return "xss"
-        return "unknown"
+        return PAYLOAD_PRIOR_MARKERS.first((payload or "").lower()) or "unknown"
 
     def _apply_signal_sanity(self, prob: float, vector, status: int | None, payload: str | None = None):
         """
@@ -121,6 +142,7 @@ class VAPFPredictScanner:
     async def _scan_single_payload(self, page, target_url, method, params, param_name, payload, base_data, threshold=DEFAULT_THRESHOLD):
         async with self.sem:
             probe_page = await page.context.new_page()
+            await self.resource_policy.apply(probe_page, keep_scripts=ResourcePolicy.needs_scripts(payload))
             # 自动处理 JS 弹窗（alert/confirm/prompt），避免阻塞探测
             probe_page.on("dialog", lambda dialog: asyncio.create_task(dialog.dismiss()))
             try:
@@ -157,6 +179,7 @@ class VAPFPredictScanner:
                     "waf_reason": waf_reason,
                     "response_status": probe_data.get("status"),
                     "response_headers": probe_data.get("headers", {}),
+                    "error_signatures": probe_data.get("signatures", {}),
                     "signal_tag": signal_tag,
                     "snapshot": {
                         "base": base_data.get("text", "")[:2000],
@@ -200,6 +223,7 @@ class VAPFPredictScanner:
         self.waf_hits = 0
         self.total_tests = 0
         self.baseline_status = None
+        self.resource_policy.reset()
 
         html_path, pdf_path = self._build_report_paths(target_url, report_name, report_dir, suffix=report_suffix)
         print(f"\n[+] 开始 AI 扫描: {target_url} [{method}] [Mode: {scan_mode}] [Threshold: {threshold}] [Headless: {headless}]")
@@ -240,15 +264,21 @@ class VAPFPredictScanner:
                 browser = await p.chromium.launch(headless=headless)
                 if headers:
                     self.extractor.set_default_headers(headers)
-                context = await browser.new_context(extra_http_headers=headers or {})
+                state = await self.session_store.load(target_url, level=self.security_level) if self.session_store else None
+                if state:
+                    SessionStore.apply_cookies(state, self.extractor.http_client)
+                context = await browser.new_context(extra_http_headers=headers or {}, storage_state=state)
+                await self.resource_policy.apply(context)
                 page = await context.new_page()
+                # 基准页与组合/全参数探测共用此页面，保留脚本以便与 XSS 探测条件一致
+                await self.resource_policy.apply(page, keep_scripts=True)
                 # 自动处理 JS 弹窗（alert/confirm/prompt），避免阻塞基准页/组合探测页
                 page.on("dialog", lambda dialog: asyncio.create_task(dialog.dismiss()))
 
                 # 1. 获取 Baseline (基准响应)
                 print("    [*] 正在建立语义基准...")
-                # Fetch baseline once
-                base_data = await self.extractor.fetch_page_features(page, target_url, method, params)
+                # Fetch baseline once (经基准缓存，同一会话下重复扫描直接复用)
+                base_data = await self.extractor.fetch_baseline(page, target_url, method, params)
                 self.baseline_status = base_data.get("status")
 
                 # Define injectable parameters
@@ -344,6 +374,7 @@ class VAPFPredictScanner:
                                             "vector": current_vector,
                                             "response_status": probe_data.get("status"),
                                             "response_headers": probe_data.get("headers", {}),
+                                            "error_signatures": probe_data.get("signatures", {}),
                                             "signal_tag": signal_tag,
                                             "snapshot": {
                                                 "base": base_data.get("text", "")[:2000],
@@ -385,6 +416,7 @@ class VAPFPredictScanner:
                                     "vector": current_vector,
                                     "response_status": probe_data.get("status"),
                                     "response_headers": probe_data.get("headers", {}),
+                                    "error_signatures": probe_data.get("signatures", {}),
                                     "signal_tag": signal_tag,
                                     "snapshot": {
                                         "base": base_data.get("text", "")[:2000],
@@ -416,6 +448,10 @@ class VAPFPredictScanner:
                         await browser.close()
                     except Exception:
                         pass
+                print(f"    {self.resource_policy.summary()}")
+                print(f"    {self.rate_limiter.summary()}")
+                print(f"    {self.extractor.settler.summary()}")
+                print(f"    {self.extractor.baseline_cache.summary()}")
 
                 # 若 WAF 拦截占比高，给出提示
                 if self.total_tests > 0 and self.waf_hits / self.total_tests > 0.3:
@@ -436,7 +472,8 @@ class VAPFPredictScanner:
                     pdf_reporter = VAPFPDFGenerator(self.final_results, critical_threshold=self.current_critical_threshold)
                     await pdf_reporter.generate(pdf_path)
 
-    async def _auto_exploit_logic(self, url, param, payload, vector, score, sqlmap_path, exploit_timeout, beef_xss_path, commix_path):
+    async def _auto_exploit_logic(self, url, param, payload, vector, score, sqlmap_path, exploit_timeout, beef_xss_path, commix_path,
+                                  error_signatures=None):
         """基于 13 维向量的分诊中心，按特征触发唯一工具并可提前结束。
 
         关键原则：
@@ -472,29 +509,14 @@ class VAPFPredictScanner:
         except Exception:
             dom_sim = 1.0
 
-        # 注意：不要把单引号/双引号当作 SQL 强信号（会导致 XSS 靶场也几乎总走 sqlmap）
-        payload_has_sql = any(k in payload_l for k in [
-            "union select",
-            "union all",
-            "information_schema",
-            "@@version",
-            "sleep(",
-            "benchmark(",
-            "extractvalue(",
-            "updatexml(",
-            " or 1=1",
-            " and 1=1",
-            "--",
-            "/*",
-        ])
-        payload_has_xss = any(k in payload_l for k in [
-            "<script", "</script", "onerror=", "onload=", "javascript:", "<img", "<svg", "<iframe", "alert("
-        ])
-        payload_has_cmd = any(k in payload_l for k in [
-            "&&", "||", "`", "$(", "|", "wget ", "curl ", "nc ", "bash", "sh "
-        ])
-
-        sql_signal = (delay_s > 2.0) or (err_score > 0.1) or payload_has_sql
+        markers = EXPLOIT_PAYLOAD_MARKERS.scan(payload_l)
+        payload_has_sql = "sql" in markers
+        payload_has_xss = "xss" in markers
+        payload_has_cmd = "cmd" in markers
+        # 响应中出现数据库报错签名同样视为 SQL 信号
+        dbms_errors = bool((error_signatures or {}).get("dbms"))
+
+        sql_signal = (delay_s > 2.0) or (err_score > 0.1) or payload_has_sql or dbms_errors
         # XSS 触发条件：反射强 + payload 像 XSS，且没有明显 SQL 信号（避免 SQLi 被 BeEF 抢跑）
         xss_signal = (reflect >= 0.6) and payload_has_xss and (delay_s <= 2.0) and (err_score <= 0.1) and (not payload_has_sql)
         rce_signal = (not sql_signal) and (not xss_signal) and ((dom_sim < 0.5) or payload_has_cmd)
@@ -572,7 +594,8 @@ class VAPFPredictScanner:
 
             results, attempted = await self._auto_exploit_logic(
                 target_url, param, payload, vector, score,
-                sqlmap_path, exploit_timeout, beef_xss_path, commix_path
+                sqlmap_path, exploit_timeout, beef_xss_path, commix_path,
+                error_signatures=r.get("error_signatures"),
             )
 
             if attempted:
@@ -641,6 +664,11 @@ if __name__ == "__main__":
     parser.add_argument("--header", action="append", help="自定义 Header，格式 'Key: Value'，可重复指定")
     parser.add_argument("--report-name", default=None, help="自定义报告基名（将自动附加时间戳）；默认按 URL 生成")
     parser.add_argument("--report-dir", default="reports", help="报告输出目录（默认 reports）")
+    parser.add_argument("--session-dir", default="data/sessions", help="已保存登录会话的目录，与爬虫/提取器共用（默认 data/sessions）")
+    parser.add_argument("--security-level", default="", help="载入该安全等级下保存的会话（如 DVWA 的 low/medium/high），默认使用默认等级")
+    parser.add_argument("--similarity", default="chars", choices=list(ENGINES), help="v5 相似度引擎，须与训练数据采集时一致（默认 chars）")
+    parser.add_argument("--baseline-dir", default="data/baselines", help="基准响应缓存目录，与提取器共用（默认 data/baselines）")
+    parser.add_argument("--baseline-ttl", type=float, default=600.0, help="基准缓存有效期秒数（默认 600，0 为关闭缓存）")
     # 互斥的 headless 控制，默认无头
     headless_group = parser.add_mutually_exclusive_group()
     headless_group.add_argument("--headless", dest="headless", action="store_true", help="启用无头模式（默认）")
@@ -659,7 +687,9 @@ if __name__ == "__main__":
                 headers_dict[k.strip()] = v.strip()
     headers_dict = headers_dict or None
 
-    scanner = VAPFPredictScanner(default_headers=headers_dict)
+    scanner = VAPFPredictScanner(default_headers=headers_dict, session_dir=args.session_dir, similarity=args.similarity,
+                                 baseline_dir=args.baseline_dir, baseline_ttl=args.baseline_ttl,
+                                 security_level=args.security_level)
     asyncio.run(
         scanner.scan_url(
             args.url,
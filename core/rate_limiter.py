@@ -0,0 +1,147 @@
+import asyncio
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+
+class HostBucket:
+    """单个主机的令牌桶，速率按 AIMD 自适应
+
+    - 慢启动：首次出现过载信号之前，每个正常响应把速率提高 increase，速率约每秒翻倍；
+    - 加性增：之后响应正常且延迟未明显高于平滑基线时，每个响应把速率提高 increase / rate，
+      即大约每秒 +increase req/s；
+    - 乘性减：429/503 或超时时速率乘以 backoff，并在一个平滑延迟周期内只减一次，
+      避免同一波并发失败把速率连续砍到底；响应带 Retry-After 时整个主机暂停相应时长。
+    """
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float,
+                 increase: float = 1.0, backoff: float = 0.5, latency_tolerance: float = 2.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.last_backoff = 0.0
+        self.slow_start = True
+        self.stats = {"requests": 0, "throttled": 0, "timeouts": 0}
+
+    async def acquire(self):
+        """领取一个令牌；令牌不足时预支并等待到对应时刻 (先到先得，无需锁)"""
+        now = time.monotonic()
+        if self.resume_at > now:
+            await asyncio.sleep(self.resume_at - now)
+            now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        self.stats["requests"] += 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def _set_rate(self, rate: float):
+        # 改变速率前先按旧速率结算已累积的令牌
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def _back_off(self):
+        now = time.monotonic()
+        if now - self.last_backoff < max(0.5, self.latency_ewma or 0.0):
+            return
+        self.last_backoff = now
+        self.slow_start = False
+        self._set_rate(self.rate * self.backoff)
+
+    def record(self, latency: float, status: Optional[int] = None, retry_after: Optional[float] = None):
+        """根据一次完成的请求调整速率"""
+        if status in (429, 503):
+            self.stats["throttled"] += 1
+            if retry_after:
+                self.resume_at = max(self.resume_at, time.monotonic() + min(retry_after, 60.0))
+            self._back_off()
+            return
+        stable = self.latency_ewma is None or latency <= self.latency_ewma * self.latency_tolerance
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if stable:
+            step = self.increase if self.slow_start else self.increase / max(self.rate, 1.0)
+            self._set_rate(self.rate + step)
+
+    def record_timeout(self):
+        self.stats["timeouts"] += 1
+        self._back_off()
+
+
+class RateLimiter:
+    """按主机划分的自适应限速器 (爬虫 / 提取器 / 扫描器共用)
+
+    同一进程内通过 RateLimiter.shared() 取得同一个实例，因此 httpx 与 Playwright 两条路径、
+    以及同时运行的多个组件对同一主机的请求共用一个令牌桶。rate 为 0 时不限速。
+    """
+
+    _shared: Optional["RateLimiter"] = None
+
+    def __init__(self, rate: float = 5.0, max_rate: float = 50.0, min_rate: float = 0.5):
+        self.buckets: Dict[str, HostBucket] = {}
+        self.configure(rate, max_rate, min_rate)
+
+    @classmethod
+    def shared(cls) -> "RateLimiter":
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def configure(self, rate: float = 5.0, max_rate: float = 50.0, min_rate: float = 0.5):
+        """设置初始速率与上下限 (req/s)，只影响之后新建的主机令牌桶"""
+        self.enabled = rate > 0
+        self.rate = rate
+        self.max_rate = max(rate, max_rate)
+        self.min_rate = min(rate, min_rate) if rate > 0 else min_rate
+
+    def _bucket(self, url: str) -> Optional[HostBucket]:
+        if not self.enabled:
+            return None
+        host = urlparse(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = HostBucket(self.rate, self.min_rate, self.max_rate, burst=max(1.0, self.rate))
+        return bucket
+
+    async def acquire(self, url: str):
+        bucket = self._bucket(url)
+        if bucket:
+            await bucket.acquire()
+
+    def record(self, url: str, latency: float, status: Optional[int] = None, headers: Optional[Dict[str, str]] = None):
+        """反馈一次完成的请求 (状态码与延迟)；headers 用于读取 Retry-After"""
+        bucket = self._bucket(url)
+        if not bucket:
+            return
+        retry_after = None
+        if status in (429, 503) and headers:
+            value = {k.lower(): v for k, v in headers.items()}.get("retry-after", "")
+            retry_after = float(value) if str(value).strip().isdigit() else None
+        bucket.record(latency, status, retry_after)
+
+    def record_error(self, url: str, exc: BaseException):
+        """反馈一次失败的请求；只有超时视为过载信号，其余错误 (连接拒绝、DNS 等) 不影响速率"""
+        bucket = self._bucket(url)
+        if bucket and (isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError)) or "Timeout" in type(exc).__name__):
+            bucket.record_timeout()
+
+    def summary(self) -> str:
+        if not self.buckets:
+            return "[*] 自适应限速: 未发出请求"
+        parts = [
+            f"{host} {b.rate:.1f} req/s (请求 {b.stats['requests']}，限流 {b.stats['throttled']}，超时 {b.stats['timeouts']})"
+            for host, b in self.buckets.items()
+        ]
+        return "[*] 自适应限速: " + "; ".join(parts)
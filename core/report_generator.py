@@ -5,7 +5,17 @@ import re
 from jinja2 import Environment
 from playwright.async_api import async_playwright
 
+from core.signatures import SignatureSet
+
 DEFAULT_CRITICAL_THRESHOLD = 0.65
+# 载荷类型标记：按 sql -> cmd -> ssti -> dir -> xss 的优先级判定
+PAYLOAD_TYPE_MARKERS = SignatureSet({
+    "sql": ["'", "\"", " or ", " and ", "union", "select", "sleep(", "benchmark", "1=1", "1=2", "--", "/*"],
+    "cmd": [";", "&&", "||", "|", "`", "$(", "& ping", "& whoami", "cat /etc", "id", "curl ", "wget "],
+    "ssti": ["{{", "${"],
+    "dir": ["../", "..\\"],
+    "xss": ["<script", "onerror", "onload", "javascript:", "iframe", "alert(", "prompt(", "confirm(", "<img", "<svg"],
+})
 FALLBACK_SNAPSHOT_MSG = "页面响应异常/无有效回显，以下为截断内容"
 
 class VAPFReportGenerator:
@@ -41,24 +51,9 @@ class VAPFReportGenerator:
         - SQL 载荷形态可以作为强先验（因为 SQLi 往往不依赖“反射”就可成立）。
         - XSS 载荷形态不能单独作为结论：若向量反射分很低，应返回 unknown，避免“cat=1 但 payload 变异得像脚本就被判 XSS”。
         """
-        p = (payload or "").lower()
-        sql_markers = ["'", "\"", " or ", " and ", "union", "select", "sleep(", "benchmark", "1=1", "1=2", "--", "/*"]
-        xss_markers = ["<script", "onerror", "onload", "javascript:", "iframe", "alert(", "prompt(", "confirm(", "<img", "<svg"]
-        cmd_markers = [";", "&&", "||", "|", "`", "$(", "& ping", "& whoami", "cat /etc", "id", "curl ", "wget "]
-
-        if any(m in p for m in sql_markers):
-            return "sql"
-
-        if any(m in p for m in cmd_markers):
-            return "cmd"
+        ptype = PAYLOAD_TYPE_MARKERS.first((payload or "").lower())
 
-        if "{{" in p or "${" in p:
-            return "ssti"
-
-        if "../" in p or "..\\" in p:
-            return "dir"
-
-        if any(m in p for m in xss_markers):
+        if ptype == "xss":
             # 若提供向量，则必须有明确反射证据才认为是 XSS 类型
             if vector is not None:
                 try:
@@ -69,7 +64,7 @@ class VAPFReportGenerator:
                     return "unknown"
             return "xss"
 
-        return "unknown"
+        return ptype or "unknown"
 
     def _v3_delay_seconds(self, vector) -> float:
         """v3 在本项目中为归一化延迟（约等于 (probe_time-base_time)/5，截断到 0~1）。"""
@@ -0,0 +1,66 @@
+from typing import Dict, Optional, Set
+
+from playwright.async_api import BrowserContext, Page, Route
+
+
+class ResourcePolicy:
+    """Playwright 请求拦截策略 (爬虫 / 提取器 / 扫描器共用)
+
+    13 维特征只来自主文档的响应体、状态码与响应头，图片、字体、样式表、媒体等
+    子资源既不参与特征计算也不影响表单/链接发现，因此在 context.route 层直接中止。
+    脚本默认同样拦截，仅在需要 JS 渲染 (爬虫) 或 XSS 执行校验的上下文/页面中放行。
+    """
+
+    HEAVY_TYPES = {"image", "media", "font", "stylesheet", "manifest", "texttrack"}
+
+    # 请求在发出前即被中止，拿不到响应头 (content-length) 也无法实测体积；
+    # 只能按资源类型的典型单请求体积估算 (KB，参考 HTTP Archive 中位数量级)，输出时均标注为估算值
+    ESTIMATED_KB = {"image": 15, "media": 200, "font": 25, "stylesheet": 8, "script": 12, "manifest": 1, "texttrack": 2}
+
+    XSS_MARKERS = ["<script", "javascript:", "onerror=", "onload=", "<svg", "<img", "<iframe", "alert("]
+
+    def __init__(self, keep_scripts: bool = False, enabled: bool = True):
+        self.keep_scripts = keep_scripts
+        self.enabled = enabled
+        self.blocked: Dict[str, int] = {}
+
+    @classmethod
+    def needs_scripts(cls, payload: Optional[str]) -> bool:
+        """该 payload 的探测是否需要页面执行脚本 (XSS 执行校验)"""
+        p = (payload or "").lower()
+        return any(m in p for m in cls.XSS_MARKERS)
+
+    async def apply(self, target: BrowserContext | Page, keep_scripts: Optional[bool] = None):
+        """在 BrowserContext 或 Page 上安装拦截路由；Page 级路由优先于 Context 级路由"""
+        if not self.enabled:
+            return
+        allow_scripts = self.keep_scripts if keep_scripts is None else keep_scripts
+        blocked_types: Set[str] = set(self.HEAVY_TYPES)
+        if not allow_scripts:
+            blocked_types.add("script")
+
+        async def _handle(route: Route):
+            request = route.request
+            if request.resource_type in blocked_types:
+                self.blocked[request.resource_type] = self.blocked.get(request.resource_type, 0) + 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await target.route("**/*", _handle)
+
+    def reset(self):
+        """清空拦截统计 (按单次扫描汇总时使用)"""
+        self.blocked = {}
+
+    @property
+    def estimated_bytes_saved(self) -> int:
+        """按 ESTIMATED_KB 估算的节省下载字节数 (非实测)"""
+        return sum(count * self.ESTIMATED_KB.get(rtype, 0) * 1024 for rtype, count in self.blocked.items())
+
+    def summary(self) -> str:
+        total = sum(self.blocked.values())
+        if not total:
+            return "[*] 资源拦截: 未拦截任何请求"
+        detail = ", ".join(f"{k}={v}" for k, v in sorted(self.blocked.items(), key=lambda kv: -kv[1]))
+        return f"[*] 资源拦截: 共 {total} 个请求 ({detail})，估算节省约 {self.estimated_bytes_saved / 1024:.0f} KB (按资源类型典型体积估算，非实测)"
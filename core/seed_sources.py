@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+import json
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+# 爬取种子来源：sitemap.xml (含 sitemap index)、robots.txt 的 Disallow / Sitemap 行、测试人员录制的 HAR 文件。
+# 这里只负责收集 URL，范围与静态资源过滤由爬虫统一处理。
+
+
+def parse_robots(text: str, root_url: str) -> Tuple[List[str], List[str]]:
+    """解析 robots.txt，返回 (Disallow 路径对应的 URL, 声明的 sitemap URL)
+
+    Disallow 中的通配符部分无法还原成具体页面，截取 * 之前的前缀；空 Disallow 表示允许全部，忽略。
+    """
+    disallow, sitemaps = [], []
+    for raw in text.splitlines():
+        line = raw.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        key, value = key.strip().lower(), value.strip()
+        if key == "disallow" and value:
+            path = value.split("*", 1)[0].rstrip("$")
+            if path and path != "/":
+                disallow.append(urljoin(root_url, path))
+        elif key == "sitemap" and value:
+            sitemaps.append(urljoin(root_url, value))
+    return disallow, sitemaps
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[str], List[str]]:
+    """解析 sitemap (支持 gzip)，返回 (页面 URL, 子 sitemap URL)；sitemap index 只产出后者"""
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        return [], []
+    # 忽略命名空间，只看本地标签名
+    locs = [el.text.strip() for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "loc" and el.text]
+    if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+        return [], locs
+    return locs, []
+
+
+def load_har(path: str) -> List[str]:
+    """读取 HAR 文件中记录的全部请求 URL (保持录制顺序)"""
+    with open(path, "r", encoding="utf-8") as f:
+        har = json.load(f)
+    return [e["request"]["url"] for e in har.get("log", {}).get("entries", []) if e.get("request", {}).get("url")]
+
+
+async def _fetch(client: httpx.AsyncClient, url: str) -> Optional[bytes]:
+    try:
+        r = await client.get(url)
+    except Exception:
+        return None
+    return r.content if r.status_code == 200 else None
+
+
+async def discover_seeds(base_url: str, cookies: Optional[Dict[str, str]] = None, har_path: Optional[str] = None,
+                         fetch_remote: bool = True, max_sitemaps: int = 20) -> Dict[str, List[str]]:
+    """从 robots.txt / sitemap / HAR 收集种子 URL，按来源分组返回
+
+    robots.txt 与 sitemap.xml 同时在站点根目录与 base_url 目录下尝试 (DVWA 等靶场部署在子目录)，
+    同一层的请求并发发出；sitemap index 逐层展开，最多抓取 max_sitemaps 个 sitemap。
+    fetch_remote=False 时只读取 HAR。
+    """
+    parsed = urlparse(base_url)
+    root_url = f"{parsed.scheme}://{parsed.netloc}/"
+    bases = list(dict.fromkeys([root_url, base_url.rstrip("/") + "/"]))
+    seeds: Dict[str, List[str]] = {"sitemap": [], "robots": [], "har": []}
+
+    if har_path:
+        try:
+            seeds["har"] = load_har(har_path)
+        except Exception as e:
+            print(f"[-] HAR 文件读取失败 {har_path}: {e}")
+
+    if not fetch_remote:
+        return seeds
+
+    async with httpx.AsyncClient(verify=False, timeout=10.0, follow_redirects=True, cookies=cookies or {}) as client:
+        robots_bodies = await asyncio.gather(*[_fetch(client, urljoin(b, "robots.txt")) for b in bases])
+        pending = [urljoin(b, "sitemap.xml") for b in bases]
+        for b, body in zip(bases, robots_bodies):
+            if body:
+                disallow, sitemaps = parse_robots(body.decode("utf-8", "replace"), b)
+                seeds["robots"].extend(disallow)
+                pending.extend(sitemaps)
+
+        fetched = set()
+        while pending and len(fetched) < max_sitemaps:
+            batch = [u for u in dict.fromkeys(pending) if u not in fetched][:max_sitemaps - len(fetched)]
+            fetched.update(batch)
+            pending = []
+            for body in await asyncio.gather(*[_fetch(client, u) for u in batch]):
+                if body:
+                    pages, children = parse_sitemap(body)
+                    seeds["sitemap"].extend(pages)
+                    pending.extend(children)
+
+    return {source: list(dict.fromkeys(urls)) for source, urls in seeds.items()}
@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from playwright.async_api import BrowserContext
+
+from core.rate_limiter import RateLimiter
+
+
+class SessionStore:
+    """已认证会话 (Playwright storage_state) 的磁盘缓存，按目标 base_url 与安全等级分别保存
+
+    爬虫登录后保存，提取器与扫描器直接载入到 BrowserContext 与 httpx Cookie 罐中；
+    载入前用一次不跟随跳转的 GET 校验会话是否仍然有效 (未登录时靶场会 302 到登录页)。
+    """
+
+    def __init__(self, directory: str = "data/sessions", max_age: float = 12 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+
+    def _path(self, base_url: str, level: str = "") -> str:
+        name = re.sub(r"[^A-Za-z0-9]+", "_", base_url.split("://", 1)[-1]).strip("_")
+        return os.path.join(self.directory, f"{name}_{level or 'default'}.json")
+
+    async def save(self, context: BrowserContext, base_url: str, level: str = "", check_url: Optional[str] = None):
+        """保存 context 当前的 storage_state；check_url 为载入时用于校验会话的页面"""
+        state = await context.storage_state()
+        os.makedirs(self.directory, exist_ok=True)
+        record = {
+            "base_url": base_url.rstrip("/"),
+            "level": level,
+            "check_url": check_url,
+            "saved_at": time.time(),
+            "storage_state": state,
+        }
+        with open(self._path(base_url, level), "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+
+    def _records(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        records = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    records.append(json.load(f))
+            except Exception:
+                continue
+        return records
+
+    @staticmethod
+    def apply_cookies(state: Dict[str, Any], client: httpx.AsyncClient):
+        """把 storage_state 中的 Cookie 写入 httpx 客户端"""
+        for c in state.get("cookies", []):
+            client.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+
+    async def _is_valid(self, record: Dict[str, Any]) -> bool:
+        if time.time() - record.get("saved_at", 0) > self.max_age:
+            return False
+        check_url = record.get("check_url")
+        if not check_url:
+            return True
+        limiter = RateLimiter.shared()
+        async with httpx.AsyncClient(verify=False, timeout=10.0, follow_redirects=False) as client:
+            self.apply_cookies(record["storage_state"], client)
+            await limiter.acquire(check_url)
+            try:
+                start_time = time.time()
+                r = await client.get(check_url)
+            except Exception as e:
+                limiter.record_error(check_url, e)
+                return False
+            limiter.record(check_url, time.time() - start_time, r.status_code, r.headers)
+        return r.status_code == 200
+
+    async def load(self, url: str, level: Optional[str] = "") -> Optional[Dict[str, Any]]:
+        """返回适用于 url 的有效 storage_state，没有则返回 None
+
+        url 可以是 base_url 本身或其下的任意页面 (扫描器只知道目标 URL)；多个会话匹配时取 base_url 最长者，
+        level 为 None 时不限等级并优先默认等级。
+        """
+        candidates = [
+            r for r in self._records()
+            if url.startswith(r.get("base_url", "\0")) and (level is None or r.get("level", "") == level)
+        ]
+        candidates.sort(key=lambda r: (-len(r["base_url"]), r.get("level", "") != "", -r.get("saved_at", 0)))
+        for record in candidates:
+            label = f"{record['base_url']} [{record.get('level') or 'default'}]"
+            if await self._is_valid(record):
+                print(f"[+] 复用已保存的会话: {label}")
+                return record["storage_state"]
+            print(f"[*] 已保存的会话已失效: {label}")
+        return None
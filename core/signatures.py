@@ -0,0 +1,111 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 响应正文中的报错签名库 (均为小写，匹配小写化后的正文)，按类别扩充即可，匹配开销与条目数量基本无关
+ERROR_SIGNATURES: Dict[str, List[str]] = {
+    "dbms": [
+        # MySQL / MariaDB
+        "you have an error in your sql syntax", "check the manual that corresponds to your mysql",
+        "check the manual that corresponds to your mariadb", "warning: mysql_", "mysql_fetch", "mysql_num_rows",
+        "mysqli_fetch", "mysqli_sql_exception", "mysqlsyntaxerrorexception", "com.mysql.jdbc", "unknown column",
+        # PostgreSQL
+        "pg_query()", "pg_exec()", "postgresql query failed", "unterminated quoted string at or near",
+        "syntax error at or near", "org.postgresql.util.psqlexception", "invalid input syntax for",
+        # SQL Server
+        "unclosed quotation mark after the character string", "microsoft ole db provider for sql server",
+        "[microsoft][odbc sql server driver]", "incorrect syntax near", "system.data.sqlclient.sqlexception",
+        "com.microsoft.sqlserver.jdbc",
+        # Oracle
+        "ora-00933", "ora-00936", "ora-01756", "ora-01789", "quoted string not properly terminated", "oci_parse",
+        "oracle.jdbc",
+        # SQLite
+        "sqlite3::", "sqlite_error", "sqlite3.operationalerror", "system.data.sqlite.sqliteexception",
+        "unrecognized token:",
+        # 通用
+        "sqlstate[", "pdoexception", "odbc driver", "sql command not properly ended", "sql syntax",
+    ],
+    "shell": [
+        "sh: 1:", "/bin/sh:", "/bin/bash:", "command not found", "syntax error near unexpected token",
+        "is not recognized as an internal or external command", "uid=0(root)", "gid=0(root)", "uid=33(www-data)",
+        "root:x:0:0:", "daemon:x:1:1:", "[boot loader]", "volume serial number is",
+    ],
+    "template": [
+        "jinja2.exceptions", "templatesyntaxerror", "jinja2.exceptions.undefinederror", "twig_error_syntax",
+        "twig\\error\\syntaxerror", "twig\\error\\runtimeerror", "freemarker.core.", "freemarker template error",
+        "org.apache.velocity", "smarty error:", "smarty_compiler", "mako.exceptions", "django.template.exceptions",
+        "org.thymeleaf.exceptions", "liquid error", "com.mitchellbosecke.pebble", "handlebars.exception",
+    ],
+}
+
+
+def _trie_pattern(literals: Iterable[str]) -> str:
+    """把字面量编译成前缀树形式的正则：同一位置上优先匹配最长的字面量，分支数只取决于首字符种类"""
+    trie: Dict[str, dict] = {}
+    for literal in literals:
+        node = trie
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class SignatureSet:
+    """按类别组织的字面量签名，编译为单个正则，一次扫描返回各类别命中的签名
+
+    语义与对每个签名分别执行 `sig in text` 完全一致 (区分大小写，调用方自行小写化)：
+    正则在每个起点取最长匹配，该起点上同时成立的较短签名必为其前缀，扫描后按前缀关系补齐。
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories: Dict[str, Tuple[str, ...]] = {name: tuple(sigs) for name, sigs in categories.items()}
+        self._owners: Dict[str, List[str]] = {}
+        for name, sigs in self.categories.items():
+            for sig in sigs:
+                if sig and name not in self._owners.setdefault(sig, []):
+                    self._owners[sig].append(name)
+        literals = list(self._owners)
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            literal: tuple(other for other in literals if literal.startswith(other)) for literal in literals
+        }
+        self._regex = re.compile(_trie_pattern(literals)) if literals else None
+
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """单次扫描 text，返回 {类别: 命中的签名集合}，未命中的类别不出现"""
+        hits: Dict[str, Set[str]] = {}
+        if self._regex is None or not text:
+            return hits
+        seen: Set[str] = set()
+        search = self._regex.search
+        pos = 0
+        while len(seen) < len(self._owners):
+            m = search(text, pos)
+            if m is None:
+                break
+            if m.group() not in seen:
+                for literal in self._prefixes[m.group()]:
+                    if literal not in seen:
+                        seen.add(literal)
+                        for name in self._owners[literal]:
+                            hits.setdefault(name, set()).add(literal)
+            pos = m.start() + 1
+        return hits
+
+    def first(self, text: str) -> Optional[str]:
+        """按类别声明顺序返回第一个有命中的类别，没有则返回 None"""
+        hits = self.scan(text)
+        return next((name for name in self.categories if name in hits), None)
+
+
+@lru_cache(maxsize=16)
+def response_signatures(keywords: Tuple[str, ...] = ()) -> SignatureSet:
+    """报错签名库加上额外关键词 (类别 keywords，供 v4 计分) 的匹配器，按关键词元组缓存编译结果"""
+    return SignatureSet({"keywords": keywords, **ERROR_SIGNATURES})
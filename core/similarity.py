@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import random
+import re
+import sys
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class SimilarityEngine(ABC):
+    """v5 (DOM 相似度) 的计算引擎
+
+    profile() 对基准文本预处理一次，compare() 将每条探测与该画像比较，耗时与探测文本长度成线性；
+    结果在 0 ~ 1 之间，两段文本都为空时为 1.0。
+    """
+
+    name = ""
+
+    @abstractmethod
+    def profile(self, text: str) -> Any:
+        """预处理基准文本，返回 compare() 使用的画像"""
+
+    @abstractmethod
+    def compare(self, profile: Any, text: str) -> float:
+        """探测文本与基准画像的相似度 (0 ~ 1)"""
+
+    def ratio(self, base_text: str, text: str) -> float:
+        return self.compare(self.profile(base_text), text)
+
+
+class CharProfileEngine(SimilarityEngine):
+    """字符多重集重合度，与 difflib.SequenceMatcher(None, base, text).quick_ratio() 逐位一致 (默认，训练数据即按此计算)"""
+
+    name = "chars"
+
+    def profile(self, text: str) -> Tuple[Counter, int]:
+        return Counter(text), len(text)
+
+    def compare(self, profile: Tuple[Counter, int], text: str) -> float:
+        counts, base_len = profile
+        matches = sum((counts & Counter(text)).values())
+        length = base_len + len(text)
+        return 2.0 * matches / length if length else 1.0
+
+
+class TokenProfileEngine(SimilarityEngine):
+    """词元 (单词 / 标点) 多重集的 Dice 系数：对标签结构与文本内容的变化比单字符更敏感"""
+
+    name = "tokens"
+
+    def profile(self, text: str) -> Tuple[Counter, int]:
+        counts = Counter(_TOKEN_RE.findall(text))
+        return counts, sum(counts.values())
+
+    def compare(self, profile: Tuple[Counter, int], text: str) -> float:
+        counts, base_total = profile
+        probe = Counter(_TOKEN_RE.findall(text))
+        total = base_total + sum(probe.values())
+        return 2.0 * sum((counts & probe).values()) / total if total else 1.0
+
+
+class MinHashEngine(SimilarityEngine):
+    """词元 k-shingle 的 MinHash 签名估计 Jaccard，再换算为 Dice (2J / (1 + J)) 与其余引擎同一量纲
+
+    签名长度固定为 num_perm，超大页面的比较开销只取决于 shingle 数量。
+    """
+
+    name = "minhash"
+    _PRIME = np.uint64(4294967311)  # 大于 2^32 的素数
+
+    def __init__(self, num_perm: int = 128, shingle: int = 4, seed: int = 1):
+        self.shingle = shingle
+        rng = np.random.RandomState(seed)
+        # a, b < 2^32，保证 a * x + b 在 uint64 内不溢出
+        self._a = rng.randint(1, 2 ** 32 - 1, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32 - 1, size=(num_perm, 1), dtype=np.uint64)
+
+    def _signature(self, text: str) -> Optional[np.ndarray]:
+        tokens = _TOKEN_RE.findall(text)
+        if not tokens:
+            return None
+        k = min(self.shingle, len(tokens))
+        hashes = np.unique(np.fromiter(
+            (zlib.crc32("\x1f".join(tokens[i:i + k]).encode("utf-8")) for i in range(len(tokens) - k + 1)),
+            dtype=np.uint64,
+        ))
+        return ((self._a * hashes + self._b) % self._PRIME).min(axis=1)
+
+    def profile(self, text: str) -> Optional[np.ndarray]:
+        return self._signature(text)
+
+    def compare(self, profile: Optional[np.ndarray], text: str) -> float:
+        signature = self._signature(text)
+        if profile is None or signature is None:
+            return 1.0 if profile is None and signature is None else 0.0
+        jaccard = float(np.mean(profile == signature))
+        return 2.0 * jaccard / (1.0 + jaccard)
+
+
+ENGINES = {engine.name: engine for engine in (CharProfileEngine, TokenProfileEngine, MinHashEngine)}
+
+
+def get_engine(name: str = "chars") -> SimilarityEngine:
+    if name not in ENGINES:
+        raise ValueError(f"未知的相似度引擎: {name} (可选 {', '.join(ENGINES)})")
+    return ENGINES[name]()
+
+
+async def _fetch_text(client, url: str, params: Optional[Dict[str, str]] = None) -> Optional[str]:
+    from core.rate_limiter import RateLimiter
+    limiter = RateLimiter.shared()
+    await limiter.acquire(url)
+    try:
+        start_time = time.time()
+        r = await client.get(url, params=params)
+    except Exception as e:
+        limiter.record_error(url, e)
+        return None
+    limiter.record(url, time.time() - start_time, r.status_code, r.headers)
+    return r.text
+
+
+async def calibrate(feature_files: List[str], engines: List[str], sample: int = 200, seed: int = 0,
+                    session_dir: Optional[str] = "data/sessions") -> Dict[str, Any]:
+    """在特征文件的记录上校准各引擎
+
+    特征文件只保存了向量，因此按记录的 url / param / payload 重放基准与探测请求 (httpx，复用已保存的登录会话)，
+    对同一对响应分别计算 difflib quick_ratio 与各引擎的 v5，统计误差；同时给出重放的 quick_ratio 与文件中 v5 的偏差，
+    用于区分引擎误差与靶场自身的变化。
+    """
+    import httpx
+    from core.session_store import SessionStore
+
+    records = []
+    rng = random.Random(seed)
+    for path in feature_files:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        records.extend(rng.sample(data, sample) if sample and len(data) > sample else data)
+
+    store = SessionStore(session_dir) if session_dir else None
+    sessions: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+    active = {name: get_engine(name) for name in engines}
+    reference, stored = [], []
+    values: Dict[str, List[float]] = {name: [] for name in active}
+    seconds: Dict[str, float] = {name: 0.0 for name in ["quick_ratio"] + list(active)}
+    skipped = 0
+    base_cache: Dict[Tuple[str, str], Optional[str]] = {}
+
+    async with httpx.AsyncClient(verify=False, timeout=10.0, follow_redirects=True) as client:
+        for record in records:
+            url, level = record["url"], record.get("security_level", "") or ""
+            if store and (url, level) not in sessions:
+                sessions[(url, level)] = await store.load(url, level=level or None)
+            state = sessions.get((url, level))
+            client.cookies.clear()
+            if state:
+                SessionStore.apply_cookies(state, client)
+            key = (url, level)
+            if key not in base_cache:
+                base_cache[key] = await _fetch_text(client, url)
+            base_text = base_cache[key]
+            probe_text = await _fetch_text(client, url, {record["param"]: record["payload"]})
+            if not base_text or probe_text is None:
+                skipped += 1
+                continue
+
+            t0 = time.perf_counter()
+            reference.append(difflib.SequenceMatcher(None, base_text, probe_text).quick_ratio())
+            seconds["quick_ratio"] += time.perf_counter() - t0
+            stored.append(float(record["vector"][4]))
+            for name, engine in active.items():
+                t0 = time.perf_counter()
+                values[name].append(engine.ratio(base_text, probe_text))
+                seconds[name] += time.perf_counter() - t0
+
+    ref = np.array(reference, dtype=np.float64)
+    report: Dict[str, Any] = {"records": len(records), "replayed": len(reference), "skipped": skipped, "engines": {}}
+    if len(ref):
+        report["replay_vs_stored_mae"] = float(np.mean(np.abs(ref - np.array(stored))))
+        report["quick_ratio_ms"] = 1000 * seconds["quick_ratio"] / len(ref)
+    for name, vals in values.items():
+        if not vals:
+            continue
+        v = np.array(vals, dtype=np.float64)
+        err = np.abs(v - ref)
+        corr = float(np.corrcoef(v, ref)[0, 1]) if len(v) > 1 and v.std() and ref.std() else None
+        report["engines"][name] = {
+            "mae": float(err.mean()),
+            "max_error": float(err.max()),
+            "within_0.05": float(np.mean(err <= 0.05)),
+            "pearson": corr,
+            "ms_per_probe": 1000 * seconds[name] / len(v),
+        }
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"[*] v5 相似度校准: 抽样 {report['records']} 条，成功重放 {report['replayed']} 条，跳过 {report['skipped']} 条"]
+    if not report["replayed"]:
+        lines.append("[!] 没有可重放的记录 (靶场不可达或会话失效)")
+        return "\n".join(lines)
+    lines.append(f"    重放 quick_ratio 与文件中 v5 的平均偏差 {report['replay_vs_stored_mae']:.4f} (靶场自身变化)，"
+                 f"difflib 耗时 {report['quick_ratio_ms']:.2f} ms/条")
+    for name, s in report["engines"].items():
+        pearson = f"{s['pearson']:.4f}" if s["pearson"] is not None else "-"
+        lines.append(f"    {name:8s} MAE {s['mae']:.4f}  最大误差 {s['max_error']:.4f}  误差≤0.05 {s['within_0.05']:.0%}  "
+                     f"Pearson {pearson}  {s['ms_per_probe']:.2f} ms/条")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="v5 相似度引擎校准：重放特征文件中的探测，对比各引擎与 difflib quick_ratio")
+    parser.add_argument("features", nargs="+", help="特征文件 (如 data/features_*.json)")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES), help="参与校准的引擎 (默认全部)")
+    parser.add_argument("--sample", type=int, default=200, help="每个文件抽样的记录数，0 为全部 (默认 200)")
+    parser.add_argument("--seed", type=int, default=0, help="抽样随机种子")
+    parser.add_argument("--session-dir", default="data/sessions", help="已保存登录会话的目录 (默认 data/sessions)")
+    parser.add_argument("--rate", type=float, default=5.0, help="每个主机的初始请求速率 (req/s，默认 5)")
+    parser.add_argument("--report", default=None, help="同时把校准结果写入该 JSON 文件")
+    args = parser.parse_args()
+
+    from core.rate_limiter import RateLimiter
+    RateLimiter.shared().configure(args.rate)
+    report = asyncio.run(calibrate(args.features, args.engines, args.sample, args.seed, args.session_dir))
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[+] 校准结果已写入 {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,197 @@
 import argparse
 import asyncio
+import contextlib
+import copy
+import hashlib
+import heapq
+import itertools
 import json
+import os
+import re
+import sqlite3
 import sys
 import time
-from typing import List, Dict, Any, Optional
-from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs, urljoin
 
+import httpx
+from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright, Page, Browser, BrowserContext
 
+# 以脚本方式运行 (python core/spider.py) 时确保可以导入 core 包
+sys.path.append(os.getcwd())
+from core.crawl_timing import CrawlTimings, PageTimer
+from core.fingerprint import SimHashIndex, simhash, stable_hash
+from core.page_settle import PageSettler
+from core.page_stream import PageStreamReader, PageStreamWriter, is_page_stream
+from core.rate_limiter import RateLimiter
+from core.resource_policy import ResourcePolicy
+from core.seed_sources import discover_seeds
+from core.session_store import SessionStore
+
+
+# URL 模板化所用的取值类别 (从严格到宽松依次匹配)
+_VALUE_CLASSES = [
+    ("{num}", re.compile(r"^-?\d+$")),
+    ("{hex}", re.compile(r"^(?=.*\d)[0-9a-fA-F]{8,}$|^[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}$")),
+    ("{token}", re.compile(r"^(?=.*\d)[A-Za-z0-9_\-+/=.]{16,}$")),
+]
+
+# 风险启发式关键词 (注入点风险标注与爬取优先级共用)
+_FORM_RISK_KEYWORDS = ["login", "admin", "delete", "update", "password", "upload", "exec"]
+_PATH_RISK_KEYWORDS = ["admin", "login", "api", "cmd", "shell"]
+_PARAM_RISK_KEYWORDS = ["id", "file", "cmd", "url", "path"]
+# 靶场漏洞页常见路径片段 (DVWA vulnerabilities/、Pikachu vul/、bWAPP sqli_1.php 等)，仅用于爬取排序
+_VULN_PATH_HINTS = ["vul", "sqli", "xss", "rce", "exec", "inject", "include", "upload", "csrf", "ssrf", "xxe", "unserial"]
+# 说明/帮助类页面几乎不含注入点，预算有限时排到最后
+_LOW_VALUE_PATH_HINTS = ["help", "about", "instruction", "credits", "readme", "setup", "phpinfo"]
+
+# 不参与爬取的静态资源后缀
+_STATIC_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".css", ".js", ".pdf", ".ico", ".svg", ".woff", ".woff2")
+
+
+def _is_static_asset(url: str) -> bool:
+    return url.lower().endswith(_STATIC_EXTENSIONS)
+
+
+def _value_class(value: str) -> Optional[str]:
+    """返回取值所属类别 ({num}/{hex}/{token})，普通取值返回 None"""
+    for label, pattern in _VALUE_CLASSES:
+        if pattern.match(value):
+            return label
+    return None
+
+
+def url_template(url: str) -> str:
+    """把 URL 规范化为模板：路径段与参数值中的数字/十六进制/令牌替换为类别，参数名排序
+
+    例如 list.php?id=12&sort=asc 与 list.php?sort=asc&id=5000 都得到 /list.php?id={num}&sort=asc，
+    而 ?page=about 与 ?page=help 这类普通取值仍保留原值 (它们通常是不同的功能页)。
+    """
+    parsed = urlparse(url.split('#')[0])
+    path = "/".join(_value_class(seg) or seg for seg in parsed.path.split("/"))
+    params = parse_qs(parsed.query, keep_blank_values=True)
+    query = "&".join(
+        f"{name}={_value_class(values[0]) or values[0] if values and values[0] else ''}"
+        for name, values in sorted(params.items())
+    )
+    template = f"{parsed.scheme}://{parsed.netloc}{path}"
+    return f"{template}?{query}" if query else template
+
+
+# 可去重的注入点类型 -> 对应的引用类型 (表单与抓取到的 XHR/fetch 接口共用同一索引)
+_SHARED_POINT_REFS = {"form": "form_ref", "api": "api_ref"}
+
+
+def form_signature(action_url: str, method: str, input_names: List[str]) -> str:
+    """表单签名：解析后的 action URL + 方法 + 排序后的输入名，布局中的公共表单 (搜索框、登录框) 在各页面上签名相同"""
+    raw = f"{method.upper()} {action_url.split('#')[0]} {','.join(sorted(set(input_names)))}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class CrawlFrontier(asyncio.Queue):
+    """共享爬取优先队列，额外记录在途 URL 以便导出断点快照
+
+    入队时用 score(url, depth) 打分，分高者先出；同分按深度、再按入队顺序 (即退化为 BFS)。
+    score 为 None 时按深度、再按入队顺序出队 (BFS)。
+    """
+
+    def __init__(self, score=None):
+        self.score = score
+        super().__init__()
+        # 已被 worker 取出但尚未处理完成的 (url, depth)
+        self.in_flight: List[Tuple[str, int]] = []
+
+    def _init(self, maxsize):
+        self._queue = []
+        self._seq = itertools.count()
+
+    def _put(self, item):
+        url, depth = item
+        priority = -self.score(url, depth) if self.score else 0.0
+        heapq.heappush(self._queue, (priority, depth, next(self._seq), item))
+
+    def _get(self):
+        return heapq.heappop(self._queue)[-1]
+
+    def snapshot(self) -> List[Tuple[str, int]]:
+        """返回待爬取的全部条目 (在途条目排在最前，其余按出队顺序)"""
+        return list(self.in_flight) + [entry[-1] for entry in sorted(self._queue)]
+
+
+class CrawlCheckpoint:
+    """基于 SQLite 的爬取断点 (frontier / visited / 已发现页面 / 模板统计)
+
+    按 scope 区分多份爬取状态，批量爬虫以安全等级作为 scope，单次爬取使用空字符串。
+    visited 与 pages 只追加写入，frontier 每次整体替换。
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (scope TEXT, key TEXT, value TEXT, PRIMARY KEY (scope, key));
+            CREATE TABLE IF NOT EXISTS visited (scope TEXT, url TEXT, PRIMARY KEY (scope, url));
+            CREATE TABLE IF NOT EXISTS frontier (scope TEXT, url TEXT, depth INTEGER);
+            CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT, data TEXT);
+        """)
+        self.conn.commit()
+        # 每个 scope 已落盘的页面数量 (pages 列表只追加，按下标增量写入)
+        self._saved_pages: Dict[str, int] = {}
+
+    def load(self, scope: str = "") -> Optional[Dict[str, Any]]:
+        """读取某个 scope 的断点，不存在时返回 None"""
+        meta = dict(self.conn.execute("SELECT key, value FROM meta WHERE scope = ?", (scope,)).fetchall())
+        if not meta:
+            return None
+        frontier = [(u, d) for u, d in self.conn.execute("SELECT url, depth FROM frontier WHERE scope = ?", (scope,))]
+        rows = [(i, json.loads(d)) for i, d in self.conn.execute("SELECT id, data FROM pages WHERE scope = ? ORDER BY id", (scope,))]
+        # 在途 URL 会重新爬取，删除其可能已落盘的页面记录以免重复；
+        # 落盘偏移必须与返回的页面列表一致，否则 save() 会按旧偏移跳过之后新增的页面
+        pending = {u.split('#')[0] for u, _ in frontier}
+        stale = [(i,) for i, pg in rows if pg.get("url") in pending]
+        if stale:
+            with self.conn:
+                self.conn.executemany("DELETE FROM pages WHERE id = ?", stale)
+        pages = [pg for _, pg in rows if pg.get("url") not in pending]
+        self._saved_pages[scope] = len(pages)
+        return {
+            "done": meta.get("done") == "1",
+            "frontier": frontier,
+            "visited": {u for (u,) in self.conn.execute("SELECT url FROM visited WHERE scope = ?", (scope,))},
+            "pages": pages,
+            "template_stats": json.loads(meta.get("template_stats", "{}")),
+        }
+
+    def save(self, scope: str, frontier: List[Tuple[str, int]], visited: Set[str], pages: List[Dict[str, Any]],
+             template_stats: Dict[str, Dict[str, int]], done: bool = False):
+        """写入某个 scope 的当前状态"""
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO visited VALUES (?, ?)", [(scope, u) for u in visited])
+            self.conn.execute("DELETE FROM frontier WHERE scope = ?", (scope,))
+            self.conn.executemany("INSERT INTO frontier VALUES (?, ?, ?)", [(scope, u, d) for u, d in frontier])
+            start = self._saved_pages.get(scope, 0)
+            self.conn.executemany(
+                "INSERT INTO pages (scope, data) VALUES (?, ?)",
+                [(scope, json.dumps(pg, ensure_ascii=False)) for pg in pages[start:]]
+            )
+            self._saved_pages[scope] = len(pages)
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?, ?)", [
+                (scope, "done", "1" if done else "0"),
+                (scope, "template_stats", json.dumps(template_stats, ensure_ascii=False)),
+            ])
+
+    def remove(self):
+        """全部结果写出后删除断点文件"""
+        self.conn.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
 
 class UniversalSpider:
     """通用 Web 爬虫 (V-APF)，专为 bWAPP、DVWA、Pikachu 等多靶场设计。
@@ -16,13 +200,110 @@ class UniversalSpider:
     - 通用 Cookie 注入 (替代硬编码登录)
     - 自动发现注入点 (Input Discovery)
     - 指纹基准采集 (Baseline Fingerprinting)
+    - 多标签页并发 BFS (共享队列与 visited 集合)
+    - HTTP 优先模式 (静态页面用 httpx 解析，脚本驱动页面才回退 Playwright)
+    - URL 模板化去重 (同模板仅采样若干个，其余兄弟页面计数后跳过)
+    - 断点续爬 (定期把 frontier / visited / 已发现页面写入 SQLite)
+    - 重资源拦截 (图片/字体/样式等不参与特征，在 Context 层中止)
+    - 稳定内容指纹 (SHA-1 + SimHash)，近似重复页面不再展开链接
+    - 流式输出 (输出路径为 .jsonl 时逐页追加写出，不在内存中保留页面)
+    - 风险优先的爬取队列 (敏感关键词 / Query 参数 / 模板新颖度打分)，支持页面数与时间预算
+    - 增量重爬 (条件请求或内容指纹确认页面未变时，直接复用上次结果)
+    - 登录会话持久化 (按目标与安全等级保存 storage_state，校验有效后跳过登录)
+    - 逐页分阶段计时 (旁路 JSONL 文件，结束时输出阶段分布与最慢页面)
+    - 公共表单去重 (按签名只完整记录一次，其余页面记录 form_ref，汇总出现页面列表)
+    - 网络捕获 (页面加载期间的同域 XHR/fetch 请求记录为 api 注入点)
     """
 
-    def __init__(self, base_url: str, cookies: str = ""):
+    # 校验已保存会话的页面 (相对 base_url，未登录时会跳转到登录页)；None 表示该目标无需登录，不保存会话
+    session_check_path: Optional[str] = None
+
+    def __init__(self, base_url: str, cookies: str = "", workers: int = 4, http_first: bool = False,
+                 template_cap: int = 3, checkpoint: Optional[str] = None, resume: bool = False,
+                 checkpoint_interval: float = 30.0, block_resources: bool = True, near_dup_distance: int = 3,
+                 max_pages: int = 0, time_budget: float = 0.0, seed_discovery: bool = True,
+                 har_file: Optional[str] = None, previous: Optional[str] = None,
+                 session_dir: Optional[str] = "data/sessions", slow_top: int = 10,
+                 settle_quiet: float = 0.5, settle_timeout: float = 8.0):
         self.base_url = base_url.rstrip("/")
         self.cookies = cookies
+        # 并发 worker 标签页数量 (同一 BrowserContext 内共享 Session)
+        self.workers = max(1, workers)
+        # HTTP 优先模式：仅在 crawl 期间持有连接池化的 httpx 客户端
+        self.http_first = http_first
+        self.http_client: Optional[httpx.AsyncClient] = None
+        # 每个 URL 模板最多爬取的样本数 (0 表示不限制)，以及本轮爬取的模板统计
+        self.template_cap = max(0, template_cap)
+        self.template_stats: Dict[str, Dict[str, int]] = {}
+        # 断点：checkpoint_scope 由批量爬虫设置为当前安全等级
+        self.checkpoint = CrawlCheckpoint(checkpoint, resume) if checkpoint else None
+        self.checkpoint_scope = ""
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        # 爬虫需要 JS 渲染出的链接与表单，因此保留脚本，仅拦截重资源
+        self.resource_policy = ResourcePolicy(keep_scripts=True, enabled=block_resources)
+        # 按主机自适应限速 (与提取器、扫描器共用进程级实例)
+        self.rate_limiter = RateLimiter.shared()
+        # SimHash 汉明距离不超过该值视为近似重复 (负数关闭)；索引按每轮爬取重建
+        self.near_dup_distance = near_dup_distance
+        self.simhash_index: Optional[SimHashIndex] = None
+        self.near_dup_skipped = 0
+        # 流式输出：page_stream 存在时页面逐条写入 JSONL，不再累积到 results["pages"]
+        self.page_stream: Optional[PageStreamWriter] = None
+        self._streamed_urls: Set[str] = set()
+        self.pages_recorded = 0
+        # 批量爬虫的当前安全等级，记录页面时写入 security_level
+        self.security_level: Optional[str] = None
+        # 爬取预算 (0 表示不限制)：每轮爬取最多分析的页面数与耗时秒数，批量模式下按等级分别计算
+        self.max_pages = max(0, max_pages)
+        self.time_budget = max(0.0, time_budget)
+        self.pages_crawled = 0
+        self._crawl_started = 0.0
+        self._budget_exhausted: Optional[asyncio.Event] = None
+        # 因预算耗尽而未爬完的 scope (与 _fork 副本共享同一列表)，存在时保留断点以便续爬
+        self.unfinished_scopes: List[str] = []
+        # 种子发现 (sitemap / robots.txt / HAR)；结果按 base_url 缓存，并发爬取的各等级共用一次抓取
+        self.seed_discovery = seed_discovery
+        self.har_file = har_file
+        self._seed_cache: Dict[str, asyncio.Future] = {}
+        # 公共表单索引 (安全等级, 签名) -> 表单定义与出现页面，与 _fork 副本共享，写出时汇总为 forms
+        self.forms: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # 增量重爬：上次结果按 (安全等级, URL) 索引，未变化的页面直接复用 (上次的表单索引用于还原 form_ref)
+        self.previous_forms: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.previous_pages = self._load_previous(previous) if previous else {}
+        self.reused_pages = 0
+        # 每个 URL 模板已入队的次数，用于优先级中的新颖度项
+        self._template_enqueued: Dict[str, int] = {}
+        # 登录会话缓存 (session_dir 为 None 时每次都重新登录)
+        self.session_store = SessionStore(session_dir) if session_dir else None
+        # 逐页分阶段计时 (与 _fork 副本共享)；_open_output 时改为同时写入 <output>.timings.jsonl
+        self.slow_top = slow_top
+        self.timings = CrawlTimings(top_n=slow_top)
+        # 页面稳定判定：DOM 与网络都安静 settle_quiet 秒即继续，最多等待 settle_timeout 秒 (取代 networkidle)
+        self.settler = PageSettler(quiet=settle_quiet, timeout=settle_timeout)
         self.results: Dict[str, Any] = {"base_url": self.base_url, "pages": []}
 
+    async def open_session(self, browser: Browser, level: str = "", login=None,
+                           resource_policy: Optional[ResourcePolicy] = None, **context_kwargs) -> Tuple[BrowserContext, Page]:
+        """创建已认证的 Context 并返回 (context, page)
+
+        优先载入该目标与等级下仍然有效的已保存会话；否则新建 Context、执行 login(page) 并保存会话。
+        resource_policy 默认使用爬虫自身的策略，context_kwargs 原样传给 browser.new_context。
+        """
+        persist = self.session_store is not None and self.session_check_path is not None and login is not None
+        state = await self.session_store.load(self.base_url, level) if persist else None
+        if state:
+            context_kwargs["storage_state"] = state
+        context = await browser.new_context(**context_kwargs)
+        await (resource_policy or self.resource_policy).apply(context)
+        await self.init_browser(context)
+        page = await context.new_page()
+        if state is None and login is not None:
+            await login(page)
+            if persist:
+                await self.session_store.save(context, self.base_url, level, f"{self.base_url}/{self.session_check_path}")
+        return context, page
+
     async def init_browser(self, context: BrowserContext):
         """将格式化的 Cookie 注入浏览器，实现通用登录"""
         if not self.cookies:
@@ -43,28 +324,57 @@ class UniversalSpider:
             await context.add_cookies(cookie_list)
             print(f"[+] 已注入 {len(cookie_list)} 个 Cookie")
 
+    # 单次 page.evaluate 取回表单、字段属性与全部链接，避免逐元素 get_attribute 的 IPC 往返
+    _DOM_SNAPSHOT_JS = '''() => {
+        const attr = (el, name) => el.getAttribute(name);
+        const forms = Array.from(document.querySelectorAll('form')).map(f => ({
+            action: attr(f, 'action'),
+            method: attr(f, 'method'),
+            inputs: Array.from(f.querySelectorAll('input, textarea, select'))
+                .filter(i => attr(i, 'name'))
+                .map(i => ({name: attr(i, 'name'), value: attr(i, 'value'), type: attr(i, 'type')}))
+        }));
+        return {
+            forms: forms,
+            links: Array.from(document.querySelectorAll('a, area')).map(a => a.href),
+            iframes: Array.from(document.querySelectorAll('iframe')).map(i => i.src)
+        };
+    }'''
+
+    async def extract_dom(self, page: Page) -> Dict[str, Any]:
+        """一次往返提取页面结构: {"forms": [...], "links": [...], "iframes": [...]}
+
+        forms 的结构与 _build_injection_points 的输入一致，属性缺失时为 None。
+        """
+        return await page.evaluate(self._DOM_SNAPSHOT_JS)
+
     async def find_injection_points(self, page: Page) -> List[Dict[str, Any]]:
         """输入点提取 (The Input Hunter): 扫描页面中所有的潜在注入点"""
+        dom = await self.extract_dom(page)
+        # 风险分析与 URL 参数提取在 Python 侧完成 (与 HTTP 模式共用)
+        return self._build_injection_points(page.url, dom["forms"])
+
+    def _build_injection_points(self, page_url: str, forms: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """根据表单原始属性与页面 URL 生成 injection_points (含风险启发式)
+
+        forms 中每项形如 {"action", "method", "inputs": [{"name", "value", "type"}]}，
+        属性缺失时为 None，与 Playwright get_attribute 的返回一致。
+        """
         points = []
-        # 1. 抓取所有表单及其字段
-        forms = await page.query_selector_all("form")
         for form in forms:
-            action = await form.get_attribute("action") or ""
-            inputs = await form.query_selector_all("input, textarea, select")
+            action = form.get("action") or ""
             input_details = []
             
             # [Risk Analysis] 简单的风险启发式分析
             form_risk = "normal"
-            sensitive_keywords = ["login", "admin", "delete", "update", "password", "upload", "exec"]
-            if any(k in action.lower() for k in sensitive_keywords):
+            if any(k in action.lower() for k in _FORM_RISK_KEYWORDS):
                 form_risk = "high"
 
-            for i in inputs:
-                name = await i.get_attribute("name")
+            for i in form.get("inputs", []):
+                name = i.get("name")
                 if name:
-                    # 获取更多元数据以便 extractor 使用
-                    default_val = await i.get_attribute("value")
-                    i_type = await i.get_attribute("type") or "text"
+                    default_val = i.get("value")
+                    i_type = i.get("type") or "text"
                     
                     # 策略：如果 default 为空，填入通用测试字符作为占位符
                     if not default_val:
@@ -73,7 +383,7 @@ class UniversalSpider:
                     
                     # 字段级别的风险分析
                     field_risk = form_risk
-                    if any(k in name.lower() for k in sensitive_keywords):
+                    if any(k in name.lower() for k in _FORM_RISK_KEYWORDS):
                         field_risk = "high"
                         
                     input_details.append({
@@ -84,22 +394,26 @@ class UniversalSpider:
                     })
             
             if input_details: # 只记录有输入项的表单
+                method = (form.get("method") or "GET").upper()
+                action_url = urljoin(page_url, action).split('#')[0]
                 points.append({
                     "type": "form",
-                    "method": (await form.get_attribute("method") or "GET").upper(),
+                    "method": method,
                     "action": action,
+                    "action_url": action_url,
+                    "signature": form_signature(action_url, method, [i["name"] for i in input_details]),
                     "inputs": input_details
                 })
         
-        # 2. 抓取 URL 参数作为注入点 (针对 GET 参数注入)
-        parsed = urlparse(page.url)
+        # 抓取 URL 参数作为注入点 (针对 GET 参数注入)
+        parsed = urlparse(page_url)
         if parsed.query:
             query_params = parse_qs(parsed.query)
             inputs = []
             
             # URL 级别的风险分析
             url_risk = "normal"
-            if any(k in parsed.path.lower() for k in ["admin", "login", "api", "cmd", "shell"]):
+            if any(k in parsed.path.lower() for k in _PATH_RISK_KEYWORDS):
                 url_risk = "high"
 
             for k, v in query_params.items():
@@ -107,7 +421,7 @@ class UniversalSpider:
                 
                 # 参数名风险分析
                 param_risk = url_risk
-                if any(kw in k.lower() for kw in ["id", "file", "cmd", "url", "path"]):
+                if any(kw in k.lower() for kw in _PARAM_RISK_KEYWORDS):
                      # 这些参数名常用于 SQLi, LFI, RCE, SSRF
                      param_risk = "high"
 
@@ -128,128 +442,779 @@ class UniversalSpider:
 
         return points
 
+    def _build_api_points(self, requests: List[Any]) -> List[Dict[str, Any]]:
+        """把页面加载期间捕获的同域 XHR/fetch 请求转换为 api 类型的注入点
+
+        输入项来自 Query 参数与请求体 (JSON 顶层键或 urlencoded 字段)；没有输入项的请求不记录，
+        同一页面上方法、地址与参数名都相同的请求只记录一次。
+        """
+        points, seen = [], set()
+        for request in requests:
+            url = request.url.split('#')[0]
+            if not url.startswith(self.base_url) or _is_static_asset(url.split('?')[0]):
+                continue
+            parsed = urlparse(url)
+            method = request.method.upper()
+            path_risk = "high" if any(k in parsed.path.lower() for k in _PATH_RISK_KEYWORDS) else "normal"
+
+            fields = [(k, v[0] if v else "", "query") for k, v in parse_qs(parsed.query, keep_blank_values=True).items()]
+            content_type = None
+            try:
+                body = request.post_data
+            except Exception:
+                body = None
+            if body:
+                header = (request.headers.get("content-type") or "").lower()
+                if "json" in header or body.lstrip().startswith("{"):
+                    try:
+                        data = json.loads(body)
+                    except ValueError:
+                        data = None
+                    if isinstance(data, dict):
+                        content_type = "json"
+                        # 保留原始类型 (数字、布尔、嵌套对象)，重放时请求体与页面实际发出的一致
+                        fields += [(k, v, "json") for k, v in data.items()]
+                elif "multipart" not in header and "=" in body:
+                    content_type = "form"
+                    fields += [(k, v[0] if v else "", "body") for k, v in parse_qs(body, keep_blank_values=True).items()]
+            if not fields:
+                continue
+
+            action_url = url.split('?')[0]
+            signature = form_signature(action_url, method, [name for name, _, _ in fields])
+            if signature in seen:
+                continue
+            seen.add(signature)
+            points.append({
+                "type": "api",
+                "method": method,
+                "action": parsed.path,
+                "action_url": action_url,
+                "content_type": content_type,
+                "signature": signature,
+                "inputs": [
+                    {
+                        "name": name,
+                        "default": default,
+                        "type": kind,
+                        "risk_level": "high" if any(kw in name.lower() for kw in _PARAM_RISK_KEYWORDS) else path_risk
+                    }
+                    for name, default, kind in fields
+                ]
+            })
+        return points
+
     async def get_page_fingerprint(self, page: Page, response) -> Dict[str, Any]:
         """获取当前页面的指纹 (复用已加载的页面)"""
         try:
             content = await page.content()
-            return {
-                "resp_length_base": len(content),
-                # 注意：这里的时间可能不准确，因为是爬虫过程中的加载。
-                # 但为了效率，暂时使用粗略估计或由 crawl 传入
-                "status_base": response.status if response else 0,
-                "dom_hash": hash(content)
-            }
+            # 注意：这里的时间可能不准确，因为是爬虫过程中的加载。
+            # 但为了效率，暂时使用粗略估计或由 crawl 传入
+            return self._fingerprint_from_content(content, response.status if response else 0)
         except Exception as e:
             print(f"[-] 指纹采集失败: {e}")
             return {}
 
+    def _fingerprint_from_content(self, content: str, status: int) -> Dict[str, Any]:
+        """由页面内容与状态码生成指纹 (Playwright / httpx 两条路径共用)"""
+        return {
+            "resp_length_base": len(content),
+            "status_base": status,
+            "dom_hash": stable_hash(content),
+            "simhash": f"{simhash(content):016x}"
+        }
+
+    def _parse_html(self, html: str, page_url: str) -> Tuple[List[Dict[str, Any]], List[str], bool]:
+        """解析原始 HTML，返回 (表单原始属性, 链接列表, 是否需要浏览器渲染)
+
+        表单结构与 find_injection_points 采集的一致，链接按 <base> 与页面 URL 解析为绝对地址。
+        """
+        soup = BeautifulSoup(html, "html.parser")
+
+        forms = []
+        for form in soup.find_all("form"):
+            inputs = []
+            for i in form.select("input, textarea, select"):
+                if i.get("name"):
+                    inputs.append({"name": i.get("name"), "value": i.get("value"), "type": i.get("type")})
+            forms.append({"action": form.get("action"), "method": form.get("method"), "inputs": inputs})
+
+        base_tag = soup.find("base", href=True)
+        link_base = urljoin(page_url, base_tag["href"]) if base_tag else page_url
+        links = [urljoin(link_base, a["href"]) for a in soup.find_all(["a", "area"], href=True)]
+        links.extend(urljoin(link_base, f["src"]) for f in soup.find_all(["iframe", "frame"], src=True))
+
+        return forms, links, self._looks_script_driven(soup)
+
+    def _looks_script_driven(self, soup: BeautifulSoup) -> bool:
+        """判断页面是否依赖脚本渲染 (此时原始 HTML 中的表单/链接不可信，需要浏览器)"""
+        # 1. 空 body (SPA 挂载点或纯 JS 输出)
+        body = soup.body
+        if body is None or (not body.get_text(strip=True) and not body.find(["form", "a", "input"])):
+            return True
+        # 2. 含 iframe / frameset，子框架内容需要浏览器上下文才能可靠解析
+        if soup.find(["iframe", "frame", "frameset"]):
+            return True
+        # 3. 脚本中动态写入表单或输入框
+        for script in soup.find_all("script"):
+            code = (script.string or "").lower()
+            if not code:
+                continue
+            if "<form" in code or "<input" in code or "document.write" in code:
+                return True
+            if "createelement(" in code and ("form" in code or "input" in code):
+                return True
+        return False
+
     async def crawl(self, page: Page, start_urls: List[str], max_depth: int = 3):
-        """递归爬取 (BFS)"""
-        queue = []
-        for url in start_urls:
-            queue.append((url, 0))
-            
-        visited = set()
+        """多标签页并发爬取 (风险优先)
+
+        以传入的 page 为第一个 worker，在同一 BrowserContext 中再开 self.workers - 1 个标签页，
+        所有 worker 共享同一个优先队列与 visited 集合，队列清空且无在途页面、或预算耗尽时结束。
+        """
+        self._template_enqueued = {}
+        self.pages_crawled = 0
+        self._crawl_started = time.time()
+        self._budget_exhausted = asyncio.Event()
+        frontier = CrawlFrontier(score=self._url_priority)
+        visited: Set[str] = set()
+        self.template_stats = {}
+        self.simhash_index = SimHashIndex(self.near_dup_distance) if self.near_dup_distance >= 0 else None
+        self.near_dup_skipped = 0
+        self.pages_recorded = 0
+        self._streamed_urls = set()
+        for key in [k for k in self.forms if k[0] == (self.security_level or "")]:
+            del self.forms[key]
+
+        restored = self.checkpoint.load(self.checkpoint_scope) if self.checkpoint else None
+        if restored:
+            # 断点续爬：恢复队列、去重集合、模板统计与已发现页面
+            visited = restored["visited"]
+            self.template_stats = restored["template_stats"]
+            self.results["pages"] = restored["pages"]
+            restored_pages = restored["pages"]
+            if self.page_stream:
+                # 流式输出时页面只存在于 JSONL 中；记下已写出的 URL，在途页面重爬后不再重复写出
+                restored_pages = (
+                    pg for pg in PageStreamReader(self.page_stream.path).iter_pages()
+                    if pg.get("security_level") == self.security_level
+                )
+            for page_entry in restored_pages:
+                self.pages_recorded += 1
+                self._is_near_duplicate(page_entry.get("baseline", {}))
+                self._index_forms(page_entry)
+                if self.page_stream:
+                    self._streamed_urls.add(page_entry["url"])
+            for item in restored["frontier"]:
+                frontier.put_nowait(tuple(item))
+            print(f"[+] 从断点恢复: 已发现 {self.pages_recorded} 个页面，待爬取 {len(restored['frontier'])} 个 URL")
+        else:
+            for url in start_urls:
+                frontier.put_nowait((url, 0))
+
+            # 增加一些常见路径作为种子，以确保覆盖（Heuristics）
+            # 尤其是 /admin, /index.php 等可能未直接链接但存在的页面
+            common_paths = ["index.php", "admin/", "login.php", "help.php"]
+            base_path = self.base_url.rstrip("/")
+            for p in common_paths:
+                full_p = f"{base_path}/{p}"
+                # 只有当这些路径在目标域下时才添加
+                frontier.put_nowait((full_p, 0))
+
+            if self.seed_discovery or self.har_file:
+                await self._add_discovered_seeds(page, frontier)
+
+        # HTTP 优先与增量模式：创建共享连接池，并同步浏览器 Context 中的 Session (含 auto_login 获得的 Cookie)
+        self.reused_pages = 0
+        if self.http_first or self.previous_pages:
+            self.http_client = httpx.AsyncClient(verify=False, timeout=10.0, follow_redirects=True)
+            cookies = await page.context.cookies()
+            self.http_client.cookies.update({c['name']: c['value'] for c in cookies})
+
+        # 额外的 worker 页面与传入的 page 共享 Context，因此共享 Cookie / Session
+        worker_pages = [page]
+        for _ in range(max(1, self.workers) - 1):
+            worker_pages.append(await page.context.new_page())
+
+        tasks = [
+            asyncio.create_task(self._crawl_worker(p, frontier, visited, start_urls, max_depth))
+            for p in worker_pages
+        ]
+        if self.checkpoint:
+            tasks.append(asyncio.create_task(self._checkpoint_loop(frontier, visited)))
+        completed = False
+        join_task = asyncio.create_task(frontier.join())
+        budget_task = asyncio.create_task(self._budget_exhausted.wait())
+        try:
+            await asyncio.wait([join_task, budget_task], return_when=asyncio.FIRST_COMPLETED)
+            completed = join_task.done()
+            if not completed:
+                self.unfinished_scopes.append(self.checkpoint_scope)
+                print(f"[*] 爬取预算耗尽 (已分析 {self.pages_crawled} 个页面，耗时 {time.time() - self._crawl_started:.0f}s)，"
+                      f"剩余 {len(frontier.snapshot())} 个 URL 未爬取")
+        finally:
+            join_task.cancel()
+            budget_task.cancel()
+            # 无论正常结束、异常还是 Ctrl-C 都落盘一次 (须在取消 worker 之前，保留在途 URL)
+            if self.checkpoint:
+                self._save_checkpoint(frontier, visited, done=completed)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for p in worker_pages[1:]:
+                try:
+                    await p.close()
+                except Exception:
+                    pass
+            if self.http_client:
+                await self.http_client.aclose()
+                self.http_client = None
+
+        # 把模板折叠数写回采样页面，便于下游判断该页面代表了多少同构页面
+        for page_entry in self.results["pages"]:
+            stats = self.template_stats.get(page_entry.get("url_template", ""))
+            if stats:
+                page_entry["template_siblings"] = stats["collapsed"]
+        if self.page_stream:
+            self.page_stream.template_siblings[self.security_level or ""] = {
+                tpl: st["collapsed"] for tpl, st in self.template_stats.items() if st["collapsed"]
+            }
+        collapsed_total = sum(st["collapsed"] for st in self.template_stats.values())
+        if collapsed_total:
+            print(f"[*] URL 模板去重: {len(self.template_stats)} 个模板，折叠 {collapsed_total} 个同构页面")
+        if self.near_dup_skipped:
+            print(f"[*] 近似重复页面: {self.near_dup_skipped} 个页面未展开链接")
+        if self.previous_pages:
+            print(f"[*] 增量重爬: {self.reused_pages}/{self.pages_recorded} 个页面未变化，复用上次结果")
+
+    async def _crawl_worker(self, page: Page, frontier: CrawlFrontier, visited: Set[str],
+                            start_urls: List[str], max_depth: int):
+        """单个 worker：不断从共享队列取 URL 并在自己的标签页中分析"""
+        while not self._budget_exhausted.is_set():
+            url, depth = await frontier.get()
+            frontier.in_flight.append((url, depth))
+            try:
+                await self._crawl_url(page, url, depth, frontier, visited, start_urls, max_depth)
+            except Exception as e:
+                # 单个 URL 的异常 (HTTP 解析、断点写入等) 不能让 worker 退出，否则队列无人消费
+                print(f"[-] 分析 {url} 失败: {e}")
+            finally:
+                frontier.in_flight.remove((url, depth))
+                frontier.task_done()
+
+    async def _checkpoint_loop(self, frontier: CrawlFrontier, visited: Set[str]):
+        """按固定间隔写入断点"""
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            self._save_checkpoint(frontier, visited)
+
+    def _save_checkpoint(self, frontier: CrawlFrontier, visited: Set[str], done: bool = False):
+        """写入当前 scope 的断点；在途 URL 视为未访问，恢复后重新爬取"""
+        in_flight = {u.split('#')[0] for u, _ in frontier.in_flight}
+        template_stats = {k: dict(v) for k, v in self.template_stats.items()}
+        for u in in_flight:
+            stats = template_stats.get(url_template(u))
+            if stats and stats["sampled"] > 0:
+                stats["sampled"] -= 1
+        try:
+            self.checkpoint.save(self.checkpoint_scope, frontier.snapshot(), visited - in_flight,
+                                 self.results["pages"], template_stats, done=done)
+        except Exception as e:
+            print(f"[-] 断点写入失败: {e}")
+
+    async def _crawl_url(self, page: Page, url: str, depth: int, frontier: CrawlFrontier, visited: Set[str],
+                         start_urls: List[str], max_depth: int):
+        """分析单个 URL：采集指纹与注入点，并把新链接放回共享队列"""
+        # 规范化 URL 以去重 (简单去除 fragment)
+        url = url.split('#')[0]
         
-        # 增加一些常见路径作为种子，以确保覆盖（Heuristics）
-        # 尤其是 /admin, /index.php 等可能未直接链接但存在的页面
-        common_paths = ["index.php", "admin/", "login.php", "help.php"]
-        base_path = self.base_url.rstrip("/")
-        for p in common_paths:
-            full_p = f"{base_path}/{p}"
-            # 只有当这些路径在目标域下时才添加
-            queue.append((full_p, 0))
-
-        # 确保 base_url 在 visited 中，避免重复 (如果 start_url 就是 base_url)
-        # 但这里依靠 queue 处理即可。
-
-        while queue:
-            url, depth = queue.pop(0)
-            
-            # 规范化 URL 以去重 (简单去除 fragment)
-            url = url.split('#')[0]
-            
-            if url in visited:
-                continue
-            visited.add(url)
+        # 去重检查与 add 之间没有 await，多个 worker 不会重复领取同一 URL
+        if url in visited:
+            return
+        visited.add(url)
 
-            # 只爬取目标范围内的 URL (除了 start_url 可能是入口)
-            if not url.startswith(self.base_url) and url not in start_urls:
-                continue
-            
-            # 静态资源过滤
-            lower_href = url.lower()
-            if any(lower_href.endswith(ext) for ext in [".jpg", ".jpeg", ".png", ".gif", ".css", ".js", ".pdf", ".ico", ".svg", ".woff", ".woff2"]):
-                continue
+        # 只爬取目标范围内的 URL (除了 start_url 可能是入口)
+        if not url.startswith(self.base_url) and url not in start_urls:
+            return
+        
+        # 静态资源过滤
+        if _is_static_asset(url):
+            return
 
-            print(f"[+] 正在分析 (Depth {depth}): {url}")
-            
+        # 模板去重：同模板样本已满则只计数不爬取
+        if not self._take_template_sample(url):
+            return
+
+        # 预算耗尽：撤销本次领取并放回队列，留给断点续爬
+        if not self._take_budget():
+            visited.discard(url)
+            self.template_stats[url_template(url)]["sampled"] -= 1
+            frontier.put_nowait((url, depth))
+            return
+
+        if self.previous_pages and await self._reuse_previous(url, depth, frontier, visited, max_depth):
+            return
+
+        if self.http_first and await self._crawl_url_http(url, depth, frontier, visited, max_depth):
+            return
+
+        print(f"[+] 正在分析 (Depth {depth}): {url}")
+        timer = self.timings.start(url, "browser", self.security_level)
+        # 捕获本次页面加载与稳定期间发出的 XHR/fetch 请求 (不额外导航)
+        api_requests: List[Any] = []
+
+        def _capture(request):
+            if request.resource_type in ("xhr", "fetch"):
+                api_requests.append(request)
+        page.on("request", _capture)
+        
+        try:
+            await self.rate_limiter.acquire(url)
+            start_time = time.time()
+            # 导航拆成收到响应 / DOMContentLoaded / 页面稳定三段计时
+            self.settler.attach(page)
             try:
-                start_time = time.time()
-                response = await page.goto(url)
-                await page.wait_for_load_state("networkidle")
-                resp_time = time.time() - start_time
-                
-                # 1. 采集指纹与注入点
-                # 只有当 URL 属于目标域时才记录结果
-                if url.startswith(self.base_url):
+                with timer.phase("navigation"):
+                    response = await page.goto(url, wait_until="commit")
+            except Exception as e:
+                self.rate_limiter.record_error(url, e)
+                raise
+            if response:
+                timer.status = response.status
+                self.rate_limiter.record(url, time.time() - start_time, response.status, response.headers)
+            with timer.phase("dom_ready"):
+                await page.wait_for_load_state("domcontentloaded")
+            with timer.phase("settle"):
+                await self.settler.settle(page)
+            resp_time = time.time() - start_time
+            
+            # 表单与链接一次性取回，记录结果与扩展链接共用
+            in_scope = url.startswith(self.base_url)
+            expand = depth < max_depth
+            with timer.phase("extract"):
+                dom = await self.extract_dom(page) if (in_scope or expand) else None
+
+            # 1. 采集指纹与注入点
+            # 只有当 URL 属于目标域时才记录结果
+            if in_scope:
+                with timer.phase("fingerprint"):
                     baseline = await self.get_page_fingerprint(page, response)
-                    if baseline:
-                        baseline["resp_time_base"] = resp_time
-                        
-                        injection_points = await self.find_injection_points(page)
-                        
-                        # [Baseline 有效性检查]
-                        # 简单的启发式检查：如果页面长度极短且包含 "login" 关键字，可能需要警告
-                        # 但我们不在这里中断，而是记录下来
-                        
-                        self.results["pages"].append({
-                            "url": url,
-                            "baseline": baseline,
-                            "injection_points": injection_points
-                        })
-                
-                # 2. 提取新链接 (如果未达到最大深度)
-                # 优化：对于看起来像是列表页的，鼓励更深一层
-                if depth < max_depth:
-                    hrefs = await page.evaluate('''() => {
-                        return Array.from(document.querySelectorAll('a, area')).map(a => a.href)
-                    }''')
+                if baseline:
+                    baseline["resp_time_base"] = resp_time
                     
-                    # 尝试发现 iframe 中的链接 (针对 Pikachu 等)
-                    iframe_srcs = await page.evaluate('''() => {
-                         return Array.from(document.querySelectorAll('iframe')).map(i => i.src)
-                    }''')
-                    hrefs.extend(iframe_srcs)
+                    with timer.phase("injection_points"):
+                        injection_points = self._build_injection_points(page.url, dom["forms"])
+                        injection_points += self._build_api_points(api_requests)
                     
-                    count_new = 0
-                    for href in hrefs:
-                        # 简单的过滤
-                        if not href or href.startswith('javascript:'):
-                            continue
-                        
-                        # 必须是同域链接才加入队列 (防止爬出站)
-                        if href.startswith(self.base_url):
-                            # 预先检查 visited 减少队列膨胀 (虽然 pop 时也会检查)
-                            clean_href = href.split('#')[0]
-                            if clean_href not in visited:
-                                queue.append((href, depth + 1))
-                                count_new += 1
+                    # [Baseline 有效性检查]
+                    # 简单的启发式检查：如果页面长度极短且包含 "login" 关键字，可能需要警告
+                    # 但我们不在这里中断，而是记录下来
                     
-                    # print(f"    -> 发现 {count_new} 个新链接")
+                    try:
+                        raw_body = await response.text() if response else ""
+                    except Exception:
+                        raw_body = ""
+                    timer.bytes = len(raw_body.encode("utf-8"))
+                    with timer.phase("links"):
+                        scope_links = self._scope_links(dom["links"] + dom["iframes"])
+                    self._record_page({
+                        "url": url,
+                        "url_template": url_template(url),
+                        "baseline": baseline,
+                        "injection_points": injection_points,
+                        "validators": self._validators(response.headers if response else {}, raw_body),
+                        "links": scope_links
+                    })
+                    # 与已展开页面近似重复时，其链接大概率已入队，不再展开
+                    if expand and self._is_near_duplicate(baseline):
+                        expand = False
+            
+            # 2. 提取新链接 (如果未达到最大深度)，含 iframe 中的链接 (针对 Pikachu 等)
+            if expand:
+                with timer.phase("links"):
+                    self._enqueue_links(dom["links"] + dom["iframes"], depth, frontier, visited)
 
-            except Exception as e:
-                print(f"[-] 爬取失败 {url}: {e}")
+        except Exception as e:
+            timer.error = str(e)
+            print(f"[-] 爬取失败 {url}: {e}")
+        finally:
+            page.remove_listener("request", _capture)
+            self.timings.finish(timer)
+
+    async def _crawl_url_http(self, url: str, depth: int, frontier: CrawlFrontier, visited: Set[str],
+                              max_depth: int) -> bool:
+        """HTTP 优先路径：用 httpx 拉取并解析原始 HTML
+
+        返回 True 表示页面已处理完毕；返回 False 表示页面疑似脚本驱动 (或请求失败)，需回退 Playwright。
+        """
+        timer = self.timings.start(url, "http", self.security_level)
+        await self.rate_limiter.acquire(url)
+        try:
+            start_time = time.time()
+            with timer.phase("navigation"):
+                r = await self.http_client.get(url)
+            resp_time = time.time() - start_time
+        except Exception as e:
+            self.rate_limiter.record_error(url, e)
+            print(f"[-] HTTP 拉取失败，回退浏览器 {url}: {e}")
+            timer.error = str(e)
+            self._finish_fallback(timer)
+            return False
+        self.rate_limiter.record(url, resp_time, r.status_code, r.headers)
+        timer.status = r.status_code
+        timer.bytes = len(r.content)
+
+        html = r.text
+        # 非 HTML 响应 (JSON、纯文本等) 不存在脚本渲染问题，直接按 HTTP 结果记录
+        is_html = "html" in r.headers.get("content-type", "").lower() or html.lstrip()[:15].lower().startswith(("<!doctype", "<html"))
+        with timer.phase("extract"):
+            forms, links, script_driven = self._parse_html(html, str(r.url))
+        if script_driven and is_html:
+            self._finish_fallback(timer)
+            return False
+
+        print(f"[+] 正在分析 (Depth {depth}, HTTP): {url}")
+
+        # 与浏览器路径保持相同的记录条件与结构
+        expand = depth < max_depth
+        if url.startswith(self.base_url):
+            with timer.phase("fingerprint"):
+                baseline = self._fingerprint_from_content(html, r.status_code)
+            baseline["resp_time_base"] = resp_time
+            with timer.phase("injection_points"):
+                injection_points = self._build_injection_points(str(r.url), forms)
+            with timer.phase("links"):
+                scope_links = self._scope_links(links)
+            self._record_page({
+                "url": url,
+                "url_template": url_template(url),
+                "baseline": baseline,
+                "injection_points": injection_points,
+                "validators": self._validators(r.headers, html),
+                "links": scope_links
+            })
+            if expand and self._is_near_duplicate(baseline):
+                expand = False
+
+        if expand:
+            with timer.phase("links"):
+                self._enqueue_links(links, depth, frontier, visited)
+        self.timings.finish(timer)
+        return True
+
+    def _finish_fallback(self, timer: PageTimer):
+        """快速路径放弃时也结束计时，已花费的请求与解析时间计入统计，页面由浏览器路径另行记录"""
+        timer.outcome = "fallback"
+        self.timings.finish(timer)
+
+    def _load_previous(self, path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """读取上次爬取结果 (.json 或 .jsonl)，按 (安全等级, URL) 建立索引"""
+        if not os.path.exists(path):
+            print(f"[!] 上次结果不存在，按全量爬取: {path}")
+            return {}
+        if is_page_stream(path):
+            reader = PageStreamReader(path)
+            index = {(pg.get("security_level") or "", pg["url"]): pg for pg in reader.iter_pages()}
+            forms = (reader.end or {}).get("forms", [])
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            index = {(pg.get("security_level") or "", pg["url"]): pg for pg in data.get("pages", [])}
+            forms = data.get("forms", [])
+        self.previous_forms = {(f.get("security_level") or "", f["signature"]): f for f in forms}
+        print(f"[+] 增量模式: 载入上次结果 {len(index)} 个页面 ({path})")
+        return index
+
+    def _validators(self, headers, body: str) -> Dict[str, Optional[str]]:
+        """增量重爬所需的校验信息：ETag / Last-Modified 与原始响应体的稳定指纹"""
+        headers = {k.lower(): v for k, v in headers.items()}
+        return {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body_hash": stable_hash(body),
+        }
+
+    def _scope_links(self, hrefs: List[str]) -> List[str]:
+        """页面上的同域链接 (去重保序)，增量重爬复用页面时据此继续展开"""
+        return [h for h in dict.fromkeys(hrefs) if h and h.startswith(self.base_url)]
+
+    async def _reuse_previous(self, url: str, depth: int, frontier: CrawlFrontier, visited: Set[str],
+                              max_depth: int) -> bool:
+        """增量重爬：页面未变化时复用上次的 baseline 与 injection_points，返回 True；否则返回 False 重新分析
+
+        有 ETag / Last-Modified 时发送条件请求 (304 即未变化)；否则比较原始响应体的稳定指纹
+        (CSRF token 等易变令牌已归一化)。两种方式都只需一次 HTTP 请求，无需浏览器渲染。
+        """
+        prev = self.previous_pages.get((self.security_level or "", url))
+        validators = (prev or {}).get("validators")
+        if not validators:
+            return False
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        timer = self.timings.start(url, "reused", self.security_level)
+        await self.rate_limiter.acquire(url)
+        try:
+            start_time = time.time()
+            with timer.phase("navigation"):
+                r = await self.http_client.get(url, headers=headers)
+        except Exception as e:
+            self.rate_limiter.record_error(url, e)
+            timer.error = str(e)
+            self._finish_fallback(timer)
+            return False
+        self.rate_limiter.record(url, time.time() - start_time, r.status_code, r.headers)
+        timer.status = r.status_code
+        timer.bytes = len(r.content)
+
+        unchanged = r.status_code == 304 or (
+            r.status_code == prev["baseline"].get("status_base") and stable_hash(r.text) == validators.get("body_hash")
+        )
+        if not unchanged:
+            self._finish_fallback(timer)
+            return False
+
+        print(f"[+] 未变化，复用上次结果 (Depth {depth}): {url}")
+        page_entry = copy.deepcopy(prev)
+        self._record_page(page_entry)
+        self.reused_pages += 1
+        if depth < max_depth and not self._is_near_duplicate(page_entry["baseline"]):
+            with timer.phase("links"):
+                self._enqueue_links(page_entry.get("links", []), depth, frontier, visited)
+        self.timings.finish(timer)
+        return True
+
+    async def _add_discovered_seeds(self, page: Page, frontier: CrawlFrontier):
+        """把 sitemap / robots.txt / HAR 中发现的 URL 经范围与静态资源过滤后作为深度 0 的种子入队"""
+        task = self._seed_cache.get(self.base_url)
+        if task is None:
+            cookies = {c['name']: c['value'] for c in await page.context.cookies()}
+            task = self._seed_cache[self.base_url] = asyncio.ensure_future(
+                discover_seeds(self.base_url, cookies, self.har_file, fetch_remote=self.seed_discovery)
+            )
+        seeds = await task
+
+        added: Set[str] = set()
+        counts = []
+        for source, urls in seeds.items():
+            kept = 0
+            for url in urls:
+                url = url.split('#')[0]
+                if not url.startswith(self.base_url) or _is_static_asset(url) or url in added:
+                    continue
+                added.add(url)
+                frontier.put_nowait((url, 0))
+                kept += 1
+            if urls:
+                counts.append(f"{source} {kept}/{len(urls)}")
+        if counts:
+            print(f"[+] 种子发现: {', '.join(counts)} (范围内/总数)")
+
+    def _url_priority(self, url: str, depth: int) -> float:
+        """URL 爬取优先级 (越大越先爬)，入队时调用一次并登记该模板的入队次数
+
+        与 _build_injection_points 使用同一套敏感关键词：路径命中敏感/漏洞页关键词、
+        带 Query 参数 (参数名敏感再加分)、模板越少见越优先；帮助说明类页面降权。
+        """
+        parsed = urlparse(url)
+        path = parsed.path.lower()
+        score = 0.0
+        if any(k in path for k in _PATH_RISK_KEYWORDS + _FORM_RISK_KEYWORDS + _VULN_PATH_HINTS):
+            score += 2.0
+        params = parse_qs(parsed.query, keep_blank_values=True)
+        if params:
+            score += 2.0
+            if any(kw in name.lower() for name in params for kw in _PARAM_RISK_KEYWORDS):
+                score += 1.0
+        if any(k in path for k in _LOW_VALUE_PATH_HINTS):
+            score -= 3.0
+        # 新颖度：同模板第 n 次入队得 2/n 分
+        template = url_template(url.split('#')[0])
+        seen = self._template_enqueued.get(template, 0)
+        self._template_enqueued[template] = seen + 1
+        return score + 2.0 / (1 + seen)
+
+    def _take_budget(self) -> bool:
+        """申请分析一个页面；页面数或时间预算耗尽时通知所有 worker 停止并返回 False"""
+        over_pages = self.max_pages and self.pages_crawled >= self.max_pages
+        over_time = self.time_budget and time.time() - self._crawl_started >= self.time_budget
+        if over_pages or over_time:
+            self._budget_exhausted.set()
+            return False
+        self.pages_crawled += 1
+        return True
+
+    def _record_page(self, page_entry: Dict[str, Any]):
+        """记录一个已分析的页面：流式模式立即写入 JSONL，否则累积到 results"""
+        if self.security_level:
+            page_entry["security_level"] = self.security_level
+        if self.page_stream and page_entry["url"] in self._streamed_urls:
+            return
+        self._index_forms(page_entry)
+        if self.page_stream:
+            self.page_stream.write(page_entry)
+        else:
+            self.results["pages"].append(page_entry)
+        self.pages_recorded += 1
+
+    def _index_forms(self, page_entry: Dict[str, Any]):
+        """登记页面上的表单与 API 接口：同一安全等级内签名首次出现的页面保留完整定义，之后的页面改为 form_ref / api_ref
+
+        引用只含签名、方法与 action，完整定义与出现页面列表见写出结果中的 forms。
+        对已处理过的页面 (断点恢复、增量复用) 重复调用是安全的。
+        """
+        level = page_entry.get("security_level") or ""
+        url = page_entry["url"]
+        points = []
+        for point in page_entry.get("injection_points", []):
+            sig = point.get("signature")
+            is_ref = point["type"] in _SHARED_POINT_REFS.values()
+            if not sig or not (is_ref or point["type"] in _SHARED_POINT_REFS):
+                points.append(point)
+                continue
+            entry = self.forms.get((level, sig))
+            if entry is None:
+                # 首次出现；引用的完整定义所在页面本轮未出现时，用上次结果的表单索引还原
+                definition = self.previous_forms.get((level, sig)) if is_ref else point
+                if definition is None:
+                    points.append(point)
+                    continue
+                entry = self.forms[(level, sig)] = {"type": definition.get("type", "form")}
+                entry.update({
+                    key: definition[key]
+                    for key in ("signature", "method", "action", "action_url", "content_type", "inputs") if key in definition
+                })
+                if level:
+                    entry["security_level"] = level
+                entry["pages"] = []
+            if url not in entry["pages"]:
+                entry["pages"].append(url)
+            if entry["pages"][0] == url:
+                points.append({k: v for k, v in entry.items() if k not in ("pages", "security_level")})
+            else:
+                points.append({"type": _SHARED_POINT_REFS[entry["type"]], "signature": sig,
+                               "method": entry["method"], "action": entry["action"]})
+        page_entry["injection_points"] = points
+
+    def _is_near_duplicate(self, baseline: Dict[str, Any]) -> bool:
+        """页面与已登记页面近似重复时返回 True；否则登记其 SimHash 并返回 False"""
+        if self.simhash_index is None or not baseline.get("simhash"):
+            return False
+        value = int(baseline["simhash"], 16)
+        if self.simhash_index.find(value) is not None:
+            self.near_dup_skipped += 1
+            return True
+        self.simhash_index.add(value)
+        return False
+
+    def _enqueue_links(self, hrefs: List[str], depth: int, frontier: CrawlFrontier, visited: Set[str]) -> int:
+        """把同域新链接放入共享队列，返回入队数量"""
+        count_new = 0
+        for href in hrefs:
+            # 简单的过滤
+            if not href or href.startswith('javascript:'):
+                continue
+            
+            # 必须是同域链接才加入队列 (防止爬出站)
+            if href.startswith(self.base_url):
+                # 预先检查 visited 减少队列膨胀 (虽然出队时也会检查)
+                clean_href = href.split('#')[0]
+                if clean_href in visited:
+                    continue
+                # 模板样本已满的兄弟链接直接折叠，避免队列随数据行数膨胀
+                if self._template_full(clean_href):
+                    visited.add(clean_href)
+                    self.template_stats[url_template(clean_href)]["collapsed"] += 1
+                    continue
+                frontier.put_nowait((href, depth + 1))
+                count_new += 1
+        return count_new
+
+    def _template_full(self, url: str) -> bool:
+        """该 URL 所属模板的采样数是否已达上限"""
+        if not self.template_cap:
+            return False
+        stats = self.template_stats.get(url_template(url))
+        return bool(stats) and stats["sampled"] >= self.template_cap
+
+    def _take_template_sample(self, url: str) -> bool:
+        """为 URL 申请一个模板采样名额；名额已满时记入 collapsed 并返回 False"""
+        stats = self.template_stats.setdefault(url_template(url), {"sampled": 0, "collapsed": 0})
+        if self.template_cap and stats["sampled"] >= self.template_cap:
+            stats["collapsed"] += 1
+            return False
+        stats["sampled"] += 1
+        return True
+
+    def _load_finished_level(self, level_name: str) -> Optional[List[Dict[str, Any]]]:
+        """批量爬虫续爬：若该等级在断点中已完成，返回其页面 (跳过登录与爬取)，否则返回 None"""
+        restored = self.checkpoint.load(level_name) if self.checkpoint else None
+        if not restored or not restored["done"]:
+            return None
+        print(f"\n[+] 断点显示等级 {level_name} 已完成，直接载入 {len(restored['pages'])} 个页面")
+        for page_entry in restored["pages"]:
+            page_entry["security_level"] = level_name
+            self._index_forms(page_entry)
+        return restored["pages"]
+
+    def _fork(self, scope: str) -> "UniversalSpider":
+        """为并发爬取的安全等级创建副本：共享配置、断点与资源策略，爬取状态各自独立"""
+        clone = copy.copy(self)
+        clone.results = {"base_url": self.base_url, "pages": []}
+        clone.template_stats = {}
+        clone.http_client = None
+        clone.simhash_index = None
+        clone.checkpoint_scope = scope
+        clone.security_level = scope
+        clone._template_enqueued = {}
+        return clone
+
+    def _open_output(self, output: str):
+        """输出路径为 .jsonl 时在爬取开始前打开流式写入器"""
+        if is_page_stream(output):
+            self.page_stream = PageStreamWriter(output, self.base_url, resume=self.resume)
+            print(f"[*] 流式输出: 页面将逐条写入 {output}")
+        self.timings = CrawlTimings(f"{output}.timings.jsonl", top_n=self.slow_top, resume=self.resume)
+
+    def _write_output(self, output: str, results: Dict[str, Any], complete: bool = True):
+        """写出最终结果；流式模式下页面已写出，只需写入结束标记"""
+        self.timings.close()
+        forms = list(self.forms.values())
+        if forms:
+            shared = sum(1 for f in forms if len(f["pages"]) > 1)
+            print(f"[*] 表单去重: {len(forms)} 个唯一表单，其中 {shared} 个出现在多个页面")
+        if self.page_stream:
+            self.page_stream.forms = forms
+            self.page_stream.close(complete=complete)
+            self.page_stream = None
+            return
+        results["forms"] = forms
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    def _merge_levels(self, level_names: List[str], level_pages: List[Any]) -> bool:
+        """按等级顺序 (等级内按 URL 排序) 合并各等级结果，保证输出顺序确定；全部成功时返回 True"""
+        all_ok = True
+        for level_name, pages in zip(level_names, level_pages):
+            if isinstance(pages, BaseException):
+                print(f"[-] 等级 {level_name} 爬取失败 (断点已保留，可用 --resume 续爬): {pages}")
+                all_ok = False
+                continue
+            self.all_results["pages"].extend(sorted(pages, key=lambda pg: pg["url"]))
+        return all_ok
 
     async def run(self, start_path: str = "/", headless: bool = True, output: str = "targets.json"):
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=headless)
-            context = await browser.new_context()
             
             # A. 初始化与会话注入
-            await self.init_browser(context)
-            
-            page = await context.new_page()
+            context, page = await self.open_session(browser)
+            self._open_output(output)
             
             # 开始爬取
             full_start_url = f"{self.base_url}{start_path}" if start_path.startswith("/") else start_path
@@ -260,23 +1225,25 @@ class UniversalSpider:
             await self.crawl(page, [full_start_url])
 
             # 保存结果
-            # 如果 output 包含目录，先创建目录
-            import os
-            if os.path.dirname(output):
-                os.makedirs(os.path.dirname(output), exist_ok=True)
-                
-            with open(output, "w", encoding="utf-8") as f:
-                json.dump(self.results, f, indent=2, ensure_ascii=False)
+            self._write_output(output, self.results, complete=not self.unfinished_scopes)
             print(f"[+] 结果已写入 {output}")
+            if self.checkpoint and not self.unfinished_scopes:
+                self.checkpoint.remove()
             
+            print(self.resource_policy.summary())
+            print(self.rate_limiter.summary())
+            print(self.timings.summary())
+            print(self.settler.summary())
             await browser.close()
 
 
 class DVWASpider(UniversalSpider):
     """DVWA 专用批量爬虫：自动遍历 low, medium, high, impossible 等级"""
+
+    session_check_path = "index.php"
     
-    def __init__(self, base_url: str, cookies: str):
-        super().__init__(base_url, cookies)
+    def __init__(self, base_url: str, cookies: str, **kwargs):
+        super().__init__(base_url, cookies, **kwargs)
         self.levels = ['low', 'medium', 'high', 'impossible']
         self.all_results = {"base_url": base_url, "pages": []}
 
@@ -300,78 +1267,80 @@ class DVWASpider(UniversalSpider):
         except Exception as e:
             print(f"[-] DVWA 自动登录失败: {e}")
 
+    async def _crawl_level(self, browser: Browser, level: str, base_cookie_str: str, start_path: str) -> List[Dict[str, Any]]:
+        """在独立 Context 中登录并爬取单个安全等级，返回标记了 security_level 的页面"""
+        pages = self._load_finished_level(level)
+        if pages is not None:
+            return pages
+
+        print(f"\n[+] === 开始爬取 DVWA Level: {level} ===")
+        spider = self._fork(level)
+        # 构造当前等级的 Cookie
+        spider.cookies = f"{base_cookie_str}; security={level}"
+        
+        # 创建新的 Context 以隔离 Cookie；每个 Context 都有独立的 Session，需要各自登录 (或载入该等级已保存的会话)
+        context, page = await spider.open_session(browser, level, spider.auto_login)
+        try:
+            # 构造完整的 start_url
+            full_start_url = f"{self.base_url}{start_path}" if start_path.startswith("/") else start_path
+            if not full_start_url.startswith("http"):
+                 full_start_url = f"{self.base_url}/{start_path.lstrip('/')}"
+
+            # 传入列表，避免把字符串拆成字符导致异常导航
+            await spider.crawl(page, [full_start_url])
+        finally:
+            await context.close()
+
+        print(f"[+] DVWA Level {level} 完成，发现 {spider.pages_recorded} 个页面")
+        return spider.results["pages"]
+
     async def run_batch(self, start_path: str = "/", headless: bool = True, output: str = "data/targets_dvwa.json"):
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=headless)
             
-            # 从原始 cookies 中移除 security 字段，避免冲突
+            # 从原始 cookies 中移除 security 字段，避免冲突；
+            # 同时移除 PHPSESSID，各等级并发登录时必须使用各自独立的 Session
             base_cookies_parts = []
             for pair in self.cookies.split(";"):
                 if "=" in pair:
                     key, _ = pair.strip().split("=", 1)
-                    if key.strip() != "security":
+                    if key.strip() not in ("security", "PHPSESSID"):
                         base_cookies_parts.append(pair.strip())
             base_cookie_str = "; ".join(base_cookies_parts)
+            self._open_output(output)
 
-            for level in self.levels:
-                print(f"\n[+] === 开始爬取 DVWA Level: {level} ===")
-                # 构造当前等级的 Cookie
-                current_cookie = f"{base_cookie_str}; security={level}"
-                
-                # 创建新的 Context 以隔离 Cookie
-                context = await browser.new_context()
-                
-                # 临时更新 self.cookies 供 init_browser 使用
-                self.cookies = current_cookie
-                await self.init_browser(context)
-                
-                page = await context.new_page()
-                
-                # [新增] 在每个安全等级开始前，都尝试确保登录态
-                # 实际上 DVWA 的 Session 在 Context 内是共享的，但 Cookie 可能会覆盖
-                # 最好在每次 new_context 后都检查登录
-                await self.auto_login(page)
-
-                # 重置 self.results 以便通过 crawl 收集当前等级的数据
-                # 注意：这里需要清空 pages 列表，否则会累积之前的等级数据
-                self.results = {"base_url": self.base_url, "pages": []}
-                
-                # 构造完整的 start_url
-                full_start_url = f"{self.base_url}{start_path}" if start_path.startswith("/") else start_path
-                if not full_start_url.startswith("http"):
-                     full_start_url = f"{self.base_url}/{start_path.lstrip('/')}"
-
-                # 调用父类的 crawl
-                # 传入列表，避免把字符串拆成字符导致异常导航
-                await self.crawl(page, [full_start_url])
-                
-                # 将结果标记等级并合并
-                for page_entry in self.results["pages"]:
-                    page_entry["security_level"] = level
-                    self.all_results["pages"].append(page_entry)
-                
-                await context.close()
+            # 各等级在独立 Context 中并发登录与爬取，总耗时取决于最慢的等级
+            level_pages = await asyncio.gather(
+                *[self._crawl_level(browser, level, base_cookie_str, start_path) for level in self.levels],
+                return_exceptions=True
+            )
+            all_ok = self._merge_levels(self.levels, level_pages) and not self.unfinished_scopes
             
-            # 保存总结果
-            import os
-            if os.path.dirname(output):
-                os.makedirs(os.path.dirname(output), exist_ok=True)
-                
-            with open(output, "w", encoding="utf-8") as f:
-                json.dump(self.all_results, f, indent=2, ensure_ascii=False)
+            # 保存总结果 (有等级失败或预算耗尽时保留断点、流式模式不写结束标记，便于 --resume 续爬)
+            self._write_output(output, self.all_results, complete=all_ok)
             print(f"\n[+] DVWA 所有等级爬取完成，结果已写入 {output}")
+            if self.checkpoint and all_ok:
+                self.checkpoint.remove()
             
+            print(self.resource_policy.summary())
+            print(self.rate_limiter.summary())
+            print(self.timings.summary())
+            print(self.settler.summary())
             await browser.close()
 
 
 class BWAPPSpider(UniversalSpider):
     """bWAPP 专用批量爬虫：自动遍历 low, medium, high 等级"""
+
+    session_check_path = "portal.php"
     
-    def __init__(self, base_url: str, cookies: str):
-        super().__init__(base_url, cookies)
+    def __init__(self, base_url: str, cookies: str, **kwargs):
+        super().__init__(base_url, cookies, **kwargs)
         self.levels = ['0', '1', '2']  # 0=low, 1=medium, 2=high
         self.level_names = {'0': 'low', '1': 'medium', '2': 'high'}
         self.all_results = {"base_url": base_url, "pages": []}
+        # 候选漏洞页的存在性预检结果，按部署目录缓存，并发爬取的各等级共用一次检查
+        self._entry_cache: Dict[str, asyncio.Future] = {}
 
     async def auto_login(self, page: Page, level_code: str):
         """使用默认凭据登录 bWAPP 并设置安全等级"""
@@ -454,10 +1423,84 @@ class BWAPPSpider(UniversalSpider):
             urls.append(f"{base_dir}/{page_name}")
             # 2) 兼容路径: /bWAPP/app/<page>.php（部分部署将漏洞页置于 app 子目录）
             urls.append(f"{base_dir}/app/{page_name}")
+
+        # 两种路径通常只有一种存在，先并发预检，避免逐个渲染 404 页面
+        task = self._entry_cache.get(base_dir)
+        if task is None:
+            cookies = {c['name']: c['value'] for c in await page.context.cookies()}
+            task = self._entry_cache[base_dir] = asyncio.ensure_future(self._check_entries(urls, cookies))
+        existing = await task
+        if existing:
+            urls = [u for u in urls if u in existing]
+        else:
+            print("[!] 预检未确认任何候选页面存在，保留全部候选")
         
         print(f"[+] 已加载 {len(urls)} 个目标页面")
         return urls
 
+    async def _check_entries(self, urls: List[str], cookies: Dict[str, str]) -> Set[str]:
+        """并发发送 HEAD (服务器不支持时回退 GET)，返回未返回 404/410 的候选 URL
+
+        不跟随跳转：会话失效时漏洞页会 302 到登录页，仍视为存在；请求出错的候选同样保留，交给浏览器处理。
+        """
+        async def exists(client: httpx.AsyncClient, url: str) -> bool:
+            try:
+                await self.rate_limiter.acquire(url)
+                start_time = time.time()
+                r = await client.head(url)
+                if r.status_code in (405, 501):
+                    r = await client.get(url)
+                self.rate_limiter.record(url, time.time() - start_time, r.status_code, r.headers)
+            except Exception as e:
+                self.rate_limiter.record_error(url, e)
+                return True
+            return r.status_code not in (404, 410)
+
+        async with httpx.AsyncClient(verify=False, timeout=10.0, follow_redirects=False, cookies=cookies,
+                                     limits=httpx.Limits(max_connections=10)) as client:
+            found = await asyncio.gather(*[exists(client, u) for u in urls])
+        existing = {u for u, ok in zip(urls, found) if ok}
+        print(f"[+] bWAPP 候选页面预检: {len(existing)}/{len(urls)} 存在")
+        return existing
+
+    async def _crawl_level(self, browser: Browser, level: str, start_path: str) -> List[Dict[str, Any]]:
+        """在独立 Context 中登录、设置安全等级并爬取漏洞页，返回标记了 security_level 的页面"""
+        level_name = self.level_names[level]
+        pages = self._load_finished_level(level_name)
+        if pages is not None:
+            return pages
+
+        print(f"\n[+] === 开始爬取 bWAPP Level: {level_name} ({level}) ===")
+        spider = self._fork(level_name)
+        
+        # 登录并按需设置安全等级 (或载入该等级已保存的会话)，确保后续漏洞页可访问
+        context, page = await spider.open_session(browser, level_name, lambda pg: spider.auto_login(pg, level))
+        try:
+            # 决定用于构造漏洞列表的门户页面
+            if start_path and start_path not in ("/", "/portal.php"):
+                if start_path.startswith("http"):
+                    portal_url = start_path
+                elif start_path.startswith("/"):
+                    portal_url = f"{self.base_url}{start_path}"
+                else:
+                    portal_url = f"{self.base_url}/{start_path}"
+                await page.goto(portal_url)
+                await page.wait_for_load_state("networkidle")
+            else:
+                portal_url = f"{self.base_url}/portal.php"
+                if not page.url.endswith("portal.php"):
+                    await page.goto(portal_url)
+                    await page.wait_for_load_state("networkidle")
+
+            # 直接构造漏洞页面列表并全部加入爬取队列 (不再包含 start_url 因为 aim.php 本身没漏洞)
+            entry_urls = await spider.fetch_bwapp_entries(page, portal_url)
+            await spider.crawl(page, entry_urls)
+        finally:
+            await context.close()
+
+        print(f"[+] bWAPP Level {level_name} 完成，发现 {spider.pages_recorded} 个页面")
+        return spider.results["pages"]
+
     async def run_batch(self, start_path: str = "/portal.php", headless: bool = True, output: str = "data/targets_bwapp.json"):
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=headless)
@@ -469,67 +1512,31 @@ class BWAPPSpider(UniversalSpider):
             # 但为了保持数据格式一致性，我们还是保留循环，或者只跑一次并标记
             # 这里为了不破坏原有结构，依然循环，但其实每次访问都是 A.I.M. 授权后的结果
             
-            for level in self.levels:
-                level_name = self.level_names[level]
-                print(f"\n[+] === 开始爬取 bWAPP Level: {level_name} ({level}) ===")
-                
-                context = await browser.new_context()
-                await self.init_browser(context)
-                
-                page = await context.new_page()
-                
-                # 登录并按需设置安全等级，确保后续漏洞页可访问
-                await self.auto_login(page, level)
-                
-                # 重置 self.results 以便通过 crawl 收集当前等级的数据
-                self.results = {"base_url": self.base_url, "pages": []}
-                
-                # 决定用于构造漏洞列表的门户页面
-                if start_path and start_path not in ("/", "/portal.php"):
-                    if start_path.startswith("http"):
-                        portal_url = start_path
-                    elif start_path.startswith("/"):
-                        portal_url = f"{self.base_url}{start_path}"
-                    else:
-                        portal_url = f"{self.base_url}/{start_path}"
-                    await page.goto(portal_url)
-                    await page.wait_for_load_state("networkidle")
-                else:
-                    portal_url = f"{self.base_url}/portal.php"
-                    if not page.url.endswith("portal.php"):
-                        await page.goto(portal_url)
-                        await page.wait_for_load_state("networkidle")
-
-                # 2. 直接构造漏洞页面列表
-                entry_urls = await self.fetch_bwapp_entries(page, portal_url)
-                
-                # 3. 将所有目标页面加入爬取队列
-                all_start_urls = entry_urls # 不再包含 start_url 因为 aim.php 本身没漏洞
-
-                # 调用父类的 crawl
-                await self.crawl(page, all_start_urls)
-                
-                # 将结果标记等级并合并
-                for page_entry in self.results["pages"]:
-                    page_entry["security_level"] = level_name
-                    self.all_results["pages"].append(page_entry)
-                
-                await context.close()
+            self._open_output(output)
+            # 各等级在独立 Context 中并发登录与爬取，总耗时取决于最慢的等级
+            level_pages = await asyncio.gather(
+                *[self._crawl_level(browser, level, start_path) for level in self.levels],
+                return_exceptions=True
+            )
+            all_ok = self._merge_levels([self.level_names[level] for level in self.levels], level_pages) and not self.unfinished_scopes
             
-            # 保存总结果
-            import os
-            if os.path.dirname(output):
-                os.makedirs(os.path.dirname(output), exist_ok=True)
-                
-            with open(output, "w", encoding="utf-8") as f:
-                json.dump(self.all_results, f, indent=2, ensure_ascii=False)
+            # 保存总结果 (有等级失败或预算耗尽时保留断点、流式模式不写结束标记，便于 --resume 续爬)
+            self._write_output(output, self.all_results, complete=all_ok)
             print(f"\n[+] bWAPP 所有等级爬取完成，结果已写入 {output}")
+            if self.checkpoint and all_ok:
+                self.checkpoint.remove()
             
+            print(self.resource_policy.summary())
+            print(self.rate_limiter.summary())
+            print(self.timings.summary())
+            print(self.settler.summary())
             await browser.close()
 
 
 class PikachuSpider(UniversalSpider):
     """Pikachu 专用爬虫：自动执行登录以获取 Session，然后全站爬取"""
+
+    session_check_path = "vul/overpermission/op1/op1_mem.php"
     
     async def auto_login(self, page: Page):
         """自动登录 Pikachu 获取 Session"""
@@ -563,15 +1570,10 @@ class PikachuSpider(UniversalSpider):
     async def run_pikachu(self, start_path: str = "/", headless: bool = True, output: str = "data/targets_pikachu.json"):
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=headless)
-            context = await browser.new_context()
             
-            # 初始化 (如果有额外的 Cookie)
-            await self.init_browser(context)
-            
-            page = await context.new_page()
-            
-            # 1. 执行自动登录
-            await self.auto_login(page)
+            # 1. 注入额外的 Cookie 并执行自动登录 (已保存的会话仍有效时跳过登录)
+            context, page = await self.open_session(browser, "", self.auto_login)
+            self._open_output(output)
             
             # 2. 构造起始 URL
             full_start_url = f"{self.base_url}{start_path}" if start_path.startswith("/") else start_path
@@ -585,73 +1587,226 @@ class PikachuSpider(UniversalSpider):
             await self.crawl(page, [full_start_url], max_depth=3) # Pikachu 稍微深一点
             
             # 保存结果
-            import os
-            if os.path.dirname(output):
-                os.makedirs(os.path.dirname(output), exist_ok=True)
-                
-            with open(output, "w", encoding="utf-8") as f:
-                json.dump(self.results, f, indent=2, ensure_ascii=False)
+            self._write_output(output, self.results, complete=not self.unfinished_scopes)
             print(f"\n[+] Pikachu 爬取完成，结果已写入 {output}")
+            if self.checkpoint and not self.unfinished_scopes:
+                self.checkpoint.remove()
             
+            print(self.resource_policy.summary())
+            print(self.rate_limiter.summary())
+            print(self.timings.summary())
+            print(self.settler.summary())
             await browser.close()
 
 
+SPIDER_TYPES = ("universal", "dvwa", "bwapp", "pikachu")
+
+
+def _run_spider(kind: str, base: str, cookie: str, spider_opts: Dict[str, Any], start: str,
+                headless: bool, output: str) -> int:
+    """按爬虫类型构造并运行一次爬取，返回退出码 (0 成功，1 用户中断，2 未处理的错误)"""
+    if kind == "dvwa":
+        spider = DVWASpider(base, cookie, **spider_opts)
+        coro = spider.run_batch(start_path=start, headless=headless, output=output)
+    elif kind == "bwapp":
+        spider = BWAPPSpider(base, cookie, **spider_opts)
+        coro = spider.run_batch(start_path=start, headless=headless, output=output)
+    elif kind == "pikachu":
+        spider = PikachuSpider(base, cookie, **spider_opts)
+        coro = spider.run_pikachu(start_path=start, headless=headless, output=output)
+    else:
+        spider = UniversalSpider(base, cookie, **spider_opts)
+        coro = spider.run(start_path=start, headless=headless, output=output)
+    try:
+        asyncio.run(coro)
+    except KeyboardInterrupt:
+        print("[!] 用户中断")
+        return 1
+    except Exception as e:
+        print(f"[!] 未处理的错误: {e}")
+        return 2
+    return 0
+
+
+def load_target_list(path: str, default_type: str = "universal") -> List[Dict[str, str]]:
+    """读取多目标清单：每行 `<base_url> [爬虫类型] [Cookie 字符串]`，# 开头为注释
+
+    爬虫类型为 universal / dvwa / bwapp / pikachu，省略时使用 default_type；Cookie 为该行其余部分 (可含空格)。
+    """
+    targets = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, raw in enumerate(f, 1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split(None, 2)
+            kind, cookie = default_type, ""
+            if len(parts) > 1 and parts[1].lower() in SPIDER_TYPES:
+                kind = parts[1].lower()
+                cookie = parts[2] if len(parts) > 2 else ""
+            elif len(parts) > 1:
+                cookie = line.split(None, 1)[1]
+            if not parts[0].startswith("http"):
+                raise ValueError(f"{path}:{lineno} 不是有效的 base URL: {parts[0]}")
+            targets.append({"base_url": parts[0].rstrip("/"), "type": kind, "cookie": cookie})
+    return targets
+
+
+def _count_pages(output: str) -> int:
+    if not os.path.exists(output):
+        return 0
+    if is_page_stream(output):
+        return sum(1 for _ in PageStreamReader(output).iter_pages())
+    with open(output, "r", encoding="utf-8") as f:
+        return len(json.load(f).get("pages", []))
+
+
+def _crawl_target(job: Dict[str, Any]) -> Dict[str, Any]:
+    """进程池 worker：在独立进程 (独立事件循环与 Chromium) 中爬取一个目标，输出重定向到 <output>.log"""
+    RateLimiter.shared().configure(job["rate"], job["max_rate"])
+    output = job["output"]
+    started = time.time()
+    with open(f"{output}.log", "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        code = _run_spider(job["type"], job["base_url"], job["cookie"], job["spider_opts"],
+                           job["start"], job["headless"], output)
+    if code != 0:
+        status = "failed"
+    elif os.path.exists(job["spider_opts"]["checkpoint"]):
+        # 断点未删除说明有等级失败或预算耗尽，可用 --resume 续爬
+        status = "incomplete"
+    else:
+        status = "ok"
+    return {"status": status, "exit_code": code, "pages": _count_pages(output), "elapsed": round(time.time() - started, 1)}
+
+
+def run_targets(targets: List[Dict[str, str]], spider_opts: Dict[str, Any], output_dir: str, ext: str,
+                processes: int, start: str, headless: bool, rate: float, max_rate: float) -> int:
+    """把多个目标分配到进程池并发爬取 (每个进程同一时间只运行一个浏览器)，每个目标一个输出文件，并写出 manifest.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs, names = [], set()
+    for target in targets:
+        name = re.sub(r"[^A-Za-z0-9]+", "_", target["base_url"].split("://", 1)[-1]).strip("_") or "target"
+        while name in names:
+            name += "_"
+        names.add(name)
+        output = os.path.join(output_dir, f"targets_{name}{ext}")
+        jobs.append({
+            **target,
+            "output": output,
+            "spider_opts": {**spider_opts, "checkpoint": f"{output}.ckpt.sqlite"},
+            "start": start,
+            "headless": headless,
+            "rate": rate,
+            "max_rate": max_rate,
+        })
+
+    processes = max(1, min(processes or os.cpu_count() or 1, len(jobs)))
+    print(f"[+] 多目标模式: {len(jobs)} 个目标，{processes} 个进程，输出目录 {output_dir}")
+    results: Dict[int, Dict[str, Any]] = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(_crawl_target, job): idx for idx, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                results[idx] = {"status": "failed", "exit_code": 2, "pages": 0, "elapsed": 0.0, "error": str(e)}
+            r = results[idx]
+            print(f"[+] [{len(results)}/{len(jobs)}] {jobs[idx]['base_url']} ({jobs[idx]['type']}): {r['status']}，"
+                  f"{r['pages']} 个页面，{r['elapsed']:.0f}s -> {jobs[idx]['output']}")
+
+    manifest = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "targets": [
+            {"base_url": job["base_url"], "type": job["type"], "output": job["output"], "log": f"{job['output']}.log",
+             **results[idx]}
+            for idx, job in enumerate(jobs)
+        ],
+    }
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    ok = sum(1 for r in results.values() if r["status"] == "ok")
+    print(f"[+] 多目标爬取结束: {ok}/{len(jobs)} 个目标完成，清单已写入 {manifest_path}")
+    return 0 if ok == len(jobs) else 2
+
+
 def main(argv: Optional[List[str]] = None) -> int:
     parser = argparse.ArgumentParser(description="V-APF 通用爬虫")
-    parser.add_argument("--base", "-b", required=True, help="目标基础 URL (例如 http://127.0.0.1/dvwa)")
+    parser.add_argument("--base", "-b", help="目标基础 URL (例如 http://127.0.0.1/dvwa)")
+    parser.add_argument("--targets-file", default=None,
+                        help="多目标清单，每行 '<base_url> [universal|dvwa|bwapp|pikachu] [Cookie]'，按进程池并发爬取")
+    parser.add_argument("--output-dir", default="data/targets", help="多目标模式下每个目标的输出目录与 manifest.json 位置 (默认 data/targets)")
+    parser.add_argument("--processes", "-p", type=int, default=0, help="多目标模式的进程数，0 为 CPU 核数 (默认 0)")
     parser.add_argument("--cookie", "-c", default="", help="登录 Cookie 字符串 (例如 'PHPSESSID=xxx; security=low')")
     parser.add_argument("--start", "-s", default="/", help="起始爬取路径 (默认 /)")
-    parser.add_argument("--output", "-o", default="data/targets.json", help="输出 JSON 文件")
+    parser.add_argument("--output", "-o", default="data/targets.json", help="输出 JSON 文件 (以 .jsonl 结尾时逐页流式写出)")
     parser.add_argument("--no-headless", dest="headless", action="store_false", help="运行可见浏览器")
     parser.add_argument("--dvwa", action="store_true", help="启用 DVWA 批量爬取模式 (自动遍历 low-impossible)")
     parser.add_argument("--bwapp", action="store_true", help="启用 bWAPP 批量爬取模式 (自动遍历 low-high)")
     parser.add_argument("--pikachu", action="store_true", help="启用 Pikachu 专用模式 (自动处理登录)")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="并发爬取标签页数量 (默认 4)")
+    parser.add_argument("--http-first", action="store_true", help="HTTP 优先模式：静态页用 httpx 解析，脚本驱动页才回退 Playwright")
+    parser.add_argument("--template-cap", type=int, default=3, help="每个 URL 模板最多爬取的样本数，0 为不限 (默认 3)")
+    parser.add_argument("--checkpoint", default=None, help="断点文件路径 (默认 <output>.ckpt.sqlite)")
+    parser.add_argument("--checkpoint-interval", type=float, default=30.0, help="断点写入间隔秒数 (默认 30)")
+    parser.add_argument("--resume", action="store_true", help="从上次断点继续爬取 (含批量爬虫的当前安全等级)")
+    parser.add_argument("--near-dup-distance", type=int, default=3,
+                        help="SimHash 汉明距离不超过该值的页面视为近似重复、不再展开链接，负数关闭 (默认 3)")
+    parser.add_argument("--max-pages", type=int, default=0, help="每轮爬取最多分析的页面数，0 为不限 (默认 0)")
+    parser.add_argument("--time-budget", type=float, default=0.0, help="每轮爬取的时间预算秒数，0 为不限 (默认 0)")
+    parser.add_argument("--har", dest="har_file", default=None, help="导入测试人员录制的 HAR 文件，其中的请求 URL 作为爬取种子")
+    parser.add_argument("--no-seed-discovery", dest="seed_discovery", action="store_false",
+                        help="不从 sitemap.xml / robots.txt 发现种子 URL")
+    parser.add_argument("--rate", type=float, default=5.0, help="每个主机的初始请求速率 (req/s)，按 AIMD 自适应调整，0 为不限速 (默认 5)")
+    parser.add_argument("--max-rate", type=float, default=50.0, help="每个主机的速率上限 (req/s，默认 50)")
+    parser.add_argument("--incremental", dest="previous", default=None,
+                        help="增量重爬：载入上次的 targets 文件 (.json/.jsonl)，未变化的页面直接复用其结果")
+    parser.add_argument("--slow-top", type=int, default=10, help="结束时列出的最慢页面数，逐页计时写入 <output>.timings.jsonl (默认 10)")
+    parser.add_argument("--settle-quiet", type=float, default=0.5, help="DOM 与网络连续安静该秒数即视为页面稳定 (默认 0.5)")
+    parser.add_argument("--settle-timeout", type=float, default=8.0, help="每次导航等待页面稳定的上限秒数 (默认 8)")
+    parser.add_argument("--session-dir", default="data/sessions", help="登录会话 (storage_state) 的保存目录 (默认 data/sessions)")
+    parser.add_argument("--no-session-reuse", dest="session_reuse", action="store_false",
+                        help="不保存也不复用登录会话，每次重新登录")
+    parser.add_argument("--no-block-resources", dest="block_resources", action="store_false",
+                        help="不拦截图片/字体/样式表等重资源")
 
     args = parser.parse_args(argv)
+    if not args.base and not args.targets_file:
+        parser.error("需要指定 --base 或 --targets-file")
+    RateLimiter.shared().configure(args.rate, args.max_rate)
+    spider_opts = {
+        "workers": args.workers,
+        "http_first": args.http_first,
+        "template_cap": args.template_cap,
+        "checkpoint": args.checkpoint or f"{args.output}.ckpt.sqlite",
+        "resume": args.resume,
+        "checkpoint_interval": args.checkpoint_interval,
+        "block_resources": args.block_resources,
+        "near_dup_distance": args.near_dup_distance,
+        "max_pages": args.max_pages,
+        "time_budget": args.time_budget,
+        "seed_discovery": args.seed_discovery,
+        "har_file": args.har_file,
+        "previous": args.previous,
+        "session_dir": args.session_dir if args.session_reuse else None,
+        "slow_top": args.slow_top,
+        "settle_quiet": args.settle_quiet,
+        "settle_timeout": args.settle_timeout,
+    }
 
-    if args.dvwa:
-        spider = DVWASpider(args.base, args.cookie)
-        try:
-            asyncio.run(spider.run_batch(start_path=args.start, headless=args.headless, output=args.output))
-        except KeyboardInterrupt:
-            print("[!] 用户中断")
-            return 1
-        except Exception as e:
-            print(f"[!] 未处理的错误: {e}")
-            return 2
-    elif args.bwapp:
-        spider = BWAPPSpider(args.base, args.cookie)
-        try:
-            asyncio.run(spider.run_batch(start_path=args.start, headless=args.headless, output=args.output))
-        except KeyboardInterrupt:
-            print("[!] 用户中断")
-            return 1
-        except Exception as e:
-            print(f"[!] 未处理的错误: {e}")
-            return 2
-    elif args.pikachu:
-        spider = PikachuSpider(args.base, args.cookie)
-        try:
-            asyncio.run(spider.run_pikachu(start_path=args.start, headless=args.headless, output=args.output))
-        except KeyboardInterrupt:
-            print("[!] 用户中断")
-            return 1
-        except Exception as e:
-            print(f"[!] 未处理的错误: {e}")
-            return 2
-    else:
-        spider = UniversalSpider(args.base, args.cookie)
-        try:
-            asyncio.run(spider.run(start_path=args.start, headless=args.headless, output=args.output))
-        except KeyboardInterrupt:
-            print("[!] 用户中断")
-            return 1
-        except Exception as e:
-            print(f"[!] 未处理的错误: {e}")
-            return 2
-            
-    return 0
+    default_type = "dvwa" if args.dvwa else "bwapp" if args.bwapp else "pikachu" if args.pikachu else "universal"
+    if args.targets_file:
+        if args.checkpoint or args.har_file or args.previous:
+            print("[!] 多目标模式下忽略 --checkpoint / --har / --incremental，断点按目标写在各自输出文件旁")
+        spider_opts.update({"har_file": None, "previous": None})
+        targets = load_target_list(args.targets_file, default_type)
+        ext = ".jsonl" if is_page_stream(args.output) else ".json"
+        return run_targets(targets, spider_opts, args.output_dir, ext, args.processes, args.start,
+                           args.headless, args.rate, args.max_rate)
 
+    return _run_spider(default_type, args.base, args.cookie, spider_opts, args.start, args.headless, args.output)
 
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -7,6 +7,7 @@ from typing import List
 from core.auto_labeler import AutoLabeler
 from core.extractor import FeatureExtractor
 from core.predict_scanner import VAPFPredictScanner
+from core.rate_limiter import RateLimiter
 from core.train_model import VAPFTrainer
 
 
@@ -168,6 +169,8 @@ def main():
         ],
         help="目标 JSON 列表（默认使用仓库内标准三套）"
     )
+    p_train.add_argument("--rate", type=float, default=5.0, help="每个主机的初始请求速率 req/s（按 AIMD 自适应，0 为不限速，默认 5）")
+    p_train.add_argument("--max-rate", type=float, default=50.0, help="每个主机的速率上限 req/s（默认 50）")
 
     p_scan = sub.add_parser("scan", help="扫描模式：即时预测并生成报告")
     p_scan.add_argument("--url", required=True, help="目标 URL，GET 可自带 query")
@@ -189,6 +192,8 @@ def main():
     p_scan.add_argument("--concurrency", type=int, default=3, help="并发探测数（默认 3，减小可降低波动）")
     p_scan.add_argument("--mutation-count", type=int, default=1, help="每个基础 payload 的变异数量（默认 1，增加可扩宽覆盖）")
     p_scan.add_argument("--header", action="append", help="自定义 Header，格式 'Key: Value'，可重复指定")
+    p_scan.add_argument("--rate", type=float, default=5.0, help="每个主机的初始请求速率 req/s（按 AIMD 自适应，0 为不限速，默认 5）")
+    p_scan.add_argument("--max-rate", type=float, default=50.0, help="每个主机的速率上限 req/s（默认 50）")
     # 自动利用配置（始终开启）
     p_scan.add_argument("--sqlmap-path", default="sqlmap", help="sqlmap 可执行路径（默认 sqlmap）")
     p_scan.add_argument("--exploit-timeout", type=int, default=600, help="利用步骤超时秒数（默认 600，时间盲注友好）")
@@ -198,6 +203,7 @@ def main():
     p_scan.add_argument("--commix-path", default="commix", help="Commix 可执行路径（默认 commix）")
 
     args = parser.parse_args()
+    RateLimiter.shared().configure(args.rate, args.max_rate)
 
     if args.command == "train":
         run_training(args.targets)
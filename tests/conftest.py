@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 与各模块的 sys.path.append(os.getcwd()) 一致：测试从仓库根目录导入 core 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+import httpx
+
+from core.extractor import FeatureExtractor
+from core.rate_limiter import RateLimiter
+
+POINT = {
+    "type": "api", "method": "POST", "action": "/api/item", "action_url": "http://h.test/api/item",
+    "content_type": "json", "signature": "a1",
+    "inputs": [{"name": "v", "default": "2", "type": "query"}, {"name": "id", "default": 1, "type": "json"},
+               {"name": "opts", "default": {"tags": [1, 2]}, "type": "json"}],
+}
+
+
+def test_api_point_is_replayed_with_method_and_json_body():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        seen.append((request.method, dict(request.url.params), body))
+        return httpx.Response(200, text=f"item {body['id']} v{request.url.params['v']}")
+
+    fe = FeatureExtractor(baseline_dir=None, session_dir=None)
+    fe.payloads = ["'", "<b>"]
+    point = dict(POINT, inputs=POINT["inputs"][:2])
+    fe.rate_limiter = RateLimiter()
+    fe.rate_limiter.configure(0)
+    fe.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    asyncio.run(fe._probe_api_point({"security_level": "low"}, point))
+
+    assert all(method == "POST" for method, _, _ in seen)
+    # 基准用捕获时的原值 (保留 JSON 类型)，探测时只替换目标输入项
+    assert ("POST", {"v": "2"}, {"id": 1}) in seen
+    assert ("POST", {"v": "'"}, {"id": 1}) in seen
+    assert ("POST", {"v": "2"}, {"id": "<b>"}) in seen
+    assert [(r["param"], r["payload"]) for r in fe.vectors] == [("v", "'"), ("v", "<b>"), ("id", "'"), ("id", "<b>")]
+    assert {(r["url"], r["method"], r["security_level"]) for r in fe.vectors} == {("http://h.test/api/item", "POST", "low")}
+    assert all(len(r["vector"]) == 13 for r in fe.vectors)
+
+
+def test_api_request_keeps_json_types_and_encodes_query_values():
+    url, body = FeatureExtractor._api_request(POINT, {"v": 3, "id": 1, "opts": {"tags": [1, 2]}})
+    assert url == "http://h.test/api/item?v=3"
+    assert body == {"id": 1, "opts": {"tags": [1, 2]}}
+    url, query = FeatureExtractor._api_request(dict(POINT, method="GET"), {"id": 1, "opts": {"tags": [1]}})
+    assert query == {"id": "1", "opts": '{"tags": [1]}'}
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import httpx
+
+from core.baseline_cache import BaselineCache
+
+PAGE = "<html><body>product list: apple banana cherry</body></html>"
+
+
+def _fetcher(calls, text=PAGE):
+    async def fetch():
+        calls.append(1)
+        return {"status": 200, "length": len(text), "time": 2.5, "text": text, "headers": {}}
+    return fetch
+
+
+def test_hit_within_ttl_ignores_target_param_value(tmp_path):
+    calls = []
+    cache = BaselineCache(str(tmp_path), ttl=600, revalidate_after=None)
+
+    async def run():
+        await cache.get("http://h/a.php", "GET", {"id": "1", "q": "x"}, _fetcher(calls), target_param="q")
+        return await cache.get("http://h/a.php", "GET", {"id": "1", "q": "'"}, _fetcher(calls), target_param="q")
+
+    assert asyncio.run(run())["text"] == PAGE
+    assert len(calls) == 1
+    # 磁盘上的条目可被新进程 (新实例) 复用
+    asyncio.run(BaselineCache(str(tmp_path), ttl=600).get("http://h/a.php", "GET", {"id": "1"}, _fetcher(calls)))
+    assert len(calls) == 1
+
+
+def test_expired_entry_is_rendered_again(tmp_path):
+    calls = []
+    cache = BaselineCache(str(tmp_path), ttl=600, revalidate_after=None)
+    asyncio.run(cache.get("http://h/a.php", "GET", None, _fetcher(calls)))
+    key = BaselineCache.key("http://h/a.php")
+    cache._memory[key]["stored_at"] = time.time() - 601
+    asyncio.run(cache.get("http://h/a.php", "GET", None, _fetcher(calls)))
+    assert len(calls) == 2
+    assert cache.stats == {"hits": 0, "renders": 2, "revalidated": 0, "stale": 0}
+
+
+def test_zero_ttl_disables_cache_and_failures_are_not_stored(tmp_path):
+    calls = []
+    cache = BaselineCache(str(tmp_path), ttl=0)
+    for _ in range(2):
+        asyncio.run(cache.get("http://h/a.php", "GET", None, _fetcher(calls)))
+    assert len(calls) == 2 and not list(tmp_path.iterdir())
+
+    cache = BaselineCache(None, ttl=600)
+    for _ in range(2):
+        asyncio.run(cache.get("http://h/a.php", "GET", None, _fetcher(calls, text="")))
+    assert len(calls) == 4
+
+
+def test_revalidation_refreshes_time_only_for_httpx_baselines():
+    calls = []
+    cache = BaselineCache(None, ttl=600, revalidate_after=60)
+
+    async def run(text, transport):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=text)))
+        async with client:
+            return await cache.get("http://h/a.php", "GET", None, _fetcher(calls), client=client, transport=transport)
+
+    # 渲染与 httpx 获取的基准各自缓存
+    assert asyncio.run(run(PAGE, "browser"))["time"] == 2.5
+    assert asyncio.run(run(PAGE, "httpx"))["time"] == 2.5
+    assert len(calls) == 2
+    for transport in ("browser", "httpx"):
+        cache._memory[BaselineCache.key("http://h/a.php", transport=transport)]["stored_at"] -= 61
+
+    # 内容未变：不重新渲染；httpx 条目的 time 改为同口径的校验耗时，渲染条目保留渲染时的值
+    assert asyncio.run(run(PAGE, "browser"))["time"] == 2.5
+    assert asyncio.run(run(PAGE, "httpx"))["time"] < 2.5
+    assert len(calls) == 2 and cache.stats["revalidated"] == 2
+
+    cache._memory[BaselineCache.key("http://h/a.php", transport="httpx")]["stored_at"] -= 61
+    asyncio.run(run("<html>maintenance</html>", "httpx"))
+    assert len(calls) == 3 and cache.stats["stale"] == 1
@@ -0,0 +1,57 @@
+from core.spider import CrawlCheckpoint
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "crawl.ckpt.sqlite")
+    ckpt = CrawlCheckpoint(path)
+    pages = [{"url": "http://h/a.php"}, {"url": "http://h/b.php"}]
+    stats = {"http://h/list.php?id={num}": {"sampled": 2, "skipped": 5}}
+    ckpt.save("low", [("http://h/c.php", 1)], {"http://h/a.php", "http://h/b.php"}, pages, stats)
+    # 页面只追加：再次保存时只写入新增部分
+    pages.append({"url": "http://h/d.php"})
+    ckpt.save("low", [("http://h/e.php", 2)], {"http://h/d.php"}, pages, stats, done=True)
+    ckpt.conn.close()
+
+    state = CrawlCheckpoint(path, resume=True).load("low")
+    assert state["done"] is True
+    assert state["frontier"] == [("http://h/e.php", 2)]
+    assert state["visited"] == {"http://h/a.php", "http://h/b.php", "http://h/d.php"}
+    assert [p["url"] for p in state["pages"]] == ["http://h/a.php", "http://h/b.php", "http://h/d.php"]
+    assert state["template_stats"] == stats
+
+
+def test_scopes_are_separate_and_pending_pages_dropped(tmp_path):
+    path = str(tmp_path / "crawl.ckpt.sqlite")
+    ckpt = CrawlCheckpoint(path)
+    ckpt.save("low", [("http://h/a.php", 0)], set(), [{"url": "http://h/a.php"}], {})
+    assert ckpt.load("medium") is None
+    # 仍在 frontier 中的 URL 会重新爬取，其页面记录不恢复
+    assert CrawlCheckpoint(path, resume=True).load("low")["pages"] == []
+
+
+def test_without_resume_starts_fresh(tmp_path):
+    path = str(tmp_path / "crawl.ckpt.sqlite")
+    ckpt = CrawlCheckpoint(path)
+    ckpt.save("", [], {"http://h/a.php"}, [], {})
+    ckpt.conn.close()
+    assert CrawlCheckpoint(path).load("") is None
+
+
+def test_resume_twice_keeps_pages_crawled_after_first_resume(tmp_path):
+    path = str(tmp_path / "crawl.ckpt.sqlite")
+    a, b, c = ({"url": f"http://h/{n}.php"} for n in "abc")
+    ckpt = CrawlCheckpoint(path)
+    # b 已落盘但仍在 frontier 中 (在途)，c 也在途
+    ckpt.save("", [(b["url"], 1), (c["url"], 1)], {a["url"], b["url"], c["url"]}, [a, b], {})
+    ckpt.conn.close()
+
+    ckpt = CrawlCheckpoint(path, resume=True)
+    state = ckpt.load("")
+    assert state["pages"] == [a]
+    pages = state["pages"] + [c]
+    ckpt.save("", [(b["url"], 1)], {c["url"]}, pages, {})
+    ckpt.conn.close()
+
+    state = CrawlCheckpoint(path, resume=True).load("")
+    assert state["pages"] == [a, c]
+    assert state["frontier"] == [(b["url"], 1)]
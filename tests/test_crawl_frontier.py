@@ -0,0 +1,41 @@
+from core.spider import CrawlFrontier, UniversalSpider
+
+
+def _drain(frontier):
+    items = []
+    while not frontier.empty():
+        items.append(frontier.get_nowait())
+    return items
+
+
+def test_bfs_order_without_score():
+    frontier = CrawlFrontier()
+    for item in [("u1", 1), ("u2", 0), ("u3", 1), ("u4", 0)]:
+        frontier.put_nowait(item)
+    assert _drain(frontier) == [("u2", 0), ("u4", 0), ("u1", 1), ("u3", 1)]
+
+
+def test_higher_score_first_then_depth_then_insertion():
+    scores = {"low": 0.0, "high": 5.0, "mid_a": 1.0, "mid_b": 1.0}
+    frontier = CrawlFrontier(score=lambda url, depth: scores[url])
+    for item in [("low", 0), ("mid_a", 2), ("high", 3), ("mid_b", 1)]:
+        frontier.put_nowait(item)
+    assert frontier.snapshot() == [("high", 3), ("mid_b", 1), ("mid_a", 2), ("low", 0)]
+    assert _drain(frontier) == [("high", 3), ("mid_b", 1), ("mid_a", 2), ("low", 0)]
+
+
+def test_snapshot_lists_in_flight_first():
+    frontier = CrawlFrontier()
+    frontier.put_nowait(("queued", 1))
+    frontier.in_flight.append(("working", 0))
+    assert frontier.snapshot() == [("working", 0), ("queued", 1)]
+
+
+def test_url_priority_prefers_risky_and_novel_urls():
+    spider = UniversalSpider("http://h", session_dir=None)
+    vuln = spider._url_priority("http://h/vulnerabilities/sqli/?id=1", 1)
+    plain = spider._url_priority("http://h/about.php", 1)
+    assert vuln > plain
+    # 同一模板重复入队时新颖度递减
+    again = spider._url_priority("http://h/vulnerabilities/sqli/?id=2", 1)
+    assert again < vuln
@@ -0,0 +1,23 @@
+import json
+
+from core.crawl_timing import CrawlTimings
+
+
+def test_fallback_counts_time_but_not_pages(tmp_path):
+    path = str(tmp_path / "out.timings.jsonl")
+    timings = CrawlTimings(path, top_n=5)
+    fast = timings.start("http://h/app.php", "http")
+    with fast.phase("navigation"):
+        pass
+    fast.outcome = "fallback"
+    timings.finish(fast)
+    timings.finish(timings.start("http://h/app.php", "browser"))
+    timings.close()
+
+    assert timings.pages == 1
+    assert timings.fallbacks == 1
+    assert "navigation" in timings.phase_totals
+    assert [r["mode"] for _, _, r in timings._slowest] == ["browser"]
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["outcome"] for line in f] == ["fallback", "done"]
+    assert "快速路径回退 1 次" in timings.summary()
@@ -0,0 +1,76 @@
+import difflib
+import random
+
+import numpy as np
+
+from core.extractor import FeatureExtractor
+from core.similarity import get_engine
+
+KEYWORDS = ["SQL syntax", "mysql_fetch", "syntax error", "Warning", "Fatal error",
+            "Unclosed quotation", "not found", "404", "denied", "root:", "admin"]
+
+
+def _set_cookies(val):
+    return len(val) if isinstance(val, list) else (1 if val else 0)
+
+
+def reference_vector(base, probe, payload):
+    """逐条计算的原始实现 (批量化之前)，训练数据即按此生成"""
+    bh, ph = base.get('headers', {}), probe.get('headers', {})
+    text = probe.get('text', '')
+    return [
+        max(min((probe.get('length', 0) - base.get('length', 0)) / max(base.get('length', 0), 1), 1.0), -1.0),
+        1.0 if base.get('status') != probe.get('status') else 0.0,
+        max(min((probe.get('time', 0) - base.get('time', 0)) / 5.0, 1.0), 0.0),
+        min(sum(1 for kw in KEYWORDS if kw in text.lower()) / 5.0, 1.0),
+        difflib.SequenceMatcher(None, base.get('text', ''), text).quick_ratio(),
+        1.0 if payload in text else 0.0,
+        min(0.5 * (_set_cookies(bh.get('set-cookie')) != _set_cookies(ph.get('set-cookie')))
+            + 0.5 * (bh.get('location') != ph.get('location')), 1.0),
+        0.0, 0.0, 0.0, 0.0, 0.0,
+        1.0 if bh.get('content-type', '').split(';')[0] != ph.get('content-type', '').split(';')[0] else 0.0,
+    ]
+
+
+def _extractor():
+    fe = FeatureExtractor.__new__(FeatureExtractor)
+    fe.similarity = get_engine("chars")
+    fe.error_keywords = list(KEYWORDS)
+    return fe
+
+
+def _response(rnd):
+    words = ["syntax error", "warning", "mysql_fetch", "<b>", "admin", "404", "'", "x", "中文", "root:", "abc"]
+    text = "".join(rnd.choice(words) for _ in range(rnd.randint(0, 40)))
+    headers = {}
+    if rnd.random() < .5:
+        headers['content-type'] = rnd.choice(['text/html; charset=utf-8', 'text/html', 'application/json'])
+    if rnd.random() < .4:
+        headers['set-cookie'] = rnd.choice([[], ['a=1'], ['a=1', 'b=2'], 'a=1', ''])
+    if rnd.random() < .3:
+        headers['location'] = rnd.choice(['/login', '/x', None])
+    return {'status': rnd.choice([200, 302, 500, 0]), 'length': len(text), 'time': rnd.random() * 7,
+            'text': text, 'headers': headers}
+
+
+def test_batch_matches_per_probe_reference_bit_for_bit():
+    fe, rnd = _extractor(), random.Random(1)
+    for _ in range(100):
+        base = _response(rnd)
+        probes = [_response(rnd) for _ in range(rnd.randint(1, 15))]
+        payloads = [rnd.choice(["'", "admin", "<b>", "zz"]) for _ in probes]
+        expected = np.array([reference_vector(base, p, pl) for p, pl in zip(probes, payloads)], dtype=np.float64)
+
+        assert np.array_equal(fe.compute_13_vectors(base, probes, payloads, dtype=np.float64), expected)
+        batch32 = fe.compute_13_vectors(base, probes, payloads)
+        assert batch32.dtype == np.float32 and np.array_equal(batch32, expected.astype(np.float32))
+        assert fe.compute_13_vector(base, probes[0], payloads[0]) == expected[0].tolist()
+
+
+def test_empty_batch_and_signature_hits():
+    fe = _extractor()
+    base = {'status': 200, 'length': 2, 'time': 0.1, 'text': 'ok', 'headers': {}}
+    assert fe.compute_13_vectors(base, [], []).shape == (0, 13)
+    probe = {'status': 500, 'length': 40, 'time': 0.1, 'text': "You have an error in your SQL syntax", 'headers': {}}
+    fe.compute_13_vectors(base, [probe], ["'"])
+    assert probe['signatures'] == {"dbms": ["sql syntax", "you have an error in your sql syntax"]}
@@ -0,0 +1,33 @@
+from core.fingerprint import SimHashIndex, hamming_distance, simhash, stable_hash
+
+
+def test_stable_hash_ignores_volatile_tokens_and_whitespace():
+    a = "<form><input name='csrf' value='a1b2c3d4e5f6a7b8c9d0'></form>"
+    b = "<form><input  name='csrf'\n value='ffffeeee1111222233334444'></form>"
+    assert stable_hash(a) == stable_hash(b)
+    assert stable_hash(a) != stable_hash("<form></form>")
+
+
+def test_simhash_near_duplicates_are_closer_than_different_pages():
+    words = "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike november oscar papa".split()
+    page = "<html><body>" + "".join(f"<p>{words[i % 16]} {words[(i * 7) % 16]}</p>" for i in range(200)) + "</body></html>"
+    near = hamming_distance(simhash(page), simhash(page.replace("</body>", "<p>footer</p></body>")))
+    far = hamming_distance(simhash(page), simhash("<div><span>login username password submit</span></div>"))
+    assert near <= 3 < far
+    assert simhash("") == 0
+
+
+def test_index_finds_within_distance():
+    index = SimHashIndex(max_distance=3)
+    base = 0b1011 << 40 | 0xFFFF
+    index.add(base)
+    assert index.find(base ^ 0b111) == base          # 3 位不同
+    assert index.find(base ^ 0b1111) is None         # 4 位不同
+    assert index.find(base ^ (1 << 63) ^ 1) == base  # 跨分段的差异
+
+
+def test_index_zero_distance_is_exact_match():
+    index = SimHashIndex(max_distance=0)
+    index.add(12345)
+    assert index.find(12345) == 12345
+    assert index.find(12344) is None
@@ -0,0 +1,35 @@
+from core.extractor import FeatureExtractor
+
+
+def _extractor():
+    fe = FeatureExtractor.__new__(FeatureExtractor)
+    fe.form_defs, fe._probed_forms = {}, set()
+    return fe
+
+
+FORM = {"type": "form", "signature": "f1", "method": "GET", "action": "/search.php", "inputs": [{"name": "q"}]}
+API = {"type": "api", "signature": "a1", "method": "POST", "action": "/api/item", "content_type": "json",
+       "inputs": [{"name": "id", "type": "json"}]}
+
+
+def test_refs_resolve_from_summary_regardless_of_page_order():
+    fe = _extractor()
+    fe._learn_forms([{**FORM, "security_level": "low"}, {**API, "security_level": "low"}])
+    # 引用页排在完整定义所在页之前 (批量模式按 URL 排序)
+    ref_page = {"url": "http://h/a.php", "security_level": "low", "injection_points": [
+        {"type": "form_ref", "signature": "f1"}, {"type": "api_ref", "signature": "a1"}]}
+    def_page = {"url": "http://h/b.php", "security_level": "low", "injection_points": [FORM, API]}
+
+    points = fe._points_to_probe(ref_page)
+    assert [(p["type"], p["action"]) for p in points] == [("form", "/search.php"), ("api", "/api/item")]
+    assert points[1]["inputs"] == API["inputs"]
+    assert fe._points_to_probe(def_page) == []
+
+
+def test_dedupe_is_per_security_level_and_keeps_other_points():
+    fe = _extractor()
+    query = {"type": "query", "params": [{"name": "id"}]}
+    page = {"url": "http://h/a.php", "security_level": "low", "injection_points": [query, API]}
+    assert fe._points_to_probe(page) == [query, API]
+    assert fe._points_to_probe(page) == [query]
+    assert fe._points_to_probe({**page, "security_level": "high"}) == [query, API]
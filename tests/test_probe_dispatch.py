@@ -0,0 +1,38 @@
+import asyncio
+
+from core.extractor import FeatureExtractor, is_time_based
+
+
+def test_time_based_detection_covers_mutated_variants():
+    assert is_time_based("' AND sleep(5) --")
+    assert is_time_based("'/**/aNd/**/SLeEP(5)/**/--")
+    assert is_time_based("'; WAITFOR DELAY '0:0:5' --")
+    assert not is_time_based("' OR 1=1 --")
+
+
+def test_time_based_payloads_run_alone_after_the_fan_out():
+    fe = FeatureExtractor.__new__(FeatureExtractor)
+    fe.probe_concurrency, fe._host_sems, fe._host_exclusive_locks = 3, {}, {}
+    in_flight, log = [0], []
+
+    async def probe(payload, exclusive):
+        async with fe._host_slot("http://h/a.php", exclusive):
+            in_flight[0] += 1
+            log.append((payload, in_flight[0]))
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+        return {"payload": payload}
+
+    async def other_page():
+        # 同一主机上另一页面的探测与之并发
+        return await asyncio.gather(*[probe(f"o{i}", False) for i in range(6)])
+
+    payloads = ["a", "' AND sleep(5) --", "b", "c", "d", "' aND SLEep(5) --"]
+
+    async def run():
+        results, _ = await asyncio.gather(fe._dispatch_probes(payloads, probe), other_page())
+        return results
+
+    assert [r["payload"] for r in asyncio.run(run())] == payloads
+    assert max(n for _, n in log) <= 3
+    assert [n for p, n in log if is_time_based(p)] == [1, 1]
@@ -0,0 +1,63 @@
+import time
+
+import httpx
+
+from core.rate_limiter import HostBucket, RateLimiter
+
+
+def _bucket(rate=5.0):
+    return HostBucket(rate, min_rate=0.5, max_rate=50.0, burst=rate)
+
+
+def test_slow_start_then_additive_increase():
+    b = _bucket()
+    b.record(0.1, 200)
+    assert b.rate == 6.0  # 慢启动：每个正常响应 +increase
+    b.record(0.1, 429)
+    assert b.rate == 3.0 and not b.slow_start
+    b.record(0.1, 200)
+    assert abs(b.rate - (3.0 + 1.0 / 3.0)) < 1e-9  # 加性增：+increase / rate
+
+
+def test_multiplicative_decrease_once_per_window_and_floor():
+    b = _bucket(4.0)
+    b.record(0.1, 503)
+    b.record(0.1, 503)  # 同一窗口内只减一次
+    assert b.rate == 2.0
+    assert b.stats["throttled"] == 2
+    for _ in range(10):
+        b.last_backoff = 0.0
+        b.record_timeout()
+    assert b.rate == b.min_rate
+
+
+def test_latency_spike_does_not_increase_rate():
+    b = _bucket()
+    b.record(0.1, 200)
+    rate = b.rate
+    b.record(1.0, 200)  # 延迟超过平滑基线 2 倍
+    assert b.rate == rate
+
+
+def test_rate_is_capped_and_retry_after_pauses_host():
+    b = _bucket(49.5)
+    b.record(0.1, 200)
+    assert b.rate == 50.0
+    b.record(0.1, 429, retry_after=5)
+    assert b.resume_at > time.monotonic() + 4
+
+
+def test_limiter_per_host_and_error_classification():
+    limiter = RateLimiter(rate=5.0)
+    limiter.record("http://a/x", 0.1, 429, {"Retry-After": "2"})
+    assert limiter.buckets["a"].rate == 2.5
+    limiter.record_error("http://b/x", httpx.ConnectError("refused"))
+    assert limiter.buckets["b"].rate == 5.0
+    limiter.record_error("http://b/x", httpx.ReadTimeout("slow"))
+    assert limiter.buckets["b"].rate == 2.5
+
+
+def test_zero_rate_disables_limiting():
+    limiter = RateLimiter(rate=0)
+    limiter.record("http://a/x", 0.1, 429)
+    assert limiter.buckets == {}
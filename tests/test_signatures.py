@@ -0,0 +1,45 @@
+import random
+
+from core.signatures import ERROR_SIGNATURES, SignatureSet, response_signatures
+
+
+def naive_scan(categories, text):
+    hits = {}
+    for name, sigs in categories.items():
+        found = {sig for sig in sigs if sig and sig in text}
+        if found:
+            hits[name] = found
+    return hits
+
+
+def test_scan_matches_naive_substring_search():
+    categories = {"a": ["ab", "abc", "abcd", "bc", "x"], "b": ["abc", "cd", "dab"], "empty": []}
+    sigs = SignatureSet(categories)
+    rnd = random.Random(0)
+    for _ in range(500):
+        text = "".join(rnd.choice("abcdx") for _ in range(rnd.randint(0, 12)))
+        assert sigs.scan(text) == naive_scan(categories, text), text
+
+
+def test_overlapping_and_prefix_signatures_are_all_reported():
+    sigs = SignatureSet({"dbms": ["sql syntax", "you have an error in your sql syntax", "syntax"]})
+    # 最长匹配 "you have ... sql syntax" 与其内部的较短签名都应命中
+    assert sigs.scan("you have an error in your sql syntax near") == {
+        "dbms": {"sql syntax", "you have an error in your sql syntax", "syntax"}}
+    assert sigs.scan("") == {}
+    assert SignatureSet({}).scan("anything") == {}
+
+
+def test_first_follows_category_order():
+    sigs = SignatureSet({"shell": ["sh: 1:"], "dbms": ["sql syntax"]})
+    assert sigs.first("sql syntax ... sh: 1: not found") == "shell"
+    assert sigs.first("sql syntax") == "dbms"
+    assert sigs.first("clean page") is None
+
+
+def test_response_signatures_adds_keywords_and_is_cached():
+    sigs = response_signatures(("admin",))
+    assert sigs is response_signatures(("admin",))
+    assert set(sigs.categories) == {"keywords", *ERROR_SIGNATURES}
+    hits = sigs.scan("uid=0(root) admin pg_query() failed")
+    assert hits == {"keywords": {"admin"}, "shell": {"uid=0(root)"}, "dbms": {"pg_query()"}}
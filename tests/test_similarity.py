@@ -0,0 +1,37 @@
+import difflib
+
+import pytest
+
+from core.similarity import ENGINES, SimilarityEngine, get_engine
+
+
+def test_engine_base_is_abstract():
+    with pytest.raises(TypeError):
+        SimilarityEngine()
+
+    class Partial(SimilarityEngine):
+        def profile(self, text):
+            return text
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_chars_engine_matches_difflib_quick_ratio():
+    engine = get_engine("chars")
+    for base, text in [("", ""), ("abc", ""), ("<p>hello</p>", "<p>hello'</p>"), ("中文页面", "中文")]:
+        assert engine.ratio(base, text) == difflib.SequenceMatcher(None, base, text).quick_ratio()
+
+
+@pytest.mark.parametrize("name", list(ENGINES))
+def test_engines_are_bounded_and_identical_text_scores_one(name):
+    engine = get_engine(name)
+    page = "<html><body><form action='/s'><input name='q'></form> results for apple</body></html>"
+    assert engine.ratio(page, page) == pytest.approx(1.0)
+    assert engine.ratio("", "") == 1.0
+    assert 0.0 <= engine.ratio(page, "<html>error</html>") < 1.0
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        get_engine("nope")
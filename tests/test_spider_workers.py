@@ -0,0 +1,31 @@
+import asyncio
+
+from core.spider import CrawlFrontier, UniversalSpider
+
+
+def test_worker_survives_failing_url():
+    """单个 URL 抛出异常时 worker 记录后继续消费队列，frontier.join() 正常返回"""
+    spider = UniversalSpider("http://example.test", session_dir=None)
+    crawled = []
+
+    async def fake_crawl_url(page, url, depth, frontier, visited, start_urls, max_depth):
+        if url.endswith("/boom"):
+            raise RuntimeError("parse error")
+        crawled.append(url)
+
+    spider._crawl_url = fake_crawl_url
+
+    async def run():
+        spider._budget_exhausted = asyncio.Event()
+        frontier = CrawlFrontier()
+        for path in ("/a", "/boom", "/b", "/boom", "/c"):
+            frontier.put_nowait((f"http://example.test{path}", 0))
+        worker = asyncio.create_task(spider._crawl_worker(None, frontier, set(), [], 3))
+        await asyncio.wait_for(frontier.join(), timeout=5)
+        assert not worker.done()
+        worker.cancel()
+        return frontier
+
+    frontier = asyncio.run(run())
+    assert crawled == ["http://example.test/a", "http://example.test/b", "http://example.test/c"]
+    assert frontier.in_flight == []
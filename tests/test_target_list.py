@@ -0,0 +1,28 @@
+import pytest
+
+from core.spider import load_target_list
+
+
+def test_load_target_list_parses_types_and_cookies(tmp_path):
+    path = tmp_path / "targets.txt"
+    path.write_text(
+        "# 注释与空行被忽略\n"
+        "\n"
+        "http://a.test/\n"
+        "http://b.test/dvwa DVWA security=low; PHPSESSID=x\n"
+        "http://c.test session=abc def\n",
+        encoding="utf-8",
+    )
+    assert load_target_list(str(path)) == [
+        {"base_url": "http://a.test", "type": "universal", "cookie": ""},
+        {"base_url": "http://b.test/dvwa", "type": "dvwa", "cookie": "security=low; PHPSESSID=x"},
+        {"base_url": "http://c.test", "type": "universal", "cookie": "session=abc def"},
+    ]
+    assert load_target_list(str(path), default_type="pikachu")[0]["type"] == "pikachu"
+
+
+def test_load_target_list_rejects_invalid_base_url(tmp_path):
+    path = tmp_path / "targets.txt"
+    path.write_text("http://a.test\nftp.b.test dvwa\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=":2 "):
+        load_target_list(str(path))
@@ -0,0 +1,21 @@
+from core.spider import url_template
+
+
+def test_numeric_values_and_param_order_collapse():
+    a = url_template("http://h/list.php?id=12&sort=asc")
+    b = url_template("http://h/list.php?sort=asc&id=5000")
+    assert a == b == "http://h/list.php?id={num}&sort=asc"
+
+
+def test_plain_values_are_kept():
+    assert url_template("http://h/index.php?page=about") != url_template("http://h/index.php?page=help")
+
+
+def test_path_segments_and_tokens():
+    assert url_template("http://h/user/42/profile") == "http://h/user/{num}/profile"
+    assert url_template("http://h/item/deadbeef12") == "http://h/item/{hex}"
+    assert url_template("http://h/r?t=abcdefgh12345678zz") == "http://h/r?t={token}"
+
+
+def test_fragment_and_blank_values():
+    assert url_template("http://h/a.php?q=&id=3#top") == "http://h/a.php?id={num}&q="